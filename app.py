@@ -1,49 +1,18 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import math
-from datetime import datetime
-import time
-import gdown
 import os
-import requests
+from datetime import datetime
 from config import *
+from mixcell.analysis import calculate_containers_needed, rank_plant_parts, simulate_what_if
+from mixcell.api import SequenceAPI, start_sequence_api
+from mixcell.clock import CLOCK
+from mixcell.fetch import DOWNLOAD_FAILED
+from mixcell.locks import SequenceLockStore
+from mixcell.metrics import METRICS
+from mixcell.snapshot import PRPRefresher, get_locked_sequence, get_next_update_time
 
-# Configuración de Google Drive se importa desde config.py
-
-def download_from_google_drive(file_id, output_path):
-    """Descarga un archivo desde Google Drive usando su ID"""
-    try:
-        url = f"https://drive.google.com/uc?id={file_id}"
-        gdown.download(url, output_path, quiet=False)
-        return True
-    except Exception as e:
-        st.error(f"{MESSAGES['error_loading']}{e}")
-        return False
-
-def get_next_update_time():
-    """Calcula cuándo será la próxima actualización programada"""
-    now = datetime.now()
-    current_minute = now.minute
-    
-    if current_minute < 5:
-        # Próxima actualización a los :05 de esta hora
-        next_update = now.replace(minute=5, second=0, microsecond=0)
-    elif current_minute < 35:
-        # Próxima actualización a los :35 de esta hora
-        next_update = now.replace(minute=35, second=0, microsecond=0)
-    else:
-        # Próxima actualización a los :05 de la siguiente hora
-        if now.hour == 23:
-            next_update = now.replace(hour=0, minute=5, second=0, microsecond=0) + pd.Timedelta(days=1)
-        else:
-            next_update = now.replace(hour=now.hour+1, minute=5, second=0, microsecond=0)
-    
-    total_seconds = (next_update - now).total_seconds()
-    minutes_until = int(total_seconds / 60)
-    seconds_until = int(total_seconds % 60)
-    
-    return next_update, minutes_until, seconds_until, total_seconds
+# La lógica de descarga, análisis, ranking y lock vive en el paquete mixcell (sin Streamlit);
+# este archivo solo dibuja las pantallas
 
 def format_countdown_message(minutes, seconds):
     """Formatea el mensaje del contador de manera dinámica"""
@@ -54,73 +23,6 @@ def format_countdown_message(minutes, seconds):
     else:
         return f"🕐 Próxima actualización: en {seconds} segundos"
 
-def check_file_age(file_path, max_age_seconds=None, force_update=False):
-    """Verifica si un archivo necesita actualizarse basado en horarios específicos (minuto 5 y 35 de cada hora)"""
-    if not os.path.exists(file_path):
-        return True  # Archivo no existe, necesita descarga
-    
-    if force_update:
-        return True  # Forzar actualización
-    
-    # Obtener tiempo actual
-    now = datetime.now()
-    current_minute = now.minute
-    
-    # Obtener última modificación del archivo
-    last_modified = datetime.fromtimestamp(os.path.getmtime(file_path))
-    
-    # Determinar si estamos en una ventana de actualización (minutos 5-7 o 35-37 para dar margen)
-    is_update_window = (5 <= current_minute <= 7) or (35 <= current_minute <= 37)
-    
-    if not is_update_window:
-        return False  # No estamos en ventana de actualización
-    
-    # Si estamos en ventana de actualización, verificar si ya se actualizó en esta ventana
-    # Calcular la ventana actual (hora + minuto específico)
-    if 5 <= current_minute <= 7:
-        current_window = now.replace(minute=5, second=0, microsecond=0)
-    else:  # 35 <= current_minute <= 37
-        current_window = now.replace(minute=35, second=0, microsecond=0)
-    
-    # Si el archivo fue modificado después del inicio de la ventana actual, no actualizar
-    if last_modified >= current_window:
-        return False
-    
-    return True  # Necesita actualización
-
-def update_prp_file(force_update=False):
-    """Actualiza el archivo PRP desde Google Drive si es necesario"""
-    
-    # Verificar si necesita actualización
-    if check_file_age(PRP_FILE_PATH, force_update=force_update):
-        # Crear directorio si no existe
-        os.makedirs(DATA_FOLDER, exist_ok=True)
-        
-        # Intentar descargar desde Google Drive
-        if GOOGLE_DRIVE_PRP_ID != "TU_ID_DEL_ARCHIVO_AQUI":
-            # Mostrar mensaje temporal de actualización
-            update_placeholder = st.empty()
-            update_placeholder.info(MESSAGES['updating'])
-            
-            success = download_from_google_drive(GOOGLE_DRIVE_PRP_ID, PRP_FILE_PATH)
-            
-            # Limpiar mensaje temporal
-            update_placeholder.empty()
-            
-            if success:
-                # Mostrar mensaje de éxito temporalmente (se limpia automáticamente al recargar)
-                success_placeholder = st.empty()
-                success_placeholder.success(MESSAGES['updated'])
-                return True
-            else:
-                # Solo mostrar error permanentemente
-                st.error(MESSAGES['update_failed'])
-                return False
-        else:
-            st.warning(MESSAGES['no_id'])
-    
-    return os.path.exists(PRP_FILE_PATH)
-
 # Configuración de la página
 st.set_page_config(
     page_title="Sistema de Producción MIX",
@@ -129,7 +31,19 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Función para agregar auto-refresh HTML
+# Vistas disponibles
+VIEW_MODES = {
+    "cell": "Una celda",
+    "plant": "Vista de planta (todas las celdas)"
+}
+
+# Modos de auto-refresh disponibles
+REFRESH_MODES = {
+    "partial": "Parcial (solo tarjetas)",
+    "full": "Recarga completa"
+}
+
+# Función para agregar auto-refresh HTML (modo recarga completa)
 def add_auto_refresh(interval_seconds):
     """Agrega meta refresh para auto-actualización de página"""
     refresh_html = f"""
@@ -154,440 +68,423 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def clean_number(value):
-    """Limpia números que pueden tener comas y los convierte a enteros"""
-    if pd.isna(value) or value == '' or value == 0:
-        return 0
+@st.cache_resource
+def get_refresher():
+    """Programador de actualizaciones compartido por todas las sesiones del servidor"""
+    refresher = PRPRefresher()
+    refresher.start()
+    return refresher
+
+@st.cache_resource
+def get_lock_store():
+    """Lock de secuencias del servidor: todas las pantallas de una celda muestran el mismo orden"""
+    os.makedirs(os.path.dirname(LOCK_DB_PATH) or '.', exist_ok=True)
+    return SequenceLockStore(LOCK_DB_PATH, LOCK_RETENTION_DAYS)
+
+@st.cache_resource
+def get_sequence_api_server():
+    """Servidor de la API JSON de secuencias, uno por proceso y sobre los mismos datos precalculados"""
+    if not SEQUENCE_API_ENABLED:
+        return None
+    lock_store = get_lock_store()
+    api = SequenceAPI(
+        get_refresher().get_snapshot,
+        lambda snapshot, cell_name, family: get_locked_sequence(snapshot, lock_store, cell_name, family),
+        lambda cell_name, family: lock_store.version(cell_name, family, CLOCK.today())
+    )
     try:
-        # Convertir a string y remover comas
-        cleaned = str(value).replace(',', '').replace('$', '').strip()
-        return int(float(cleaned)) if cleaned else 0
-    except (ValueError, TypeError):
-        return 0
+        return start_sequence_api(api, SEQUENCE_API_HOST, SEQUENCE_API_PORT)
+    except OSError:
+        return None  # Puerto ocupado: la aplicación sigue funcionando sin API
 
-def analyze_prp_for_cell(prp_df, part_numbers):
-    """Analiza el archivo PRP para obtener información de las partes con demanda secuencial inteligente"""
-    # Primero, recopilar TODAS las demandas de TODAS las partes con sus fechas
-    all_demands = []
-    
-    for part_number in part_numbers:
-        # Filtrar para esta parte específica y solo Customer Releases
-        part_data = prp_df[
-            (prp_df['Part No'] == part_number) & 
-            (prp_df['Demand Type'] == 'Customer Releases')
-        ]
-        
-        if part_data.empty:
-            continue
-            
-        # Obtener la primera fila (debería ser única)
-        row = part_data.iloc[0]
-        
-        # Obtener inventario FG actual
-        inv_fg = clean_number(row.get('Inv FG', 0))
-        past_due = clean_number(row.get('Past Due', 0))
-        
-        # Calcular inventario disponible inicial
-        available_inventory = inv_fg - past_due
-        
-        # Obtener columnas de fechas ordenadas
-        date_columns = [col for col in prp_df.columns if '/' in str(col) and col != 'Fecha De Actualizacion']
-        date_columns_sorted = sorted(date_columns, key=lambda x: pd.to_datetime(x, format='%m/%d/%Y'))
-        
-        # Simular inventario día por día para encontrar déficits
-        running_inventory = available_inventory
-        max_days_to_analyze = 30  # Analizar máximo 30 días (1 mes) hacia adelante
-        days_analyzed = 0
-        
-        for date_col in date_columns_sorted:
-            if days_analyzed >= max_days_to_analyze:
-                break
-                
-            daily_demand = clean_number(row.get(date_col, 0))
-            
-            if daily_demand > 0:
-                running_inventory -= daily_demand
-                
-                # Si hay déficit, agregar a lista global
-                if running_inventory < 0:
-                    shortage_amount = min(daily_demand, abs(running_inventory))
-                    all_demands.append({
-                        'part_number': part_number,
-                        'date': pd.to_datetime(date_col, format='%m/%d/%Y'),
-                        'demand': shortage_amount,
-                        'inv_fg': inv_fg,
-                        'past_due': past_due
-                    })
-            
-            days_analyzed += 1
-    
-    # Si no hay demandas faltantes, retornar vacío
-    if not all_demands:
-        return []
-    
-    # Ordenar todas las demandas por fecha
-    all_demands.sort(key=lambda x: x['date'])
-    
-    # Agrupar demandas secuenciales por parte
-    results = []
-    current_part = None
-    current_group = []
-    
-    for demand in all_demands:
-        if current_part != demand['part_number']:
-            # Si cambia la parte, procesar el grupo anterior
-            if current_group:
-                total_demand = sum(d['demand'] for d in current_group)
-                first_date = current_group[0]['date']
-                
-                results.append({
-                    'part_number': current_part,
-                    'inv_fg': current_group[0]['inv_fg'],
-                    'past_due': current_group[0]['past_due'],
-                    'first_shortage_date': first_date,
-                    'deficit': total_demand,
-                    'days_until_shortage': (first_date - pd.Timestamp.now()).days
-                })
-            
-            # Iniciar nuevo grupo
-            current_part = demand['part_number']
-            current_group = [demand]
-        else:
-            # Misma parte, agregar al grupo actual
-            current_group.append(demand)
-    
-    # Procesar el último grupo
-    if current_group:
-        total_demand = sum(d['demand'] for d in current_group)
-        first_date = current_group[0]['date']
-        
-        results.append({
-            'part_number': current_part,
-            'inv_fg': current_group[0]['inv_fg'],
-            'past_due': current_group[0]['past_due'],
-            'first_shortage_date': first_date,
-            'deficit': total_demand,
-            'days_until_shortage': (first_date - pd.Timestamp.now()).days
-        })
+def show_update_info(snapshot, refresher):
+    """Muestra el estado de la última actualización (se llama dentro de la barra lateral)"""
+    if refresher.last_result == "no_id":
+        st.warning(MESSAGES['no_id'])
+    elif refresher.last_result == DOWNLOAD_FAILED:
+        st.error(MESSAGES['update_failed'])
+        failed = [name for name, result in refresher.source_results.items() if result == DOWNLOAD_FAILED]
+        if len(refresher.sources) > 1 and failed:
+            st.caption(f"Fuentes sin actualizar: {', '.join(failed)}")
+    
+    updated_at = snapshot.prp_table.updated_at
+    if updated_at is not None:
+        # Solo mostrar en sidebar si no se mostró arriba recientemente
+        if 'data_timestamp' not in st.session_state or st.session_state.data_timestamp != updated_at:
+            st.info(f"{MESSAGES['last_update']}{updated_at.strftime('%H:%M:%S')}")
+    elif os.path.exists(PRP_FILE_PATH):
+        # Fallback a fecha de modificación del archivo si no hay columna
+        last_modified = datetime.fromtimestamp(os.path.getmtime(PRP_FILE_PATH))
+        st.info(f"📅 Archivo local: {last_modified.strftime('%H:%M:%S')}")
     
-    return results
+    # Cambios de faltante contra la versión anterior del PRP
+    if snapshot.change_log:
+        with st.expander(f"📝 Cambios en el último PRP ({len(snapshot.change_log)})"):
+            for entry in snapshot.change_log[:MAX_CHANGE_LOG_ENTRIES]:
+                st.caption(entry['message'])
 
-def calculate_containers_needed(deficit, parts_df, part_number):
-    """Calcula cuántos contenedores se necesitan para una parte específica"""
-    # Buscar el tamaño del contenedor para esta parte
-    part_info = parts_df[parts_df['part_numbers'] == part_number]
-    
-    if part_info.empty:
-        return 0
+def render_update_status(refresher):
+    """Contador de próxima actualización y estado de los datos"""
+    # Calcular próxima actualización
+    next_update, minutes_until, seconds_until, total_seconds = get_next_update_time()
     
-    container_size = part_info.iloc[0]['pieces_per_container']
-    container_size = clean_number(container_size)
+    # Crear contador dinámico que se actualiza automáticamente
+    countdown_message = format_countdown_message(minutes_until, seconds_until)
     
-    if container_size <= 0:
-        return 0
+    # Mostrar contador con colores según urgencia
+    if total_seconds <= 60:  # Último minuto - rojo
+        st.error(countdown_message)
+    elif total_seconds <= 180:  # Últimos 3 minutos - amarillo
+        st.warning(countdown_message)
+    else:  # Normal - verde
+        st.success(countdown_message)
     
-    # Calcular contenedores necesarios (redondear hacia arriba)
-    containers = math.ceil(deficit / container_size)
-    return containers
+    snapshot = refresher.get_snapshot()
+    if snapshot is not None:
+        show_update_info(snapshot, refresher)
 
-def get_top_3_critical_parts(prp_analysis, parts_df):
-    """Obtiene las 3 partes más críticas priorizando SIEMPRE el día actual primero"""
-    if len(prp_analysis) == 0:
-        return []
-    
-    # Ordenar por: 1) Fecha más cercana (ascendente), 2) Mayor déficit (descendente)
-    sorted_parts = sorted(prp_analysis, key=lambda x: (x['first_shortage_date'], -x['deficit']))
-    
-    # Obtener fecha actual
-    today = datetime.now().date()
-    
-    # Agrupar por fechas para análisis día por día
-    daily_groups = {}
-    for part in sorted_parts:
-        date_key = part['first_shortage_date'].date()
-        if date_key not in daily_groups:
-            daily_groups[date_key] = []
-        daily_groups[date_key].append(part)
-    
-    # PRIORIDAD: Empezar SIEMPRE con el día actual si existe
-    sorted_dates = sorted(daily_groups.keys())
-    if today in daily_groups:
-        # Mover día actual al inicio
-        ordered_dates = [today] + [d for d in sorted_dates if d != today]
-    else:
-        # Si no hay déficit hoy, usar orden normal
-        ordered_dates = sorted_dates
-    
-    # Análisis conservador día por día
-    result_sequence = []
-    processed_parts = set()
+def render_diagnostics():
+    """Tiempos por etapa y contadores del proceso (descarga, carga, análisis, ranking y tarjetas)"""
+    timings = METRICS.timings()
+    if not timings:
+        st.caption("Sin mediciones todavía")
+        return
     
-    for i, current_date in enumerate(ordered_dates):
-        current_day_parts = daily_groups[current_date]
-        
-        for part in sorted(current_day_parts, key=lambda x: -x['deficit']):
-            if part['part_number'] in processed_parts:
-                continue
-                
-            part_number = part['part_number']
-            total_containers = calculate_containers_needed(part['deficit'], parts_df, part_number)
-            total_deficit = part['deficit']
-            grouped_days = 1
-            
-            # SOLO si este día tiene UNA SOLA parte, buscar continuidad en EL SIGUIENTE día
-            if len(current_day_parts) == 1 and i + 1 < len(ordered_dates):
-                next_date = ordered_dates[i + 1]
-                next_day_parts = daily_groups[next_date]
-                
-                # Buscar si la MISMA parte aparece en el día siguiente
-                same_part_next_day = None
-                for next_part in next_day_parts:
-                    if next_part['part_number'] == part_number:
-                        same_part_next_day = next_part
-                        break
-                
-                # SOLO agrupa si la misma parte está en el siguiente día
-                if same_part_next_day:
-                    total_containers += calculate_containers_needed(same_part_next_day['deficit'], parts_df, part_number)
-                    total_deficit += same_part_next_day['deficit']
-                    grouped_days = 2
-                    # Marcar como procesada para no repetir
-                    processed_parts.add(part_number)
-            
-            # Crear entrada (agrupada o individual)
-            final_part = part.copy()
-            final_part['containers'] = total_containers
-            final_part['deficit'] = total_deficit
-            final_part['kanban_group_date'] = current_date
-            final_part['kanban_sequence'] = len(result_sequence) + 1
-            
-            # Marcar si es crítico para HOY
-            if current_date == today:
-                final_part['is_today_critical'] = True
-            
-            if grouped_days > 1:
-                final_part['is_grouped'] = True
-                final_part['grouped_containers'] = total_containers
-                final_part['grouped_days'] = grouped_days
-            
-            # Marcar si es mismo día con otras partes
-            if len(current_day_parts) > 1:
-                final_part['is_same_day_group'] = True
-            
-            result_sequence.append(final_part)
-            processed_parts.add(part_number)
-            
-            # Limitar a TOP 3
-            if len(result_sequence) >= 3:
-                break
-        
-        # Si ya tenemos 3 prioridades, terminar
-        if len(result_sequence) >= 3:
-            break
+    rows = []
+    for stage, timing in sorted(timings.items()):
+        rows.append({
+            'Etapa': stage,
+            'Llamadas': timing['count'],
+            'Promedio (ms)': round(timing['sum'] / timing['count'] * 1000, 1),
+            'Última (ms)': round(timing['last'] * 1000, 1),
+            'Máxima (ms)': round(timing['max'] * 1000, 1)
+        })
+    st.dataframe(pd.DataFrame(rows), hide_index=True)
     
-    return result_sequence[:3]
+    for name, value in sorted(METRICS.values().items()):
+        st.caption(f"{name}: {value:,}")
+    if SEQUENCE_API_ENABLED:
+        st.caption(f"Formato Prometheus en http://<servidor>:{SEQUENCE_API_PORT}/metrics")
 
-def detect_same_day_session(current_parts):
-    """Detecta si hay múltiples partes del mismo día en la lista actual"""
-    if not current_parts:
-        return False
-    
-    today = datetime.now().date()
+def render_plant_ranking(snapshot, selected_family):
+    """Tabla con las partes más críticas de toda la planta o de la familia seleccionada"""
+    col_scope, col_size = st.columns([3, 1])
+    with col_scope:
+        scope = st.radio(
+            "Alcance:",
+            options=["plant", "family"],
+            format_func=lambda x: "Toda la planta" if x == "plant" else f"Familia {selected_family}",
+            horizontal=True,
+            key="plant_ranking_scope"
+        )
+    with col_size:
+        k = st.number_input("Partes:", min_value=1, max_value=500, value=PLANT_RANKING_SIZE, step=10,
+                            key="plant_ranking_size")
+    
+    catalog = snapshot.catalog
+    ranking = rank_plant_parts(snapshot.prp_table, catalog, k=int(k),
+                               family=selected_family if scope == "family" else None)
+    if not ranking:
+        st.success("✅ No hay partes críticas en este momento")
+        return
     
-    # Contar cuántas partes críticas son para HOY
-    same_day_count = 0
-    for part in current_parts:
-        if part['first_shortage_date'].date() == today:
-            same_day_count += 1
+    st.dataframe(pd.DataFrame([{
+        'Prioridad': part.kanban_sequence,
+        'Parte': part.part_number,
+        'Descripción': catalog.description(part.part_number),
+        'Celdas': ", ".join(cell for cell, _ in catalog.cells_for_part(part.part_number)),
+        'Contenedores': part.containers,
+        'Faltante': part.deficit,
+        'Fecha faltante': part.first_shortage_date.strftime('%d/%m/%Y'),
+        'Hoy': part.is_today_critical,
+        'Agrupada': part.is_grouped
+    } for part in ranking]), hide_index=True)
+
+def render_compact_card(snapshot, cell_name, family):
+    """Tarjeta compacta de una celda/familia para la vista de planta (un solo elemento HTML)"""
+    catalog = snapshot.catalog
+    sequence = get_locked_sequence(snapshot, get_lock_store(), cell_name, family)
     
-    # Si hay 2 o más partes para hoy = sesión activa
-    return same_day_count >= 2
+    lines = []
+    for i, part_info in enumerate(sequence):
+        part_number = part_info['part_number']
+        indicator = ""
+        if part_info.get('is_pull_ahead', False):
+            indicator = " ⚡"
+        elif part_info.get('is_today_critical', False):
+            indicator = " 🚨"
+        elif part_info.get('is_grouped', False):
+            indicator = " 📦"
+        lines.append(
+            f"<div style='background-color: {catalog.visual_color(part_number)}; padding: 4px 8px; border-radius: 6px; "
+            f"margin-top: 4px; font-size: 13px;'><strong>#{i+1}</strong> {part_number}{indicator}"
+            f"<span style='float: right; font-weight: 900; color: #d73502;'>{part_info['containers']} cont.</span></div>"
+        )
+    if not lines:
+        lines.append("<div style='padding: 4px 8px; font-size: 13px;'>✅ Sin partes críticas</div>")
+    
+    is_locked = any(part.get('is_sequence_locked', False) for part in sequence)
+    header = f"{cell_name}{' 🔒' if is_locked else ''}<br><span style='font-size: 11px; opacity: 0.8;'>{family}</span>"
+    
+    # Carga de la celda contra su capacidad (compartida por todas sus familias)
+    summary = snapshot.schedule.cell_summary(cell_name) if snapshot.schedule is not None else None
+    if summary is not None:
+        late_text = f" · {int(summary['late_parts'])} tarde" if summary['late_parts'] else ""
+        lines.append(f"<div style='font-size: 11px; margin-top: 6px; text-align: right;'>"
+                     f"Carga {summary['utilization']:.0%}{late_text}</div>")
+    st.markdown(
+        f"<div style='border: 2px solid rgba(0,0,0,0.1); border-radius: 10px; padding: 8px; margin-bottom: 12px;'>"
+        f"<div style='background-color: #d73502; color: white; padding: 4px 8px; border-radius: 6px; text-align: center;'>"
+        f"<strong>{header}</strong></div>{''.join(lines)}</div>",
+        unsafe_allow_html=True
+    )
 
-def save_daily_sequence(sequence, session_state):
-    """Guarda la secuencia del día en session_state"""
-    today = datetime.now().date()
-    
-    # Guardar solo los identificadores esenciales
-    stored_sequence = []
-    for i, part in enumerate(sequence):
-        stored_sequence.append({
-            'part_number': part['part_number'],
-            'original_priority': i + 1,
-            'kanban_group_date': part.get('kanban_group_date', today)
-        })
+def render_plant_overview(refresher):
+    """Cuadrícula con la secuencia de todas las celdas/familias a partir de los resultados precalculados"""
+    snapshot = refresher.get_snapshot()
+    if snapshot is None:
+        st.error("❌ No se pudieron cargar los datos necesarios")
+        return
     
-    # Guardar en session_state
-    session_state['daily_kanban_sequence'] = stored_sequence
-    session_state['kanban_sequence_date'] = today
+    st.markdown("## 🏭 VISTA DE PLANTA")
+    st.caption("⚡ Pull ahead · 🚨 Crítico hoy · 📦 Parte agrupada · 🔒 Secuencia bloqueada")
+    
+    # Todas las celdas salen del mismo cálculo de la planta: no se analiza nada por pantalla
+    keys = sorted(snapshot.sequences)
+    with METRICS.timed('render_overview'):
+        for row_start in range(0, len(keys), OVERVIEW_COLUMNS):
+            cols = st.columns(OVERVIEW_COLUMNS)
+            for col, (cell_name, family) in zip(cols, keys[row_start:row_start + OVERVIEW_COLUMNS]):
+                with col:
+                    render_compact_card(snapshot, cell_name, family)
 
-def load_stored_sequence(session_state):
-    """Recupera la secuencia guardada si es del día actual"""
-    today = datetime.now().date()
-    
-    # Verificar si hay secuencia guardada y es de hoy
-    if ('daily_kanban_sequence' in session_state and 
-        'kanban_sequence_date' in session_state and
-        session_state['kanban_sequence_date'] == today):
-        
-        return session_state['daily_kanban_sequence']
+def render_cell_capacity(snapshot, selected_cell):
+    """Carga de la celda contra su rate por hora: utilización, partes tarde y cola de producción"""
+    schedule = snapshot.schedule
+    summary = schedule.cell_summary(selected_cell) if schedule is not None else None
+    if summary is None:
+        st.info("Sin programa de capacidad para esta celda")
+        return
+    
+    col_load, col_hours, col_late = st.columns(3)
+    col_load.metric("Utilización", f"{summary['utilization']:.0%}")
+    col_hours.metric("Horas requeridas", f"{summary['hours_required']:,.1f} / {summary['hours_available']:,.0f}")
+    col_late.metric("Partes tarde", f"{int(summary['late_parts'])}")
+    if summary['jobs_without_rate']:
+        st.warning(f"⚠️ {int(summary['jobs_without_rate'])} faltantes de partes sin rate_per_hour no se pudieron programar")
     
-    return None  # No hay secuencia guardada o es de otro día
+    jobs = schedule.cell_jobs(selected_cell)
+    if jobs.empty:
+        st.success("✅ La celda no tiene faltantes que producir")
+        return
+    st.dataframe(pd.DataFrame({
+        'Parte': jobs['part_number'],
+        'Faltante': jobs['shortage_date'].dt.strftime('%d/%m'),
+        'Piezas': jobs['pieces'],
+        'Contenedores': jobs['containers'],
+        'Horas': jobs['hours'].round(1),
+        'Inicio': jobs['start'].dt.strftime('%d/%m %H:%M'),
+        'Fin': jobs['finish'].dt.strftime('%d/%m %H:%M'),
+        'Tarde': jobs['is_late']
+    }), hide_index=True)
+    st.caption(f"Cola por fecha de faltante a {CELL_HOURS_PER_DAY:g} horas productivas por día, "
+               f"calculada {schedule.computed_at.strftime('%H:%M')}")
 
-def apply_stored_sequence(stored_sequence, current_sequence):
-    """Aplica la secuencia guardada a los datos actuales"""
-    result = []
+def render_shortage_history(refresher, snapshot, selected_cell, selected_family):
+    """Faltante de cada parte de la celda en las versiones del PRP de los últimos días"""
+    if refresher.history is None:
+        st.info("El historial del PRP está desactivado (HISTORY_DB_PATH)")
+        return
     
-    # Crear un diccionario de partes actuales para búsqueda rápida
-    current_parts_dict = {part['part_number']: part for part in current_sequence}
+    days = st.slider("Días", 1, HISTORY_RETENTION_DAYS, min(7, HISTORY_RETENTION_DAYS), key="history_days")
+    now = pd.Timestamp(CLOCK.now())
+    history = refresher.history.parts_history(
+        snapshot.catalog.part_numbers(selected_cell, selected_family), start=now - pd.Timedelta(days=days), end=now
+    )
+    if history.empty:
+        st.info("Todavía no hay versiones del PRP guardadas para este rango")
+        return
     
-    # Aplicar el orden guardado
-    for stored_part in stored_sequence:
-        part_number = stored_part['part_number']
-        
-        # Si la parte aún existe en datos actuales
-        if part_number in current_parts_dict:
-            # Tomar datos actuales pero mantener prioridad original
-            current_part = current_parts_dict[part_number].copy()
-            current_part['locked_priority'] = stored_part['original_priority']
-            current_part['is_sequence_locked'] = True
-            result.append(current_part)
-    
-    return result[:3]  # Limitar a TOP 3
+    # Solo las partes que tuvieron faltante en alguna versión del rango
+    deficits = history.pivot_table(index='updated_at', columns='part_number', values='deficit', aggfunc='last')
+    deficits = deficits.loc[:, deficits.max() > 0]
+    if deficits.empty:
+        st.success(f"✅ Ninguna parte de la celda tuvo faltante en los últimos {days} días")
+        return
+    st.line_chart(deficits)
+    st.caption(f"{history['version_id'].nunique()} versiones del PRP, {deficits.shape[1]} partes con faltante")
 
-def detect_pull_ahead(current_sequence, stored_sequence):
-    """Detecta si hay un pull ahead que requiere romper el lock de secuencia"""
-    if not stored_sequence or not current_sequence:
-        return False
-    
-    # Obtener la fecha más temprana de la secuencia guardada
-    stored_earliest_date = None
-    for stored_part in stored_sequence:
-        # La fecha se guarda como kanban_group_date
-        stored_date = stored_part.get('kanban_group_date')
-        if stored_date and (stored_earliest_date is None or stored_date < stored_earliest_date):
-            stored_earliest_date = stored_date
-    
-    # Obtener la fecha más temprana de la secuencia actual
-    current_earliest_date = None
-    for current_part in current_sequence:
-        current_date = current_part['first_shortage_date'].date()
-        if current_earliest_date is None or current_date < current_earliest_date:
-            current_earliest_date = current_date
-    
-    # Si la fecha más temprana actual es anterior a la guardada = PULL AHEAD
-    if (stored_earliest_date and current_earliest_date and 
-        current_earliest_date < stored_earliest_date):
-        return True
-    
-    return False
+@st.cache_resource(max_entries=8)
+def get_what_if(_snapshot, snapshot_key, part_numbers, **scenario):
+    """Simulación what-if compartida entre sesiones y refrescos mientras no cambien el PRP ni los parámetros"""
+    return simulate_what_if(_snapshot.prp_table, _snapshot.catalog,
+                            part_numbers=list(part_numbers) if part_numbers is not None else None,
+                            seed=WHAT_IF_SEED, **scenario)
 
-def get_top_3_critical_parts_with_lock(prp_analysis, parts_df, session_state):
-    """Versión mejorada que respeta la secuencia diaria para evitar cambios innecesarios, 
-    pero detecta pull ahead para casos urgentes"""
-    if len(prp_analysis) == 0:
-        return []
+def render_what_if(snapshot, selected_cell, selected_family):
+    """Simulación what-if: probabilidad de faltante ante cambios de demanda e inventario"""
+    col_demand, col_cv, col_inventory = st.columns(3)
+    with col_demand:
+        demand_change = st.slider("Cambio de demanda (%)", -50, 100, 15, step=5, key="what_if_demand")
+    with col_cv:
+        demand_cv = st.slider("Variabilidad diaria (%)", 0, 50, int(WHAT_IF_DEMAND_CV * 100), step=5,
+                              key="what_if_cv")
+    with col_inventory:
+        inventory_change = st.slider("Cambio de inventario FG (%)", -100, 50, 0, step=5, key="what_if_inventory")
+    col_delay, col_probability, col_scope = st.columns(3)
+    with col_delay:
+        delay_days = st.number_input("Días de retraso del embarque FG:", min_value=0, max_value=MAX_DAYS_TO_ANALYZE,
+                                     value=0, key="what_if_delay_days")
+    with col_probability:
+        delay_probability = st.slider("Probabilidad de retraso (%)", 0, 100, 0, step=5, key="what_if_delay_probability")
+    with col_scope:
+        scope = st.radio(
+            "Alcance:",
+            options=["cell", "plant"],
+            format_func=lambda x: f"{selected_cell} / {selected_family}" if x == "cell" else "Toda la planta",
+            key="what_if_scope"
+        )
     
-    # PASO 1: Calcular secuencia actual normal
-    current_sequence = get_top_3_critical_parts(prp_analysis, parts_df)
+    catalog = snapshot.catalog
+    result = get_what_if(
+        snapshot, (snapshot.prp_table.content_hash, snapshot.parts_version),
+        tuple(catalog.part_numbers(selected_cell, selected_family)) if scope == "cell" else None,
+        demand_change=demand_change / 100,
+        demand_cv=demand_cv / 100,
+        inventory_change=inventory_change / 100,
+        delay_days=int(delay_days),
+        delay_probability=delay_probability / 100
+    )
+    parts = result.parts.sort_values(['shortage_probability', 'mean_deficit'], ascending=False)
+    if parts.empty:
+        st.info("Sin partes del PRP para simular")
+        return
     
-    # PASO 2: Verificar si hay sesión del mismo día activa
-    if detect_same_day_session(current_sequence):
-        
-        # PASO 3: Intentar cargar secuencia guardada
-        stored_sequence = load_stored_sequence(session_state)
-        
-        if stored_sequence:
-            # PASO 4: DETECTAR PULL AHEAD antes de aplicar lock
-            if detect_pull_ahead(current_sequence, stored_sequence):
-                # PULL AHEAD DETECTADO - Romper lock y crear nueva secuencia
-                save_daily_sequence(current_sequence, session_state)
-                # Marcar las partes nuevas como pull ahead para mostrar al operador
-                for part in current_sequence:
-                    if part['first_shortage_date'].date() < datetime.now().date():
-                        part['is_pull_ahead'] = True
-                return current_sequence
-            
-            # PASO 5: No hay pull ahead - Aplicar secuencia guardada a datos actuales
-            locked_sequence = apply_stored_sequence(stored_sequence, current_sequence)
-            if locked_sequence:
-                return locked_sequence
-    
-    # PASO 6: Primera vez del día o no hay sesión activa
-    # Guardar nueva secuencia
-    save_daily_sequence(current_sequence, session_state)
-    return current_sequence
-
-def get_part_description(parts_df, part_number):
-    """Obtiene la descripción de una parte específica"""
-    try:
-        part_info = parts_df[parts_df['part_numbers'] == part_number]
-        if not part_info.empty:
-            description = part_info.iloc[0]['description']
-            return description if pd.notna(description) else ""
-    except:
-        pass
-    return ""
+    if scope == "cell":
+        col_probability, col_median, col_high = st.columns(3)
+        col_probability.metric("Partes con riesgo (>50%)", f"{(parts['shortage_probability'] > 0.5).sum()} / {len(parts)}")
+        col_median.metric("Faltante P50", f"{parts['deficit_p50'].sum():,.0f}",
+                          delta=f"{parts['deficit_p50'].sum() - parts['baseline_deficit'].sum():+,.0f}",
+                          delta_color="inverse")
+        col_high.metric(f"Faltante P{WHAT_IF_PERCENTILES[-1]}", f"{parts[f'deficit_p{WHAT_IF_PERCENTILES[-1]}'].sum():,.0f}")
+    else:
+        cells = result.cells[result.cells['parts'] > 0].sort_values('mean_deficit', ascending=False)
+        st.dataframe(pd.DataFrame({
+            'Celda': cells.index,
+            'Partes': cells['parts'],
+            'Partes con faltante (prom.)': cells['expected_parts_short'].round(1),
+            'Faltante actual': cells['baseline_deficit'],
+            **{f'Faltante P{q}': cells[f'deficit_p{q}'].round() for q in WHAT_IF_PERCENTILES}
+        }), hide_index=True)
+        parts = parts.head(PLANT_RANKING_SIZE)
+    
+    high = f'deficit_p{WHAT_IF_PERCENTILES[-1]}'
+    st.dataframe(pd.DataFrame({
+        'Parte': parts.index,
+        'Celda': parts['cell_name'],
+        'Prob. faltante': (parts['shortage_probability'] * 100).round().astype(int).astype(str) + '%',
+        'Faltante actual': parts['baseline_deficit'],
+        **{f'Faltante P{q}': parts[f'deficit_p{q}'].round() for q in WHAT_IF_PERCENTILES},
+        f'Contenedores P{WHAT_IF_PERCENTILES[-1]}': [
+            calculate_containers_needed(deficit, catalog, part_number)
+            for part_number, deficit in zip(parts.index, parts[high])
+        ]
+    }), hide_index=True)
+    st.caption(f"{result.scenarios:,} escenarios sobre los próximos {MAX_DAYS_TO_ANALYZE} días")
 
-def get_visual_color(parts_df, part_number):
-    """Obtiene el color visual basado en visual_id con colores mejorados para operadores"""
-    try:
-        part_info = parts_df[parts_df['part_numbers'] == part_number]
-        if not part_info.empty:
-            visual_id = part_info.iloc[0]['visual_id']
-            
-            # Colores mejorados y más vibrantes para operadores
-            color_map = {
-                'Amarillo': '#FFE135',      # Amarillo brillante
-                'Naranja': '#FF8C42',       # Naranja vibrante
-                'Rosa': '#FF69B4',          # Rosa fuerte
-                'Verde': '#32CD32',         # Verde lima brillante
-                'Blanco': '#F5F5F5',        # Blanco suave
-                'Verde Menta': '#00E5A0',   # Verde menta brillante
-                'Azul': '#4169E1',          # Azul real vibrante
-                'Cafe Claro': '#D2B48C'     # Café claro beige
-            }
-            
-            return color_map.get(visual_id, '#E8E8E8')  # Gris claro por defecto
-    except:
-        pass
-    return '#E8E8E8'  # Gris claro por defecto
+def render_production_sequence(refresher, selected_cell, selected_family):
+    """Tarjetas de la secuencia de producción de la celda/familia seleccionada"""
+    snapshot = refresher.get_snapshot()
+    if snapshot is None:
+        st.error("❌ No se pudieron cargar los datos necesarios")
+        return
+    catalog = snapshot.catalog
+    
+    # Obtener los números de parte para esta combinación
+    part_numbers = catalog.part_numbers(selected_cell, selected_family)
+    
+    if not part_numbers:
+        st.warning(f"⚠️ No se encontraron partes para la celda '{selected_cell}' y familia '{selected_family}'")
+        return
+    
+    # Análisis PRP: resultados precalculados y compartidos entre todas las pantallas
+    cell_results = snapshot.sequences.get((selected_cell, selected_family), {'analysis': [], 'sequence': []})
+    prp_analysis = cell_results['analysis']
+    
+    if not prp_analysis:
+        st.success("✅ No hay partes críticas para esta celda en este momento")
+        st.info("Todas las partes tienen suficiente inventario para cubrir los Customer Releases")
+        return
+    
+    # Obtener TOP 3 partes críticas con lock de secuencia Kanban (compartido por todas las pantallas)
+    top_3_parts = get_locked_sequence(snapshot, get_lock_store(), selected_cell, selected_family)
+    
+    if not top_3_parts:
+        st.success("✅ No hay partes críticas para esta celda en este momento")
+        return
+    
+    # Mostrar TOP 3
+    st.markdown("## 🎯 SECUENCIA DE PRODUCCIÓN")
+    
+    # Indicador de secuencia bloqueada y pull ahead
+    if any(part.get('is_pull_ahead', False) for part in top_3_parts):
+        st.error("⚡ **PULL AHEAD DETECTADO**: Nueva demanda urgente encontrada. Secuencia recalculada automáticamente. ¡PRIORIDAD MÁXIMA!")
+    elif any(part.get('is_sequence_locked', False) for part in top_3_parts):
+        st.warning("🔒 **SECUENCIA BLOQUEADA**: Manteniendo orden original del día para evitar cambios innecesarios. La secuencia se recalculará al completar todas las partes del mismo día.")
+    
+    with METRICS.timed('render_cards'):
+        render_sequence_cards(catalog, top_3_parts)
 
-# Cache para datos con auto-refresh inteligente
-@st.cache_data(ttl=CACHE_TTL)  # Cache basado en configuración
-def load_data(force_update=False):
-    """Carga los datos desde archivos CSV con actualización automática desde Google Drive"""
-    try:
-        # Actualizar archivo PRP desde Google Drive si es necesario
-        update_prp_file(force_update=force_update)
+def render_sequence_cards(catalog, top_3_parts):
+    """Tarjetas de las partes de la secuencia con prioridad, contenedores y faltante"""
+    cols = st.columns(3)
+    
+    for i, part_info in enumerate(top_3_parts):
+        part_number = part_info['part_number']
+        containers = part_info['containers']
+        deficit = part_info['deficit']
         
-        # Cargar datos
-        parts_df = pd.read_csv(PARTS_FILE_PATH)
-        prp_df = pd.read_csv(PRP_FILE_PATH)
+        # Obtener color de fondo basado en visual_id
+        bg_color = catalog.visual_color(part_number)
         
-        # Mostrar información de última actualización desde el CSV de manera discreta
-        if not prp_df.empty and 'Fecha De Actualizacion' in prp_df.columns:
-            # Obtener la fecha de actualización del PRP (todas las filas tienen la misma fecha)
-            fecha_actualizacion = prp_df['Fecha De Actualizacion'].iloc[0]
-            try:
-                # Convertir a datetime para mejor formato
-                fecha_dt = pd.to_datetime(fecha_actualizacion)
-                # Solo mostrar en sidebar si no se mostró arriba recientemente
-                if 'data_timestamp' not in st.session_state or st.session_state.data_timestamp != fecha_dt:
-                    st.sidebar.info(f"📅 Última actualización: {fecha_dt.strftime('%H:%M:%S')}")
-            except:
-                st.sidebar.info(f"📅 Última actualización: {fecha_actualizacion}")
-        elif os.path.exists(PRP_FILE_PATH):
-            # Fallback a fecha de modificación del archivo si no hay columna
-            last_modified = datetime.fromtimestamp(os.path.getmtime(PRP_FILE_PATH))
-            st.sidebar.info(f"📅 Archivo local: {last_modified.strftime('%H:%M:%S')}")
+        # Obtener descripción de la parte
+        part_description = catalog.description(part_number)
         
-        return parts_df, prp_df
-    except FileNotFoundError as e:
-        st.error(f"{MESSAGES['file_not_found']}{str(e)}")
-        return pd.DataFrame(), pd.DataFrame()
-    except Exception as e:
-        st.error(f"{MESSAGES['error_loading']}{str(e)}")
-        return pd.DataFrame(), pd.DataFrame()
+        # Indicador de agrupación Kanban (mismo día), bloqueo de secuencia, pull ahead, partes agrupadas y crítico HOY
+        kanban_indicator = ""
+        if part_info.get('is_pull_ahead', False):
+            kanban_indicator = "⚡ PULL AHEAD"
+        elif part_info.get('is_sequence_locked', False):
+            kanban_indicator = "🔒 SECUENCIA BLOQUEADA"
+        elif part_info.get('is_today_critical', False):
+            kanban_indicator = "🚨 CRÍTICO HOY"
+        elif part_info.get('is_grouped', False):
+            kanban_indicator = "📦 PARTE AGRUPADA"
+        elif part_info.get('is_same_day_group', False):
+            kanban_indicator = "🔗 MISMO DÍA"
+        
+        with cols[i]:
+            # Usar componentes nativos de Streamlit en lugar de HTML personalizado
+            with st.container():
+                # Badge de prioridad y título con indicador Kanban
+                priority_text = f"PRIORIDAD #{i+1}"
+                if kanban_indicator:
+                    priority_text += f"<br><span style='font-size: 10px;'>{kanban_indicator}</span>"
+                
+                st.markdown(f"<div style='background-color: #d73502; color: white; padding: 5px 10px; border-radius: 10px; text-align: center; margin-bottom: 10px;'><strong>{priority_text}</strong></div>", unsafe_allow_html=True)
+                
+                # Número de parte y descripción con color de fondo
+                part_display = f"<strong>{part_number}</strong>"
+                if part_description:
+                    part_display += f"<br><span style='font-size: 12px; opacity: 0.8;'>{part_description}</span>"
+                
+                st.markdown(f"<div style='background-color: {bg_color}; padding: 10px; border-radius: 10px; text-align: center; margin-bottom: 15px; border: 2px solid rgba(0,0,0,0.1);'>{part_display}</div>", unsafe_allow_html=True)
+                
+                # Número de contenedores grande
+                st.markdown(f"<div style='text-align: center; margin: 20px 0;'><div style='font-size: 64px; font-weight: 900; color: #d73502; margin: 0;'>{containers}</div><div style='font-size: 20px; color: #333; font-weight: bold;'>CONTENEDORES</div></div>", unsafe_allow_html=True)
+                
+                # Información del faltante sin fecha específica
+                st.markdown(f"<div style='background-color: rgba(215,53,2,0.1); padding: 10px; border-radius: 10px; text-align: center; border-top: 3px solid #d73502;'><strong style='color: #d73502;'>Faltante: {deficit:,} piezas</strong></div>", unsafe_allow_html=True)
 
 def main():
     # Sidebar con controles
@@ -600,12 +497,15 @@ def main():
     query_params = st.query_params
     url_refresh_enabled = query_params.get("refresh_enabled", "true").lower() == "true"
     url_refresh_interval = int(query_params.get("refresh_interval", "300"))
+    url_refresh_mode = query_params.get("refresh_mode", "partial")
     
     # Inicializar configuración con valores de URL o defaults
     if 'auto_refresh_enabled' not in st.session_state:
         st.session_state.auto_refresh_enabled = url_refresh_enabled
     if 'refresh_interval' not in st.session_state:
         st.session_state.refresh_interval = url_refresh_interval
+    if 'refresh_mode' not in st.session_state:
+        st.session_state.refresh_mode = url_refresh_mode if url_refresh_mode in REFRESH_MODES else "partial"
     
     auto_refresh_enabled = st.sidebar.checkbox(
         "🔄 Auto-refresh página", 
@@ -634,100 +534,94 @@ def main():
             help="Cada cuánto tiempo se refresca automáticamente la página"
         )
         
+        refresh_mode = st.sidebar.radio(
+            "🖥️ Modo de refresh:",
+            options=list(REFRESH_MODES),
+            format_func=lambda x: REFRESH_MODES[x],
+            index=list(REFRESH_MODES).index(st.session_state.refresh_mode),
+            key="refresh_mode_select",
+            help="Parcial: solo se actualizan las tarjetas y el contador. Completo: recarga toda la página"
+        )
+        
         # Actualizar session_state con la nueva selección
         st.session_state.refresh_interval = refresh_interval
+        st.session_state.refresh_mode = refresh_mode
         
         # Actualizar URL params para persistencia
         st.query_params.update({
             "refresh_enabled": "true",
-            "refresh_interval": str(refresh_interval)
+            "refresh_interval": str(refresh_interval),
+            "refresh_mode": refresh_mode
         })
         
     else:
         refresh_interval = 0  # Deshabilitado
+        refresh_mode = st.session_state.refresh_mode
         # Actualizar URL params
         st.query_params.update({
             "refresh_enabled": "false",
             "refresh_interval": "300"
         })
     
+    # Programador de actualizaciones en segundo plano y API JSON (uno por proceso)
+    refresher = get_refresher()
+    get_sequence_api_server()
+    
     # Botón para forzar actualización de datos
     if st.sidebar.button("🔄 Actualizar Datos Ahora"):
         with st.spinner("Actualizando datos..."):
-            # Limpiar cache
-            st.cache_data.clear()
-            # Forzar descarga desde Google Drive
-            if os.path.exists(PRP_FILE_PATH):
-                os.remove(PRP_FILE_PATH)  # Eliminar archivo local para forzar descarga
+            # Pedir al programador una descarga inmediata y esperar el nuevo snapshot
+            refresher.refresh_now(timeout=DOWNLOAD_TIMEOUT)
             # Limpiar timestamp para mostrar nueva información
             if 'data_timestamp' in st.session_state:
                 del st.session_state.data_timestamp
         st.rerun()
     
-    # Calcular próxima actualización
-    next_update, minutes_until, seconds_until, total_seconds = get_next_update_time()
-    
-    # Crear contador dinámico que se actualiza automáticamente
-    countdown_message = format_countdown_message(minutes_until, seconds_until)
-    
-    # Mostrar contador en sidebar con colores según urgencia
-    if total_seconds <= 60:  # Último minuto - rojo
-        st.sidebar.error(countdown_message)
-    elif total_seconds <= 180:  # Últimos 3 minutos - amarillo
-        st.sidebar.warning(countdown_message)
-    else:  # Normal - verde
-        st.sidebar.success(countdown_message)
-    
-    # Verificar si se está forzando una actualización automática
-    now = datetime.now()
-    current_minute = now.minute
-    
-    # Forzar actualización si estamos en ventana de actualización
-    force_update = (5 <= current_minute <= 7) or (35 <= current_minute <= 37)
+    # Contador y estado de los datos; en modo parcial se actualizan solos en su fragmento
+    partial_refresh = auto_refresh_enabled and refresh_mode == "partial"
+    with st.sidebar:
+        st.fragment(run_every=refresh_interval if partial_refresh else None)(render_update_status)(refresher)
     
-    # También forzar si el archivo es muy viejo (más de 1 hora)
-    if os.path.exists(PRP_FILE_PATH):
-        last_modified = datetime.fromtimestamp(os.path.getmtime(PRP_FILE_PATH))
-        hours_old = (now - last_modified).total_seconds() / 3600
-        if hours_old > 1:
-            force_update = True
-    
-    if force_update and 'last_forced_update' not in st.session_state:
-        # Limpiar cache y forzar actualización solo una vez por sesión en cada ventana
-        st.cache_data.clear()
-        if os.path.exists(PRP_FILE_PATH):
-            os.remove(PRP_FILE_PATH)  # Eliminar archivo local para forzar descarga
-        st.session_state.last_forced_update = now.strftime('%H:%M')
-
-    # Cargar y validar datos
+    # Cargar y validar datos (snapshot ya procesado por el programador, sin esperar la red)
     try:
-        parts_df, prp_df = load_data(force_update=force_update)
+        snapshot = refresher.get_snapshot()
         
-        if parts_df.empty or prp_df.empty:
+        if snapshot is None:
             st.error("❌ No se pudieron cargar los datos necesarios")
+            if refresher.last_error:
+                st.error(f"{MESSAGES['error_loading']}{refresher.last_error}")
             return
-        
-        # Verificar que existen las columnas requeridas
-        required_parts_cols = ['cell_name', 'part_numbers', 'pieces_per_container', 'family']
-        missing_cols = [col for col in required_parts_cols if col not in parts_df.columns]
-        if missing_cols:
-            st.error(f"❌ Error: Faltan columnas en parts_data.csv: {missing_cols}")
-            st.stop()
-            
-        if 'Part No' not in prp_df.columns:
-            st.error("❌ Error: No se encontró la columna 'Part No' en prp.csv")
-            st.stop()
-            
     except Exception as e:
         st.error(f"❌ Error al validar datos: {str(e)}")
         return
+    
+    catalog = snapshot.catalog
+    
+    # Vista de una celda o de toda la planta (persistida en la URL)
+    url_view_mode = st.query_params.get("view", "cell")
+    view_mode = st.sidebar.radio(
+        "🖥️ Vista:",
+        options=list(VIEW_MODES),
+        format_func=lambda x: VIEW_MODES[x],
+        index=list(VIEW_MODES).index(url_view_mode) if url_view_mode in VIEW_MODES else 0,
+        key="view_mode_select",
+        help="Vista de planta: la secuencia de todas las celdas en una sola pantalla"
+    )
+    st.query_params["view"] = view_mode
+    run_every = refresh_interval if partial_refresh else None
+    
+    if view_mode == "plant":
+        st.fragment(run_every=run_every)(render_plant_overview)(refresher)
+        if auto_refresh_enabled and not partial_refresh:
+            add_auto_refresh(refresh_interval)
+        return
 
     # Sidebar para controles
     with st.sidebar:
         st.header("🏭 Selección de Producción")
         
         # Dropdown 1: Cell Name (sin repetir)
-        cell_names = sorted(parts_df['cell_name'].unique().tolist())
+        cell_names = catalog.cells
         
         # Solo usar query params como último recurso si no hay nada en session_state
         if "cell_selection" not in st.session_state:
@@ -752,7 +646,7 @@ def main():
         )
         
         # Dropdown 2: Family (tipos de familia)
-        families = sorted(parts_df['family'].unique().tolist())
+        families = catalog.families
         
         # Solo usar query params como último recurso si no hay nada en session_state
         if "family_selection" not in st.session_state:
@@ -789,99 +683,33 @@ def main():
                 "selected_family": selected_family
             })
 
-    # Filtrar por la celda y familia seleccionadas
-    filtered_parts = parts_df[
-        (parts_df['cell_name'] == selected_cell) & 
-        (parts_df['family'] == selected_family)
-    ]
-    
-    if filtered_parts.empty:
-        st.warning(f"⚠️ No se encontraron partes para la celda '{selected_cell}' y familia '{selected_family}'")
-        return
-    
-    # Obtener los números de parte para esta combinación
-    part_numbers = []
-    for _, row in filtered_parts.iterrows():
-        part_numbers_str = row['part_numbers']
-        part_numbers.extend([p.strip() for p in part_numbers_str.split(',')])
-    
-    # Análisis PRP
-    with st.spinner("🔍 Analizando datos de PRP..."):
-        prp_analysis = analyze_prp_for_cell(prp_df, part_numbers)
-        
-    
-    if not prp_analysis:
-        st.success("✅ No hay partes críticas para esta celda en este momento")
-        st.info("Todas las partes tienen suficiente inventario para cubrir los Customer Releases")
-        return
+    # Modo parcial: solo las tarjetas y el contador se vuelven a ejecutar en el intervalo;
+    # el resto de la página sigue montado
+    st.fragment(run_every=run_every)(render_production_sequence)(refresher, selected_cell, selected_family)
     
-    # Obtener TOP 3 partes críticas con lock de secuencia Kanban
-    top_3_parts = get_top_3_critical_parts_with_lock(prp_analysis, parts_df, st.session_state)
-    
-    if not top_3_parts:
-        st.success("✅ No hay partes críticas para esta celda en este momento")
-        return
+    # Capacidad opcional de la celda (programa contra rate_per_hour)
+    if st.checkbox("🏗️ Capacidad de la celda", value=False, key="show_cell_capacity"):
+        render_cell_capacity(snapshot, selected_cell)
     
-    # Mostrar TOP 3
-    st.markdown("## 🎯 SECUENCIA DE PRODUCCIÓN")
+    # Simulación what-if opcional para planeación
+    if st.checkbox("🎲 Simulación what-if", value=False, key="show_what_if"):
+        render_what_if(snapshot, selected_cell, selected_family)
     
-    # Indicador de secuencia bloqueada y pull ahead
-    if any(part.get('is_pull_ahead', False) for part in top_3_parts):
-        st.error("⚡ **PULL AHEAD DETECTADO**: Nueva demanda urgente encontrada. Secuencia recalculada automáticamente. ¡PRIORIDAD MÁXIMA!")
-    elif any(part.get('is_sequence_locked', False) for part in top_3_parts):
-        st.warning("🔒 **SECUENCIA BLOQUEADA**: Manteniendo orden original del día para evitar cambios innecesarios. La secuencia se recalculará al completar todas las partes del mismo día.")
+    # Historial opcional del faltante de la celda en las versiones anteriores del PRP
+    if st.checkbox("📈 Historial de faltantes", value=False, key="show_shortage_history"):
+        render_shortage_history(refresher, snapshot, selected_cell, selected_family)
     
-    cols = st.columns(3)
+    # Ranking opcional de toda la planta para planeación
+    if st.checkbox("📋 Ranking de partes críticas de la planta", value=False, key="show_plant_ranking"):
+        render_plant_ranking(snapshot, selected_family)
     
-    for i, part_info in enumerate(top_3_parts):
-        part_number = part_info['part_number']
-        containers = part_info['containers']
-        deficit = part_info['deficit']
-        
-        # Obtener color de fondo basado en visual_id
-        bg_color = get_visual_color(parts_df, part_number)
-        
-        # Obtener descripción de la parte
-        part_description = get_part_description(parts_df, part_number)
-        
-        # Indicador de agrupación Kanban (mismo día), bloqueo de secuencia, pull ahead, partes agrupadas y crítico HOY
-        kanban_indicator = ""
-        if part_info.get('is_pull_ahead', False):
-            kanban_indicator = "⚡ PULL AHEAD"
-        elif part_info.get('is_sequence_locked', False):
-            kanban_indicator = "🔒 SECUENCIA BLOQUEADA"
-        elif part_info.get('is_today_critical', False):
-            kanban_indicator = "🚨 CRÍTICO HOY"
-        elif part_info.get('is_grouped', False):
-            kanban_indicator = "📦 PARTE AGRUPADA"
-        elif part_info.get('is_same_day_group', False):
-            kanban_indicator = "🔗 MISMO DÍA"
-        
-        with cols[i]:
-            # Usar componentes nativos de Streamlit en lugar de HTML personalizado
-            with st.container():
-                # Badge de prioridad y título con indicador Kanban
-                priority_text = f"PRIORIDAD #{i+1}"
-                if kanban_indicator:
-                    priority_text += f"<br><span style='font-size: 10px;'>{kanban_indicator}</span>"
-                
-                st.markdown(f"<div style='background-color: #d73502; color: white; padding: 5px 10px; border-radius: 10px; text-align: center; margin-bottom: 10px;'><strong>{priority_text}</strong></div>", unsafe_allow_html=True)
-                
-                # Número de parte y descripción con color de fondo
-                part_display = f"<strong>{part_number}</strong>"
-                if part_description:
-                    part_display += f"<br><span style='font-size: 12px; opacity: 0.8;'>{part_description}</span>"
-                
-                st.markdown(f"<div style='background-color: {bg_color}; padding: 10px; border-radius: 10px; text-align: center; margin-bottom: 15px; border: 2px solid rgba(0,0,0,0.1);'>{part_display}</div>", unsafe_allow_html=True)
-                
-                # Número de contenedores grande
-                st.markdown(f"<div style='text-align: center; margin: 20px 0;'><div style='font-size: 64px; font-weight: 900; color: #d73502; margin: 0;'>{containers}</div><div style='font-size: 20px; color: #333; font-weight: bold;'>CONTENEDORES</div></div>", unsafe_allow_html=True)
-                
-                # Información del faltante sin fecha específica
-                st.markdown(f"<div style='background-color: rgba(215,53,2,0.1); padding: 10px; border-radius: 10px; text-align: center; border-top: 3px solid #d73502;'><strong style='color: #d73502;'>Faltante: {deficit:,} piezas</strong></div>", unsafe_allow_html=True)
+    # Panel opcional de tiempos por etapa, al final para incluir el dibujo de las tarjetas
+    with st.sidebar:
+        if st.checkbox("🩺 Diagnóstico de rendimiento", value=False, key="show_diagnostics"):
+            st.fragment(run_every=run_every)(render_diagnostics)()
 
     # Activar auto-refresh HTML al final, después de actualizar todos los params
-    if auto_refresh_enabled:
+    if auto_refresh_enabled and not partial_refresh:
         add_auto_refresh(refresh_interval)
 
 if __name__ == "__main__":
@@ -0,0 +1,163 @@
+"""Implementación original (parte por parte) del análisis y el ranking, usada como salida dorada.
+
+Se conserva tal cual para comprobar que los motores más rápidos producen exactamente los mismos resultados."""
+import math
+from datetime import datetime
+
+import pandas as pd
+
+def clean_number(value):
+    """Limpia números que pueden tener comas y los convierte a enteros"""
+    if pd.isna(value) or value == '' or value == 0:
+        return 0
+    try:
+        cleaned = str(value).replace(',', '').replace('$', '').strip()
+        return int(float(cleaned)) if cleaned else 0
+    except (ValueError, TypeError):
+        return 0
+
+def analyze_prp_for_cell(prp_df, part_numbers):
+    """Análisis original: filtra prp_df y simula el inventario día por día para cada parte"""
+    all_demands = []
+
+    for part_number in part_numbers:
+        part_data = prp_df[
+            (prp_df['Part No'] == part_number) &
+            (prp_df['Demand Type'] == 'Customer Releases')
+        ]
+        if part_data.empty:
+            continue
+
+        row = part_data.iloc[0]
+        inv_fg = clean_number(row.get('Inv FG', 0))
+        past_due = clean_number(row.get('Past Due', 0))
+        available_inventory = inv_fg - past_due
+
+        date_columns = [col for col in prp_df.columns if '/' in str(col) and col != 'Fecha De Actualizacion']
+        date_columns_sorted = sorted(date_columns, key=lambda x: pd.to_datetime(x, format='%m/%d/%Y'))
+
+        running_inventory = available_inventory
+        max_days_to_analyze = 30
+        days_analyzed = 0
+
+        for date_col in date_columns_sorted:
+            if days_analyzed >= max_days_to_analyze:
+                break
+            daily_demand = clean_number(row.get(date_col, 0))
+            if daily_demand > 0:
+                running_inventory -= daily_demand
+                if running_inventory < 0:
+                    all_demands.append({
+                        'part_number': part_number,
+                        'date': pd.to_datetime(date_col, format='%m/%d/%Y'),
+                        'demand': min(daily_demand, abs(running_inventory)),
+                        'inv_fg': inv_fg,
+                        'past_due': past_due
+                    })
+            days_analyzed += 1
+
+    if not all_demands:
+        return []
+
+    all_demands.sort(key=lambda x: x['date'])
+
+    # Agrupar corridas consecutivas de la misma parte
+    results = []
+    groups = []
+    for demand in all_demands:
+        if groups and groups[-1][0]['part_number'] == demand['part_number']:
+            groups[-1].append(demand)
+        else:
+            groups.append([demand])
+
+    for group in groups:
+        first_date = group[0]['date']
+        results.append({
+            'part_number': group[0]['part_number'],
+            'inv_fg': group[0]['inv_fg'],
+            'past_due': group[0]['past_due'],
+            'first_shortage_date': first_date,
+            'deficit': sum(d['demand'] for d in group),
+            'days_until_shortage': (first_date - pd.Timestamp.now()).days
+        })
+    return results
+
+def calculate_containers_needed(deficit, parts_df, part_number):
+    """Contenedores con búsqueda lineal en parts_df"""
+    part_info = parts_df[parts_df['part_numbers'] == part_number]
+    if part_info.empty:
+        return 0
+    container_size = clean_number(part_info.iloc[0]['pieces_per_container'])
+    if container_size <= 0:
+        return 0
+    return math.ceil(deficit / container_size)
+
+def get_top_3_critical_parts(prp_analysis, parts_df):
+    """Ranking original: hoy primero, día por día, agrupando dos días si el día tiene una sola parte"""
+    if len(prp_analysis) == 0:
+        return []
+
+    sorted_parts = sorted(prp_analysis, key=lambda x: (x['first_shortage_date'], -x['deficit']))
+    today = datetime.now().date()
+
+    daily_groups = {}
+    for part in sorted_parts:
+        daily_groups.setdefault(part['first_shortage_date'].date(), []).append(part)
+
+    sorted_dates = sorted(daily_groups.keys())
+    if today in daily_groups:
+        ordered_dates = [today] + [d for d in sorted_dates if d != today]
+    else:
+        ordered_dates = sorted_dates
+
+    result_sequence = []
+    processed_parts = set()
+
+    for i, current_date in enumerate(ordered_dates):
+        current_day_parts = daily_groups[current_date]
+
+        for part in sorted(current_day_parts, key=lambda x: -x['deficit']):
+            if part['part_number'] in processed_parts:
+                continue
+
+            part_number = part['part_number']
+            total_containers = calculate_containers_needed(part['deficit'], parts_df, part_number)
+            total_deficit = part['deficit']
+            grouped_days = 1
+
+            if len(current_day_parts) == 1 and i + 1 < len(ordered_dates):
+                next_day_parts = daily_groups[ordered_dates[i + 1]]
+                same_part_next_day = None
+                for next_part in next_day_parts:
+                    if next_part['part_number'] == part_number:
+                        same_part_next_day = next_part
+                        break
+                if same_part_next_day:
+                    total_containers += calculate_containers_needed(same_part_next_day['deficit'], parts_df, part_number)
+                    total_deficit += same_part_next_day['deficit']
+                    grouped_days = 2
+                    processed_parts.add(part_number)
+
+            final_part = part.copy()
+            final_part['containers'] = total_containers
+            final_part['deficit'] = total_deficit
+            final_part['kanban_group_date'] = current_date
+            final_part['kanban_sequence'] = len(result_sequence) + 1
+            if current_date == today:
+                final_part['is_today_critical'] = True
+            if grouped_days > 1:
+                final_part['is_grouped'] = True
+                final_part['grouped_containers'] = total_containers
+                final_part['grouped_days'] = grouped_days
+            if len(current_day_parts) > 1:
+                final_part['is_same_day_group'] = True
+
+            result_sequence.append(final_part)
+            processed_parts.add(part_number)
+            if len(result_sequence) >= 3:
+                break
+
+        if len(result_sequence) >= 3:
+            break
+
+    return result_sequence[:3]
@@ -0,0 +1,94 @@
+"""Replay de un día completo de versiones del PRP por el snapshot y el lock de secuencia.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/replay_day.py
+    python benchmarks/replay_day.py --parts 5000 --changes 0.02 --seed 3 --output-steps pasos.csv
+    python benchmarks/replay_day.py --parts-file data/parts_data.csv --history data/prp_history.sqlite --day 2025-01-08
+
+Sin --history genera un PRP sintético y 48 versiones (:05 y :35) con producción terminada y releases
+nuevos; con --history repite las versiones guardadas de ese día con su Fecha De Actualizacion. Reporta
+latencia por paso, churn de la secuencia, hits del lock y pull ahead. --verify corre el día dos veces y
+falla si las secuencias no son idénticas."""
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mixcell import analysis, replay, storage  # noqa: E402
+from mixcell.history import PRPHistoryStore  # noqa: E402
+from synthetic_data import generate_parts_data, generate_prp  # noqa: E402
+
+def load_catalog(args):
+    """Catálogo real (--parts-file) o sintético de --parts partes"""
+    if args.parts_file:
+        return analysis.PartCatalog(storage.load_parts_df(args.parts_file))
+    return analysis.PartCatalog(generate_parts_data(args.parts, seed=args.seed))
+
+def load_day(args, catalog, day):
+    """Versiones del PRP del día y la hora de cada una"""
+    if args.history:
+        history = PRPHistoryStore(args.history)
+        versions = history.versions(day, day + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1))
+        tables = [history.load_table(int(version_id)) for version_id in versions['version_id']]
+        return tables, list(versions['updated_at'])
+
+    prp_df = generate_prp(catalog.family_part_numbers(), n_days=args.days, dirty_fraction=0,
+                          start_date=day - pd.Timedelta(days=2), seed=args.seed)
+    prp_table = analysis.ingest_prp(prp_df, content_hash=f"replay-{args.seed}")
+    return replay.synthetic_day(prp_table, day, args.changes, seed=args.seed)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--parts', type=int, default=1000, help='Partes del catálogo sintético')
+    parser.add_argument('--parts-file', help='Usa este parts_data.csv en lugar del catálogo sintético')
+    parser.add_argument('--days', type=int, default=30, help='Columnas de fecha del PRP sintético')
+    parser.add_argument('--changes', type=float, default=0.01,
+                        help='Fracción de partes que cambian en cada versión sintética')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla del PRP y de los cambios')
+    parser.add_argument('--day', default='2025-01-08', help='Día simulado (YYYY-MM-DD)')
+    parser.add_argument('--history', help='Repite las versiones guardadas en este historial (prp_history.sqlite)')
+    parser.add_argument('--verify', action='store_true', help='Corre el día dos veces y compara las secuencias')
+    parser.add_argument('--output-steps', help='Guarda las métricas por paso en CSV')
+    parser.add_argument('--output-cells', help='Guarda la secuencia por paso y celda/familia en CSV')
+    args = parser.parse_args(argv)
+
+    day = pd.Timestamp(args.day).normalize()
+    catalog = load_catalog(args)
+    tables, times = load_day(args, catalog, day)
+    if not tables:
+        print(f"❌ No hay versiones del PRP para {day.date()}")
+        return 1
+
+    result = replay.replay(tables, catalog, times)
+    summary = result.summary()
+    print(f"{summary['steps']} versiones x {summary['cell_families']} celdas/familias "
+          f"en {summary['total_seconds']:.2f}s")
+    print(f"  por paso: p50={summary['step_p50_seconds'] * 1000:.1f}ms  "
+          f"p95={summary['step_p95_seconds'] * 1000:.1f}ms  max={summary['step_max_seconds'] * 1000:.1f}ms")
+    print(f"  churn={summary['churn_rate']:.2%} ({summary['sequence_changes']} cambios)  "
+          f"lock={summary['lock_hit_rate']:.2%} ({summary['lock_hits']} hits, {summary['lock_writes']} escrituras)  "
+          f"pull ahead={summary['pull_aheads']}")
+
+    if args.output_steps:
+        result.steps.to_csv(args.output_steps, index=False)
+        print(f"\nPasos guardados en {args.output_steps}")
+    if args.output_cells:
+        result.cells.to_csv(args.output_cells, index=False)
+        print(f"Secuencias guardadas en {args.output_cells}")
+
+    if args.verify:
+        again = replay.replay(tables, catalog, times)
+        columns = ['step', 'cell_name', 'family', 'sequence', 'locked', 'pull_ahead']
+        if not result.cells[columns].equals(again.cells[columns]):
+            print("\n❌ El replay no es determinista: las secuencias cambiaron entre corridas")
+            return 1
+        print("\n✅ Replay determinista: mismas secuencias en las dos corridas")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
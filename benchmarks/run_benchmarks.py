@@ -0,0 +1,177 @@
+"""Benchmarks del pipeline de análisis sobre PRP sintéticos de distintos tamaños.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --parts 100,1000,10000,50000 --days 30,90,365 --output resultados.csv
+
+Para cada tamaño mide cada etapa (mejor tiempo de --repeat corridas) y su pico de memoria con tracemalloc,
+reporta el exponente de escalamiento por etapa y compara contra la implementación original (salida dorada)
+en los tamaños pequeños."""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import reference  # noqa: E402
+from mixcell import analysis, locks, storage  # noqa: E402
+from mixcell.fetch import compute_file_hash  # noqa: E402
+from synthetic_data import write_dataset  # noqa: E402
+
+def measure(function, repeat):
+    """Mejor tiempo de repeat corridas y pico de memoria de una corrida adicional"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+def run_stages(parts_path, prp_path, repeat):
+    """Mide cada etapa del pipeline sobre un par de archivos"""
+    timings = {}
+
+    def stage(name, function):
+        seconds, peak, result = measure(function, repeat)
+        timings[name] = (seconds, peak)
+        return result
+
+    catalog = analysis.PartCatalog(storage.load_parts_df(parts_path))
+    cell_families = catalog.cell_families()
+    part_numbers = catalog.family_part_numbers()
+
+    content_hash = compute_file_hash(prp_path)
+    prp_df = stage('read_csv', lambda: pd.read_csv(prp_path))
+    prp_table = stage('ingest', lambda: analysis.ingest_prp(prp_df, content_hash=content_hash))
+    stage('read_pruned', lambda: analysis.read_prp_csv(prp_path, part_numbers))
+
+    def load_cold():
+        shutil.rmtree(storage.get_sidecar_folder(prp_path), ignore_errors=True)
+        return storage.load_prp_table(prp_path, content_hash, part_numbers)
+    stage('load_cold', load_cold)
+    stage('load_sidecar', lambda: storage.load_prp_table(prp_path, content_hash, part_numbers))
+
+    analyses = stage('analyze', lambda: {
+        key: analysis.analyze_prp_for_cell(prp_table, catalog.part_numbers(*key)) for key in cell_families
+    })
+    stage('rank', lambda: {
+        key: analysis.get_top_3_critical_parts(analyses[key], catalog) for key in cell_families
+    })
+    lock_store = locks.SequenceLockStore(os.path.join(os.path.dirname(prp_path), 'locks.sqlite'))
+    stage('rank_with_lock', lambda: {
+        key: locks.get_top_3_critical_parts_with_lock(analyses[key], catalog, lock_store, *key)
+        for key in cell_families
+    })
+    stage('all_sequences', lambda: analysis.compute_all_sequences(prp_table, catalog, workers=1))
+    stage('rank_plant', lambda: analysis.rank_plant_parts(prp_table, catalog))
+    stage('schedule', lambda: analysis.schedule_plant(prp_table, catalog))
+    stage('what_if', lambda: analysis.simulate_what_if(prp_table, catalog, scenarios=100, seed=0))
+    return timings, prp_df, catalog, analyses
+
+def check_golden(parts_path, prp_df, catalog, analyses):
+    """Compara análisis y ranking contra la implementación original; retorna la lista de diferencias"""
+    parts_df = pd.read_csv(parts_path)
+    differences = []
+
+    def strip(results):
+        return [{k: v for k, v in r.items() if k != 'days_until_shortage'} for r in results]
+
+    for key, cell_analysis in analyses.items():
+        expected = reference.analyze_prp_for_cell(prp_df, catalog.part_numbers(*key))
+        if strip(expected) != strip(cell_analysis):
+            differences.append(f"análisis {key}")
+            continue
+        expected_top = reference.get_top_3_critical_parts(expected, parts_df)
+        if strip(expected_top) != strip(analysis.get_top_3_critical_parts(cell_analysis, catalog)):
+            differences.append(f"ranking {key}")
+    return differences
+
+def scaling_exponent(sizes, seconds):
+    """Pendiente log-log del tiempo contra el tamaño (1 ≈ lineal)"""
+    if len(sizes) < 2:
+        return float('nan')
+    return np.polyfit(np.log(sizes), np.log(np.maximum(seconds, 1e-9)), 1)[0]
+
+def parse_list(text, cast=int):
+    return [cast(value) for value in text.split(',') if value]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--parts', default='100,1000,10000', help='Número de partes (lista separada por comas)')
+    parser.add_argument('--days', default='30,90,365', help='Columnas de fecha (lista separada por comas)')
+    parser.add_argument('--sparsity', type=float, default=0.7, help='Fracción de demanda en cero')
+    parser.add_argument('--dirty', type=float, default=0.1, help="Fracción de valores con comas y '$'")
+    parser.add_argument('--extra-parts', type=float, default=0,
+                        help='Partes de otras plantas en el export, como múltiplo de --parts')
+    parser.add_argument('--repeat', type=int, default=3, help='Corridas por etapa (se reporta la mejor)')
+    parser.add_argument('--golden-max-parts', type=int, default=1000,
+                        help='Tamaño máximo en el que se compara contra la implementación original')
+    parser.add_argument('--output', help='Guarda los resultados en CSV')
+    args = parser.parse_args(argv)
+
+    output_path = os.path.abspath(args.output) if args.output else None
+    rows = []
+    failures = []
+
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        # Los sidecars del cache binario se escriben relativos al directorio actual
+        os.chdir(folder)
+        os.makedirs('data', exist_ok=True)
+
+        for n_days in parse_list(args.days):
+            for n_parts in parse_list(args.parts):
+                parts_path, prp_path = write_dataset('data', n_parts, n_days, args.sparsity, args.dirty,
+                                                    extra_parts=int(n_parts * args.extra_parts))
+                timings, prp_df, catalog, analyses = run_stages(parts_path, prp_path, args.repeat)
+
+                golden = ''
+                if n_parts <= args.golden_max_parts:
+                    differences = check_golden(parts_path, prp_df, catalog, analyses)
+                    golden = 'ok' if not differences else f"{len(differences)} diferencias"
+                    failures.extend(f"{n_parts}x{n_days}: {d}" for d in differences)
+
+                for stage_name, (seconds, peak) in timings.items():
+                    rows.append({
+                        'parts': n_parts, 'days': n_days, 'stage': stage_name,
+                        'seconds': seconds, 'peak_mb': peak / 1e6, 'golden': golden
+                    })
+                summary = '  '.join(f"{name}={seconds * 1000:.1f}ms" for name, (seconds, _) in timings.items())
+                print(f"{n_parts:>6} partes x {n_days:>3} días  {summary}  dorado={golden or '-'}")
+        os.chdir(original_dir)
+
+    results = pd.DataFrame(rows)
+
+    print("\nExponente de escalamiento por etapa (tiempo ~ partes^k):")
+    for (n_days, stage_name), group in results.groupby(['days', 'stage'], sort=False):
+        exponent = scaling_exponent(group['parts'].to_numpy(), group['seconds'].to_numpy())
+        print(f"  {n_days:>3} días  {stage_name:<15} k={exponent:.2f}  pico={group['peak_mb'].max():.1f} MB")
+
+    if output_path:
+        results.to_csv(output_path, index=False)
+        print(f"\nResultados guardados en {output_path}")
+
+    if failures:
+        print("\n❌ La salida no coincide con la implementación original:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
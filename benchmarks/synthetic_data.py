@@ -0,0 +1,82 @@
+"""Generador de prp.csv y parts_data.csv sintéticos para medir el pipeline de análisis"""
+import numpy as np
+import pandas as pd
+
+VISUAL_IDS = ['Amarillo', 'Naranja', 'Rosa', 'Verde', 'Blanco', 'Verde Menta', 'Azul', 'Cafe Claro', '']
+FAMILIES = ['Produccion Regular', 'Servicios']
+DEMAND_TYPES = ['Customer Releases', 'Forecast']
+
+def generate_parts_data(n_parts, parts_per_cell=40, seed=0):
+    """parts_data.csv con n_parts partes repartidas en celdas de parts_per_cell partes"""
+    rng = np.random.default_rng(seed)
+    part_numbers = [f"FGSYN{i:06d}-SL" for i in range(n_parts)]
+    return pd.DataFrame({
+        'cell_name': [f"Celda {i // parts_per_cell:04d}" for i in range(n_parts)],
+        'part_numbers': part_numbers,
+        'description': [f"PARTE SINTETICA {i}" for i in range(n_parts)],
+        'rate_per_hour': rng.integers(20, 120, n_parts),
+        'pieces_per_container': rng.integers(10, 120, n_parts),
+        'family': rng.choice(FAMILIES, n_parts),
+        'visual_id': rng.choice(VISUAL_IDS, n_parts)
+    })
+
+def generate_prp(part_numbers, n_days=30, sparsity=0.7, dirty_fraction=0.1,
+                 start_date=None, extra_parts=0, seed=0):
+    """prp.csv con demanda aleatoria.
+
+    sparsity: fracción de celdas de demanda en cero (o vacías)
+    dirty_fraction: fracción de valores escritos con comas y '$' como en el export real
+    extra_parts: partes que no pertenecen a ninguna celda (otras plantas del export)
+    """
+    rng = np.random.default_rng(seed)
+    if start_date is None:
+        start_date = pd.Timestamp.now().normalize() - pd.Timedelta(days=2)
+    dates = pd.date_range(start_date, periods=n_days)
+    date_columns = [d.strftime('%m/%d/%Y') for d in dates]
+
+    all_parts = list(part_numbers) + [f"FGOTHER{i:06d}" for i in range(extra_parts)]
+    n_rows = len(all_parts) * len(DEMAND_TYPES)
+
+    demand = rng.integers(1, 2500, size=(n_rows, n_days))
+    demand[rng.random((n_rows, n_days)) < sparsity] = 0
+    inventory = rng.integers(0, 20000, n_rows)
+    past_due = np.where(rng.random(n_rows) < 0.2, rng.integers(0, 800, n_rows), 0)
+
+    columns = {
+        'Part No': np.repeat(all_parts, len(DEMAND_TYPES)),
+        'Demand Type': np.tile(DEMAND_TYPES, len(all_parts)),
+        'Inv FG': _dirty_values(inventory, dirty_fraction, rng),
+        'Past Due': _dirty_values(past_due, dirty_fraction, rng),
+        'Fecha De Actualizacion': pd.Timestamp.now().strftime('%m/%d/%Y %H:%M:%S')
+    }
+    # Las columnas de fecha del export no vienen en orden cronológico garantizado
+    for j in rng.permutation(n_days):
+        columns[date_columns[j]] = _dirty_values(demand[:, j], dirty_fraction, rng)
+    return pd.DataFrame(columns)
+
+def _dirty_values(values, dirty_fraction, rng):
+    """Escribe una fracción de los valores con comas/'$' y los ceros a veces como vacío"""
+    if dirty_fraction <= 0:
+        return values
+    result = values.astype(object)
+    dirty = np.flatnonzero(rng.random(len(values)) < dirty_fraction)
+    for i in dirty:
+        value = values[i]
+        if value == 0:
+            result[i] = ''
+        elif i % 2:
+            result[i] = f"{value:,}"
+        else:
+            result[i] = f"${value:,}"
+    return result
+
+def write_dataset(folder, n_parts, n_days, sparsity=0.7, dirty_fraction=0.1, seed=0, extra_parts=0):
+    """Escribe parts_data.csv y prp.csv en folder y retorna sus rutas"""
+    parts_df = generate_parts_data(n_parts, seed=seed)
+    prp_df = generate_prp(parts_df['part_numbers'], n_days=n_days, sparsity=sparsity,
+                          dirty_fraction=dirty_fraction, extra_parts=extra_parts, seed=seed)
+    parts_path = f"{folder}/parts_data.csv"
+    prp_path = f"{folder}/prp.csv"
+    parts_df.to_csv(parts_path, index=False)
+    prp_df.to_csv(prp_path, index=False)
+    return parts_path, prp_path
@@ -10,6 +10,17 @@
 
 GOOGLE_DRIVE_PRP_ID = "1TxKmxwy8QnUnTQTee77LgyooR_Fq1AGu"
 
+# URL de descarga directa ({file_id} se reemplaza por el ID del archivo)
+# Se puede apuntar a un servidor HTTP local para pruebas sin Google Drive
+GOOGLE_DRIVE_DOWNLOAD_URL = "https://drive.google.com/uc?export=download&id={file_id}"
+DOWNLOAD_TIMEOUT = 60  # Segundos máximos de espera de la descarga (sin recibir datos)
+DOWNLOAD_CONNECT_TIMEOUT = 10  # Segundos máximos para conectar
+DOWNLOAD_RETRIES = 2  # Reintentos ante errores de red o respuestas 5xx
+DOWNLOAD_RETRY_BACKOFF = 2  # Segundos antes del primer reintento (se duplica en cada uno)
+DOWNLOAD_DEADLINE = 300  # Segundos máximos de una descarga completa de cada fuente (con reintentos)
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024  # Tamaño de los bloques que se leen de la red
+DOWNLOAD_STREAM_CHUNKS = 16  # Bloques en tránsito entre la descarga y el parser (memoria acotada)
+
 # Configuración de actualización
 # La aplicación verifica Google Drive en horarios específicos:
 # - Minuto 05 de cada hora (10:05, 11:05, 12:05, etc.)
@@ -18,11 +29,74 @@ GOOGLE_DRIVE_PRP_ID = "1TxKmxwy8QnUnTQTee77LgyooR_Fq1AGu"
 AUTO_UPDATE_INTERVAL = 1800  # 30 minutos en segundos (mantenido para compatibilidad)
 CACHE_TTL = 300  # 5 minutos para el cache de Streamlit
 
+# Configuración del análisis
+MAX_DAYS_TO_ANALYZE = 30  # Analizar máximo 30 días (1 mes) hacia adelante
+MAX_CHANGE_LOG_ENTRIES = 20  # Cambios del último PRP que se muestran en la barra lateral
+PLANT_RANKING_SIZE = 50  # Partes en el ranking de toda la planta o por familia
+
+# Cálculo de secuencias en paralelo para PRP muy grandes
+# Las celdas se reparten entre procesos solo si el PRP tiene al menos SEQUENCE_WORKERS_MIN_PARTS partes
+SEQUENCE_WORKERS = 1  # 1 = todo en el proceso de la aplicación
+SEQUENCE_WORKERS_MIN_PARTS = 20000
+
+# Vista de planta: tarjetas compactas por fila
+OVERVIEW_COLUMNS = 4
+
+# Lock diario de la secuencia Kanban compartido por todas las pantallas (SQLite)
+LOCK_DB_PATH = "data/sequence_locks.sqlite"
+LOCK_RETENTION_DAYS = 7  # Días de locks que se conservan
+LOCK_CAS_RETRIES = 3  # Reintentos si otra pantalla cambió el lock al mismo tiempo
+
+# Historial de versiones del PRP (SQLite, filas deduplicadas); None lo desactiva
+HISTORY_DB_PATH = "data/prp_history.sqlite"
+HISTORY_RETENTION_DAYS = 30  # Días de versiones que se conservan
+
+# Programa de capacidad finita (usa rate_per_hour de parts_data.csv)
+CELL_HOURS_PER_DAY = 22.5  # Horas productivas por día de cada celda (3 turnos de 7.5 horas)
+SCHEDULE_DUE_HOUR = 24  # Hora del día del faltante en la que las piezas deben estar listas (24 = fin del día)
+
+# Simulación what-if (Monte Carlo de demanda e inventario)
+WHAT_IF_SCENARIOS = 1000  # Escenarios por simulación
+WHAT_IF_DEMAND_CV = 0.10  # Variabilidad de la demanda diaria (coeficiente de variación)
+WHAT_IF_PERCENTILES = (50, 90, 95)  # Percentiles de faltante reportados por parte y celda
+WHAT_IF_CHUNK_SIZE = 4_000_000  # Escenarios × partes × días por bloque (limita la memoria)
+WHAT_IF_SEED = 7  # Semilla fija en pantalla para que el resultado no cambie en cada refresh
+
 # Configuración de archivos
 DATA_FOLDER = "data"
 PRP_FILE_PATH = "data/prp.csv"
 PARTS_FILE_PATH = "data/parts_data.csv"
 
+# Exportaciones del PRP (por planta o cliente) que se descargan en paralelo y se combinan en un solo PRP
+# Cada fuente: "file_id" de Google Drive (o "url" directa), "path" de la copia local, "timeout"
+# (segundos sin recibir datos en cada intento) y "deadline" (segundos máximos de toda su descarga,
+# con reintentos; al pasarlo se usa su copia local). Si una parte aparece en varias fuentes, manda la primera
+PRP_SOURCES = {
+    "principal": {"file_id": GOOGLE_DRIVE_PRP_ID, "path": PRP_FILE_PATH, "timeout": DOWNLOAD_TIMEOUT,
+                  "deadline": DOWNLOAD_DEADLINE},
+}
+PRP_FETCH_WORKERS = 4  # Descargas simultáneas como máximo
+
+# Lectura del PRP: solo las columnas y filas que usa el análisis, por bloques
+PRP_CSV_BLOCK_BYTES = 8 * 1024 * 1024  # Tamaño de bloque del lector de pyarrow
+PRP_STREAM_BLOCK_BYTES = 1024 * 1024  # Tamaño de bloque al parsear una descarga en curso
+PRP_CSV_CHUNK_ROWS = 100_000  # Filas por bloque con pandas (si pyarrow no está instalado)
+
+# Cache binario columnar (.npy mapeados en memoria) generado a partir de los CSV
+# El CSV siempre es el respaldo si el cache no existe o no corresponde a la versión actual
+BINARY_CACHE_FOLDER = "data/cache"
+SIDECAR_FORMAT_VERSION = 1
+
+# API JSON de secuencias para pantallas e integraciones (MES, andon)
+# GET /api/sequence?cell=...&family=...  y  GET /api/cells
+SEQUENCE_API_ENABLED = True
+SEQUENCE_API_HOST = "0.0.0.0"
+SEQUENCE_API_PORT = 8502
+
+# Métricas de rendimiento por etapa (formato Prometheus)
+# También se sirven en GET /metrics del servidor de la API; None desactiva el archivo
+METRICS_FILE_PATH = "data/metrics.prom"
+
 # Mensajes del sistema
 MESSAGES = {
     "updating": "📡 Actualizando datos desde Google Drive...",
@@ -0,0 +1,59 @@
+"""Núcleo del sistema de producción MIX sin dependencias de Streamlit.
+
+Descarga, lectura, análisis, ranking y lock de secuencias para la aplicación web, la API, la CLI
+y los benchmarks. Los submódulos se importan al usarse: `import mixcell` no carga pandas ni numpy.
+
+    fetch     descarga condicional del PRP desde Google Drive
+    sources   varias fuentes del PRP descargadas en paralelo y combinadas
+    storage   cache binario columnar de los CSV
+    analysis  ingesta del PRP, faltantes, ranking, capacidad y what-if
+    locks     lock diario de la secuencia compartido entre pantallas
+    snapshot  snapshot de datos listo para mostrar y su hilo de actualización
+    history   historial de versiones del PRP con consultas por rango de tiempo
+    clock     hora actual reemplazable (replay y pruebas)
+    replay    replay determinista de un día de versiones del PRP por el lock
+    api       API JSON de secuencias
+    metrics   tiempos por etapa y exportación Prometheus
+"""
+import importlib
+
+# Nombre público → submódulo que lo define
+_EXPORTS = {
+    'METRICS': 'metrics',
+    'PRPTable': 'analysis',
+    'PartCatalog': 'analysis',
+    'read_prp_csv': 'analysis',
+    'ingest_prp': 'analysis',
+    'analyze_prp_for_cell': 'analysis',
+    'get_top_3_critical_parts': 'analysis',
+    'compute_all_sequences': 'analysis',
+    'rank_plant_parts': 'analysis',
+    'schedule_plant': 'analysis',
+    'simulate_what_if': 'analysis',
+    'SequenceLockStore': 'locks',
+    'get_top_3_critical_parts_with_lock': 'locks',
+    'load_parts_df': 'storage',
+    'load_prp_table': 'storage',
+    'download_prp_table': 'storage',
+    'SourcedPRP': 'sources',
+    'fetch_prp_sources': 'sources',
+    'get_prp_sources': 'sources',
+    'merge_prp_tables': 'analysis',
+    'DataSnapshot': 'snapshot',
+    'PRPRefresher': 'snapshot',
+    'build_snapshot': 'snapshot',
+    'get_locked_sequence': 'snapshot',
+    'PRPHistoryStore': 'history',
+    'CLOCK': 'clock',
+    'ReplayResult': 'replay',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module_name}"), name)
+    globals()[name] = value
+    return value
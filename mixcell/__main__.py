@@ -0,0 +1,6 @@
+"""Permite ejecutar la CLI por lotes con `python -m mixcell`"""
+import sys
+
+from mixcell.cli import main
+
+sys.exit(main())
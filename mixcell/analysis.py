@@ -0,0 +1,923 @@
+"""Análisis del PRP sin dependencias de Streamlit: ingesta, simulación de inventario, catálogo de partes y ranking.
+
+Vive en su propio módulo para que los procesos de cálculo en paralelo puedan importarlo."""
+import hashlib
+import heapq
+import importlib.util
+import io
+import math
+import multiprocessing
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+from config import *
+from mixcell.clock import CLOCK
+from mixcell.metrics import METRICS
+
+def clean_number(value):
+    """Limpia números que pueden tener comas y los convierte a enteros"""
+    if pd.isna(value) or value == '' or value == 0:
+        return 0
+    try:
+        # Convertir a string y remover comas
+        cleaned = str(value).replace(',', '').replace('$', '').strip()
+        return int(float(cleaned)) if cleaned else 0
+    except (ValueError, TypeError):
+        return 0
+
+def clean_number_array(values):
+    """Versión vectorizada de clean_number: limpia una columna completa y la convierte a enteros"""
+    series = pd.Series(values)
+    if not pd.api.types.is_numeric_dtype(series):
+        # Remover comas y símbolos de moneda en una sola pasada sobre la columna
+        series = (series.astype(str)
+                  .str.replace(',', '', regex=False)
+                  .str.replace('$', '', regex=False)
+                  .str.strip())
+        series = pd.to_numeric(series, errors='coerce')
+    numbers = series.to_numpy(dtype=float, na_value=np.nan)
+    # Valores vacíos o inválidos cuentan como 0, igual que clean_number
+    numbers = np.where(np.isfinite(numbers), numbers, 0)
+    return np.trunc(numbers).astype(np.int64)
+
+def get_date_columns(prp_df):
+    """Obtiene las columnas de fecha del PRP ordenadas cronológicamente"""
+    date_columns = [col for col in prp_df.columns if '/' in str(col) and col != 'Fecha De Actualizacion']
+    parsed_dates = pd.to_datetime(pd.Index(date_columns, dtype=object), format='%m/%d/%Y')
+    order = np.argsort(parsed_dates.to_numpy(), kind='stable')
+    return [date_columns[i] for i in order], parsed_dates[order]
+
+PRP_KEY_COLUMNS = ['Part No', 'Demand Type', 'Inv FG', 'Past Due', 'Fecha De Actualizacion']
+
+def select_prp_columns(columns, max_days=MAX_DAYS_TO_ANALYZE):
+    """Columnas del PRP que usa el análisis: las fijas y las primeras max_days fechas"""
+    for column in ['Part No', 'Demand Type']:
+        if column not in columns:
+            raise ValueError(f"No se encontró la columna '{column}' en prp.csv")
+    date_columns, _ = get_date_columns(pd.DataFrame(columns=columns))
+    selected = set(date_columns[:max_days]) | set(PRP_KEY_COLUMNS)
+    # Mismo orden que el archivo
+    return [column for column in columns if column in selected]
+
+def part_filter_key(part_numbers):
+    """Identificador del conjunto de partes con el que se filtró un PRP ('' = sin filtro)"""
+    if part_numbers is None:
+        return ""
+    return hashlib.sha256("\n".join(sorted(set(part_numbers))).encode('utf-8')).hexdigest()
+
+def _read_prp_arrow(source, columns, part_numbers, column_names=None):
+    """Lectura por bloques con el lector de CSV de pyarrow, filtrando cada bloque al llegar"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    
+    # Todo como texto: los tipos inferidos en el primer bloque pueden no servir para los siguientes
+    # ("1,234" o "$50" más abajo); clean_number_array convierte después solo las filas que quedan
+    # Bloques chicos en un flujo: cada uno se procesa mientras llega el siguiente
+    block_size = PRP_CSV_BLOCK_BYTES if column_names is None else PRP_STREAM_BLOCK_BYTES
+    reader = pa_csv.open_csv(
+        source,
+        read_options=pa_csv.ReadOptions(block_size=block_size, column_names=column_names or []),
+        convert_options=pa_csv.ConvertOptions(include_columns=columns,
+                                              column_types={column: pa.string() for column in columns})
+    )
+    wanted = pa.array(sorted(set(part_numbers)), type=pa.string()) if part_numbers is not None else None
+    batches = []
+    rows_read = 0
+    for batch in reader:
+        rows_read += batch.num_rows
+        mask = pc.equal(batch.column('Demand Type'), 'Customer Releases')
+        if wanted is not None:
+            mask = pc.and_(mask, pc.is_in(batch.column('Part No'), value_set=wanted))
+        batches.append(batch.filter(mask))
+    table = pa.Table.from_batches(batches, schema=reader.schema)
+    return table.to_pandas(), rows_read
+
+def _read_prp_pandas(source, columns, part_numbers, column_names=None):
+    """Lectura por bloques de filas con pandas, filtrando cada bloque al llegar"""
+    wanted = set(part_numbers) if part_numbers is not None else None
+    chunks = []
+    rows_read = 0
+    for chunk in pd.read_csv(source, names=column_names, usecols=columns, chunksize=PRP_CSV_CHUNK_ROWS,
+                             dtype={'Part No': str, 'Demand Type': str}):
+        rows_read += len(chunk)
+        mask = chunk['Demand Type'] == 'Customer Releases'
+        if wanted is not None:
+            mask &= chunk['Part No'].isin(wanted)
+        chunks.append(chunk[mask])
+    if not chunks:
+        return pd.DataFrame(columns=columns), rows_read
+    return pd.concat(chunks, ignore_index=True), rows_read
+
+def read_prp_csv(source, part_numbers=None, max_days=MAX_DAYS_TO_ANALYZE):
+    """Lee del PRP solo las columnas y filas que usa el análisis.
+    
+    Descarta durante la lectura los tipos de demanda distintos de Customer Releases y, si se dan
+    part_numbers, las partes que no están en el catálogo (otras plantas del export), así que la
+    memoria depende de las filas relevantes y no del tamaño del archivo. source es una ruta o un
+    flujo binario (una descarga en curso se parsea mientras llega). Usa pyarrow si está instalado.
+    Retorna el DataFrame filtrado y el número de filas leídas."""
+    column_names = None
+    if hasattr(source, 'read'):
+        # Un flujo no se puede leer dos veces: se toma la línea de encabezado y el resto se parsea con esos nombres
+        if not isinstance(source, io.BufferedIOBase):
+            source = io.BufferedReader(source)
+        column_names = pd.read_csv(io.BytesIO(source.readline()), nrows=0).columns.tolist()
+        header = column_names
+    else:
+        header = pd.read_csv(source, nrows=0).columns.tolist()
+    columns = select_prp_columns(header, max_days)
+    if importlib.util.find_spec('pyarrow') is None:
+        return _read_prp_pandas(source, columns, part_numbers, column_names)
+    return _read_prp_arrow(source, columns, part_numbers, column_names)
+
+# Arreglos de PRPTable que se congelan al crearla
+_PRP_ARRAYS = ('part_numbers', 'inv_fg', 'past_due', 'demand', 'row_hashes')
+
+@dataclass(frozen=True)
+class PRPTable:
+    """PRP tipado y normalizado: una fila por parte con Customer Releases.
+    
+    Una sola copia por proceso, compartida por todas las sesiones, el API y los cálculos: los
+    arreglos son vistas de solo lectura (sin copiar los datos) y el índice de partes está congelado,
+    así que nadie puede modificar por accidente los datos que ven las demás pantallas."""
+    part_numbers: np.ndarray  # Número de parte de cada fila
+    row_index: dict           # Número de parte → fila de la tabla (solo lectura)
+    inv_fg: np.ndarray        # Inventario FG por parte (int32)
+    past_due: np.ndarray      # Past Due por parte (int32)
+    dates: pd.DatetimeIndex   # Fechas de demanda en orden cronológico
+    demand: np.ndarray        # Demanda diaria partes × días (int32)
+    updated_at: object        # Fecha De Actualizacion del PRP (pd.Timestamp o None)
+    content_hash: str = ""    # Hash del contenido del archivo de origen
+    row_hashes: np.ndarray = None  # Hash por parte de los datos que usa el análisis
+    
+    def __post_init__(self):
+        for name in _PRP_ARRAYS:
+            array = getattr(self, name)
+            if isinstance(array, np.ndarray) and array.flags.writeable:
+                view = array.view()
+                view.flags.writeable = False
+                object.__setattr__(self, name, view)
+        if not isinstance(self.row_index, MappingProxyType):
+            object.__setattr__(self, 'row_index', MappingProxyType(self.row_index))
+    
+    def __reduce__(self):
+        # mappingproxy no se puede serializar: los procesos del pool reciben un dict y lo vuelven a congelar
+        values = {field.name: getattr(self, field.name) for field in fields(self)}
+        values['row_index'] = dict(self.row_index)
+        return (PRPTable, tuple(values.values()))
+
+def compute_row_hashes(inv_fg, past_due, dates, demand, max_days=MAX_DAYS_TO_ANALYZE):
+    """Hash por fila de todo lo que influye en el análisis de una parte (inventario, past due y ventana de días)"""
+    # Si la ventana de fechas se mueve, todas las filas cambian
+    window_hash = np.uint64(pd.util.hash_array(dates[:max_days].asi8).sum())
+    row_hashes = np.full(len(inv_fg), window_hash, dtype=np.uint64)
+    columns = [inv_fg, past_due] + [demand[:, j] for j in range(min(max_days, demand.shape[1]))]
+    with np.errstate(over='ignore'):
+        for column in columns:
+            row_hashes = row_hashes * np.uint64(1000003) ^ pd.util.hash_array(np.asarray(column))
+    return row_hashes
+
+def ingest_prp(prp_df, content_hash=""):
+    """Convierte el PRP crudo en una PRPTable tipada (se ejecuta una vez por versión del archivo)"""
+    for column in ['Part No', 'Demand Type']:
+        if column not in prp_df.columns:
+            raise ValueError(f"No se encontró la columna '{column}' en prp.csv")
+    
+    # Fecha de actualización como metadato (todas las filas tienen la misma fecha)
+    updated_at = None
+    if not prp_df.empty and 'Fecha De Actualizacion' in prp_df.columns:
+        updated_at = pd.to_datetime(prp_df['Fecha De Actualizacion'].iloc[0], errors='coerce')
+        if pd.isna(updated_at):
+            updated_at = None
+    
+    # Solo Customer Releases y la primera fila de cada parte
+    releases = prp_df[prp_df['Demand Type'] == 'Customer Releases']
+    releases = releases.drop_duplicates(subset='Part No', keep='first')
+    
+    part_numbers = releases['Part No'].to_numpy()
+    row_index = {part_number: i for i, part_number in enumerate(part_numbers)}
+    
+    def numeric_column(column):
+        if column in releases.columns:
+            return clean_number_array(releases[column]).astype(np.int32)
+        return np.zeros(len(releases), dtype=np.int32)
+    
+    date_columns, dates = get_date_columns(prp_df)
+    demand = np.zeros((len(releases), len(date_columns)), dtype=np.int32)
+    for j, date_col in enumerate(date_columns):
+        demand[:, j] = clean_number_array(releases[date_col])
+    # La demanda negativa no consume inventario
+    np.maximum(demand, 0, out=demand)
+    
+    inv_fg = numeric_column('Inv FG')
+    past_due = numeric_column('Past Due')
+    
+    return PRPTable(
+        part_numbers=part_numbers,
+        row_index=row_index,
+        inv_fg=inv_fg,
+        past_due=past_due,
+        dates=dates,
+        demand=demand,
+        updated_at=updated_at,
+        content_hash=content_hash,
+        row_hashes=compute_row_hashes(inv_fg, past_due, dates, demand)
+    )
+
+@METRICS.timed('merge_prp')
+def merge_prp_tables(tables):
+    """Combina las PRPTable de varias fuentes (fuente → tabla, en orden de prioridad) en una sola.
+    
+    Si una parte aparece en varias fuentes se toma la fila de la primera; las fechas son la unión
+    de las de todas (sin demanda en una fuente = 0). Con una sola fuente se retorna la misma tabla.
+    Retorna la tabla combinada y la fuente de cada una de sus filas."""
+    names = list(tables)
+    if not names:
+        raise ValueError("No hay tablas del PRP que combinar")
+    if len(names) == 1:
+        table = tables[names[0]]
+        return table, np.full(len(table.part_numbers), names[0], dtype=object)
+    
+    # Primera aparición de cada parte en el orden de las fuentes
+    all_parts = np.concatenate([np.asarray(tables[name].part_numbers, dtype=object) for name in names])
+    _, first_rows = np.unique(all_parts, return_index=True)
+    keep = np.zeros(len(all_parts), dtype=bool)
+    keep[first_rows] = True
+    METRICS.set_gauge('prp_duplicate_parts', len(all_parts) - len(first_rows))
+    
+    dates = tables[names[0]].dates
+    for name in names[1:]:
+        dates = dates.union(tables[name].dates)
+    
+    demand = np.zeros((len(first_rows), len(dates)), dtype=np.int32)
+    part_sources = np.empty(len(first_rows), dtype=object)
+    inv_fg, past_due = [], []
+    start = out = 0
+    for name in names:
+        table = tables[name]
+        rows = np.flatnonzero(keep[start:start + len(table.part_numbers)])
+        start += len(table.part_numbers)
+        end = out + len(rows)
+        demand[out:end][:, dates.get_indexer(table.dates)] = table.demand[rows]
+        part_sources[out:end] = name
+        inv_fg.append(table.inv_fg[rows])
+        past_due.append(table.past_due[rows])
+        out = end
+    
+    part_numbers = all_parts[keep]
+    inv_fg = np.concatenate(inv_fg).astype(np.int32)
+    past_due = np.concatenate(past_due).astype(np.int32)
+    updated = [tables[name].updated_at for name in names if tables[name].updated_at is not None]
+    content_hash = hashlib.sha256(
+        "\n".join(f"{name}:{tables[name].content_hash}" for name in names).encode('utf-8')
+    ).hexdigest()
+    
+    return PRPTable(
+        part_numbers=part_numbers,
+        row_index={part_number: i for i, part_number in enumerate(part_numbers)},
+        inv_fg=inv_fg,
+        past_due=past_due,
+        dates=dates,
+        demand=demand,
+        updated_at=max(updated) if updated else None,
+        content_hash=content_hash,
+        row_hashes=compute_row_hashes(inv_fg, past_due, dates, demand)
+    ), part_sources
+
+def compute_shortage_matrix(prp_table, rows, max_days=MAX_DAYS_TO_ANALYZE):
+    """Calcula el faltante diario de las filas indicadas simulando el inventario con cumsum"""
+    demand = prp_table.demand[rows, :max_days]
+    available_inventory = prp_table.inv_fg[rows].astype(np.int64) - prp_table.past_due[rows]
+    running_inventory = available_inventory[:, None] - np.cumsum(demand, axis=1, dtype=np.int64)
+    
+    # Solo los días con demanda y déficit generan faltante (máximo la demanda del día)
+    is_shortage = (demand > 0) & (running_inventory < 0)
+    return np.where(is_shortage, np.minimum(demand, -running_inventory), 0)
+
+@METRICS.timed('analyze')
+def analyze_part_lists(prp_table, part_lists):
+    """Análisis de varias listas de partes (celdas/familias) en una sola pasada vectorizada.
+    
+    Cada lista da el mismo resultado que analizarla por separado: los faltantes se recorren
+    por lista, luego por fecha y luego por orden de parte dentro de la lista."""
+    results = {key: [] for key in part_lists}
+    
+    # Filas de todas las listas concatenadas (una parte en varias celdas aparece varias veces)
+    keys = []
+    found_parts = []
+    list_ids = []
+    for key, part_numbers in part_lists.items():
+        # Solo las partes que tienen Customer Releases en el PRP
+        found = [p for p in part_numbers if p in prp_table.row_index]
+        found_parts.extend(found)
+        list_ids.extend([len(keys)] * len(found))
+        keys.append(key)
+    if not found_parts:
+        return results
+    
+    rows = np.fromiter((prp_table.row_index[p] for p in found_parts), dtype=np.intp, count=len(found_parts))
+    shortage = compute_shortage_matrix(prp_table, rows)
+    
+    # Recorrer los faltantes ordenados por lista, luego por fecha y luego por orden de parte
+    # (equivalente al sort estable por fecha del análisis parte por parte)
+    part_idx, day_idx = np.nonzero(shortage)
+    
+    # Si no hay demandas faltantes, retornar vacío
+    if part_idx.size == 0:
+        return results
+    
+    list_ids = np.asarray(list_ids, dtype=np.intp)
+    order = np.lexsort((part_idx, day_idx, list_ids[part_idx]))
+    part_idx = part_idx[order]
+    day_idx = day_idx[order]
+    amounts = shortage[part_idx, day_idx]
+    
+    # Agrupar demandas secuenciales por parte: cada cambio de parte (o de lista) inicia un grupo
+    # (una parte repetida en la lista se agrupa consigo misma, igual que por número de parte)
+    part_rows = rows[part_idx]
+    entry_lists = list_ids[part_idx]
+    is_new_group = (part_rows[1:] != part_rows[:-1]) | (entry_lists[1:] != entry_lists[:-1])
+    group_starts = np.flatnonzero(np.r_[True, is_new_group])
+    group_deficits = np.add.reduceat(amounts, group_starts)
+    
+    # Convertir a tipos de Python una sola vez: indexar el DatetimeIndex elemento por elemento es lento
+    # y todas las entradas de un mismo día comparten el mismo Timestamp
+    now = pd.Timestamp(CLOCK.now())
+    first_dates = list(prp_table.dates[:MAX_DAYS_TO_ANALYZE])
+    days_until = [(first_date - now).days for first_date in first_dates]
+    inv_fg = prp_table.inv_fg[rows].tolist()
+    past_due = prp_table.past_due[rows].tolist()
+    list_ids = list_ids.tolist()
+    
+    for position, day, total_demand in zip(part_idx[group_starts].tolist(), day_idx[group_starts].tolist(),
+                                           group_deficits.tolist()):
+        results[keys[list_ids[position]]].append({
+            'part_number': found_parts[position],
+            'inv_fg': inv_fg[position],
+            'past_due': past_due[position],
+            'first_shortage_date': first_dates[day],
+            'deficit': total_demand,
+            'days_until_shortage': days_until[day]
+        })
+    
+    return results
+
+def analyze_prp_for_cell(prp_table, part_numbers):
+    """Analiza el archivo PRP para obtener información de las partes con demanda secuencial inteligente.
+    
+    Atajo para una sola lista; las pantallas y compute_all_sequences usan analyze_part_lists
+    (donde se mide la etapa 'analyze')."""
+    return analyze_part_lists(prp_table, {None: part_numbers})[None]
+
+# Colores mejorados y más vibrantes para operadores
+VISUAL_COLORS = {
+    'Amarillo': '#FFE135',      # Amarillo brillante
+    'Naranja': '#FF8C42',       # Naranja vibrante
+    'Rosa': '#FF69B4',          # Rosa fuerte
+    'Verde': '#32CD32',         # Verde lima brillante
+    'Blanco': '#F5F5F5',        # Blanco suave
+    'Verde Menta': '#00E5A0',   # Verde menta brillante
+    'Azul': '#4169E1',          # Azul real vibrante
+    'Cafe Claro': '#D2B48C'     # Café claro beige
+}
+DEFAULT_VISUAL_COLOR = '#E8E8E8'  # Gris claro por defecto
+
+REQUIRED_PARTS_COLUMNS = ['cell_name', 'part_numbers', 'pieces_per_container', 'family']
+
+class PartCatalog:
+    """Índice de parts_data.csv con búsquedas O(1) por número de parte y por celda/familia"""
+    
+    def __init__(self, parts_df):
+        missing_cols = [col for col in REQUIRED_PARTS_COLUMNS if col not in parts_df.columns]
+        if missing_cols:
+            raise ValueError(f"Faltan columnas en parts_data.csv: {missing_cols}")
+        
+        self.cells = sorted(parts_df['cell_name'].unique().tolist())
+        self.families = sorted(parts_df['family'].unique().tolist())
+        
+        self._container_sizes = {}
+        self._rates = {}        # número de parte → piezas por hora de su celda
+        self._descriptions = {}
+        self._visual_colors = {}
+        self._cell_parts = {}   # (celda, familia) → números de parte en orden del archivo
+        self._family_parts = {} # familia → números de parte sin repetir en orden del archivo
+        self._part_cells = {}   # número de parte → [(celda, familia), ...]
+        
+        records = parts_df.to_dict('records')
+        for record in records:
+            key = (record['cell_name'], record['family'])
+            description = record.get('description', "")
+            visual_id = record.get('visual_id')
+            container_size = clean_number(record['pieces_per_container'])
+            rate_per_hour = clean_number(record.get('rate_per_hour', 0))
+            
+            # Expandir listas de partes separadas por comas
+            for part_number in str(record['part_numbers']).split(','):
+                part_number = part_number.strip()
+                self._cell_parts.setdefault(key, []).append(part_number)
+                family_parts = self._family_parts.setdefault(record['family'], {})
+                family_parts.setdefault(part_number, None)
+                
+                part_cells = self._part_cells.setdefault(part_number, [])
+                if key not in part_cells:
+                    part_cells.append(key)
+                
+                # Si una parte aparece varias veces, manda la primera fila
+                if part_number not in self._container_sizes:
+                    self._container_sizes[part_number] = container_size
+                    self._rates[part_number] = rate_per_hour
+                    self._descriptions[part_number] = description if pd.notna(description) else ""
+                    self._visual_colors[part_number] = VISUAL_COLORS.get(visual_id, DEFAULT_VISUAL_COLOR)
+        
+        # Compartido entre sesiones: las listas que se entregan son tuplas (nadie las modifica por accidente)
+        self.cells = tuple(self.cells)
+        self.families = tuple(self.families)
+        self._cell_parts = {key: tuple(parts) for key, parts in self._cell_parts.items()}
+        self._part_cells = {part_number: tuple(keys) for part_number, keys in self._part_cells.items()}
+    
+    def __contains__(self, part_number):
+        return part_number in self._container_sizes
+    
+    def part_numbers(self, cell_name, family):
+        """Números de parte de una combinación celda/familia"""
+        return self._cell_parts.get((cell_name, family), ())
+    
+    def family_part_numbers(self, family=None):
+        """Números de parte sin repetir de una familia (o de toda la planta)"""
+        if family is None:
+            return list(self._container_sizes)
+        return list(self._family_parts.get(family, {}))
+    
+    def cell_families(self):
+        """Todas las combinaciones (celda, familia) del catálogo"""
+        return list(self._cell_parts.keys())
+    
+    def cells_for_part(self, part_number):
+        """Combinaciones (celda, familia) que contienen una parte"""
+        return self._part_cells.get(part_number, ())
+    
+    def container_size(self, part_number):
+        """Piezas por contenedor de una parte (0 si no existe)"""
+        return self._container_sizes.get(part_number, 0)
+    
+    def rate_per_hour(self, part_number):
+        """Piezas por hora de una parte (0 si no existe o no tiene rate)"""
+        return self._rates.get(part_number, 0)
+    
+    def production_cell(self, part_number):
+        """Celda que produce la parte: la primera en la que aparece en parts_data.csv"""
+        part_cells = self._part_cells.get(part_number)
+        return part_cells[0][0] if part_cells else None
+    
+    def description(self, part_number):
+        """Descripción de una parte específica"""
+        return self._descriptions.get(part_number, "")
+    
+    def visual_color(self, part_number):
+        """Color visual basado en visual_id"""
+        return self._visual_colors.get(part_number, DEFAULT_VISUAL_COLOR)
+
+def calculate_containers_needed(deficit, catalog, part_number):
+    """Calcula cuántos contenedores se necesitan para una parte específica"""
+    # Buscar el tamaño del contenedor para esta parte
+    container_size = catalog.container_size(part_number)
+    
+    if container_size <= 0:
+        return 0
+    
+    # Calcular contenedores necesarios (redondear hacia arriba)
+    containers = math.ceil(deficit / container_size)
+    return containers
+
+@dataclass(slots=True)
+class RankedPart:
+    """Parte de la secuencia: datos del análisis más contenedores e indicadores Kanban"""
+    part_number: str
+    inv_fg: int
+    past_due: int
+    first_shortage_date: pd.Timestamp
+    deficit: int                      # Faltante total (incluye el día agrupado)
+    days_until_shortage: int
+    containers: int
+    kanban_group_date: object         # Día del faltante que ubicó la parte en la secuencia
+    kanban_sequence: int
+    is_today_critical: bool = False
+    is_same_day_group: bool = False   # El día tiene otras partes con faltante
+    grouped_days: int = 1             # 2 si se agrupó con el faltante del siguiente día
+    
+    @property
+    def is_grouped(self):
+        return self.grouped_days > 1
+    
+    def as_dict(self):
+        """Formato de diccionario que usan el lock de secuencia, la API y las tarjetas"""
+        part = {
+            'part_number': self.part_number,
+            'inv_fg': self.inv_fg,
+            'past_due': self.past_due,
+            'first_shortage_date': self.first_shortage_date,
+            'deficit': self.deficit,
+            'days_until_shortage': self.days_until_shortage,
+            'containers': self.containers,
+            'kanban_group_date': self.kanban_group_date,
+            'kanban_sequence': self.kanban_sequence
+        }
+        # Los indicadores solo aparecen cuando aplican
+        if self.is_today_critical:
+            part['is_today_critical'] = True
+        if self.is_grouped:
+            part['is_grouped'] = True
+            part['grouped_containers'] = self.containers
+            part['grouped_days'] = self.grouped_days
+        if self.is_same_day_group:
+            part['is_same_day_group'] = True
+        return part
+
+def rank_critical_parts(prp_analysis, catalog, k=3):
+    """Obtiene las k partes más críticas priorizando SIEMPRE el día actual primero.
+    
+    Selección parcial con heap: solo se ordena lo necesario para llegar a k partes."""
+    if len(prp_analysis) == 0 or k <= 0:
+        return []
+    
+    # Obtener fecha actual
+    today = CLOCK.today()
+    
+    # Clave de prioridad: día actual primero, luego fecha más cercana, mayor déficit,
+    # fecha exacta y orden original (desempate estable)
+    heap = []
+    day_sizes = Counter()     # Faltantes por día
+    day_index = {}            # (día, parte) → (orden por fecha exacta, posición) de su primer faltante ese día
+    days = {}                 # Timestamp (en ns) → día; hay pocas fechas distintas
+    for i, part in enumerate(prp_analysis):
+        first_date = part['first_shortage_date']
+        date_key = days.get(first_date.value)
+        if date_key is None:
+            date_key = days[first_date.value] = first_date.date()
+        heap.append((date_key != today, date_key, -part['deficit'], first_date, i))
+        day_sizes[date_key] += 1
+        order = (first_date, -part['deficit'], i)
+        index_key = (date_key, part['part_number'])
+        if index_key not in day_index or order < day_index[index_key]:
+            day_index[index_key] = order
+    heapq.heapify(heap)
+    
+    # Día que sigue a cada día en el orden de prioridad (hoy primero)
+    ordered_dates = sorted(day_sizes, key=lambda d: (d != today, d))
+    next_dates = dict(zip(ordered_dates, ordered_dates[1:]))
+    
+    # Análisis conservador día por día
+    result_sequence = []
+    processed_parts = set()
+    
+    while heap and len(result_sequence) < k:
+        _, current_date, _, _, i = heapq.heappop(heap)
+        part = prp_analysis[i]
+        part_number = part['part_number']
+        if part_number in processed_parts:
+            continue
+        
+        total_containers = calculate_containers_needed(part['deficit'], catalog, part_number)
+        total_deficit = part['deficit']
+        grouped_days = 1
+        
+        # SOLO si este día tiene UNA SOLA parte, buscar la MISMA parte en EL SIGUIENTE día
+        next_date = next_dates.get(current_date)
+        if day_sizes[current_date] == 1 and next_date is not None:
+            next_order = day_index.get((next_date, part_number))
+            if next_order is not None:
+                same_part_next_day = prp_analysis[next_order[-1]]
+                total_containers += calculate_containers_needed(same_part_next_day['deficit'], catalog, part_number)
+                total_deficit += same_part_next_day['deficit']
+                grouped_days = 2
+        
+        # Crear entrada (agrupada o individual)
+        result_sequence.append(RankedPart(
+            part_number=part_number,
+            inv_fg=part['inv_fg'],
+            past_due=part['past_due'],
+            first_shortage_date=part['first_shortage_date'],
+            deficit=total_deficit,
+            days_until_shortage=part['days_until_shortage'],
+            containers=total_containers,
+            kanban_group_date=current_date,
+            kanban_sequence=len(result_sequence) + 1,
+            is_today_critical=current_date == today,
+            is_same_day_group=day_sizes[current_date] > 1,
+            grouped_days=grouped_days
+        ))
+        processed_parts.add(part_number)
+    
+    return result_sequence
+
+def get_top_3_critical_parts(prp_analysis, catalog):
+    """Obtiene las 3 partes más críticas priorizando SIEMPRE el día actual primero"""
+    return [part.as_dict() for part in rank_critical_parts(prp_analysis, catalog, k=3)]
+
+def rank_plant_parts(prp_table, catalog, k=PLANT_RANKING_SIZE, family=None):
+    """TOP k de partes críticas de toda la planta (o de una familia) con la misma prioridad que cada celda"""
+    prp_analysis = analyze_prp_for_cell(prp_table, catalog.family_part_numbers(family))
+    return rank_critical_parts(prp_analysis, catalog, k=k)
+
+def compute_sequences(prp_table, catalog, cell_families):
+    """Análisis y secuencia de las combinaciones celda/familia indicadas en una sola pasada"""
+    analyses = analyze_part_lists(prp_table, {key: catalog.part_numbers(*key) for key in cell_families})
+    return {
+        key: {'analysis': prp_analysis, 'sequence': get_top_3_critical_parts(prp_analysis, catalog)}
+        for key, prp_analysis in analyses.items()
+    }
+
+# Datos compartidos con cada proceso del pool (se envían una vez por proceso, no por tarea)
+_WORKER_DATA = {}
+
+def _init_sequence_worker(prp_table, catalog):
+    _WORKER_DATA['prp_table'] = prp_table
+    _WORKER_DATA['catalog'] = catalog
+
+def _compute_sequences_chunk(cell_families):
+    return compute_sequences(_WORKER_DATA['prp_table'], _WORKER_DATA['catalog'], cell_families)
+
+def partition_cell_families(catalog, cell_families, n_chunks):
+    """Reparte las celdas/familias en n_chunks grupos de tamaño parecido (por número de partes)"""
+    chunks = [[] for _ in range(n_chunks)]
+    sizes = [0] * n_chunks
+    # La más grande al grupo más liviano
+    for key in sorted(cell_families, key=lambda key: -len(catalog.part_numbers(*key))):
+        smallest = sizes.index(min(sizes))
+        chunks[smallest].append(key)
+        sizes[smallest] += len(catalog.part_numbers(*key))
+    return [chunk for chunk in chunks if chunk]
+
+@METRICS.timed('compute_sequences')
+def compute_all_sequences(prp_table, catalog, cell_families=None, workers=None):
+    """Calcula el análisis y la secuencia de todas las combinaciones celda/familia (o solo las indicadas).
+    
+    Con workers > 1 y un PRP grande, las celdas se reparten entre procesos."""
+    if cell_families is None:
+        cell_families = catalog.cell_families()
+    cell_families = list(cell_families)
+    if workers is None:
+        workers = SEQUENCE_WORKERS if len(prp_table.part_numbers) >= SEQUENCE_WORKERS_MIN_PARTS else 1
+    workers = min(workers, len(cell_families), os.cpu_count() or 1)
+    
+    if workers <= 1:
+        return compute_sequences(prp_table, catalog, cell_families)
+    
+    results = {}
+    # spawn: el proceso de la aplicación tiene hilos (programador, API) y fork no es seguro con hilos
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_sequence_worker, initargs=(prp_table, catalog)) as pool:
+        for chunk_results in pool.map(_compute_sequences_chunk,
+                                      partition_cell_families(catalog, cell_families, workers)):
+            results.update(chunk_results)
+    # Mismo orden que el catálogo, como en el cálculo en un solo proceso
+    return {key: results[key] for key in cell_families}
+
+@dataclass(frozen=True)
+class PlantSchedule:
+    """Programa de capacidad finita de todas las celdas contra su rate por hora"""
+    jobs: pd.DataFrame        # Una fila por parte y día con faltante, en orden de producción por celda
+    cells: pd.DataFrame       # Resumen por celda (índice cell_name): horas, utilización y atrasos
+    computed_at: pd.Timestamp
+    
+    def cell_jobs(self, cell_name):
+        """Trabajos de una celda en orden de producción"""
+        return self.jobs[self.jobs['cell_name'] == cell_name]
+    
+    def cell_summary(self, cell_name):
+        """Resumen de una celda como diccionario (None si la celda no existe)"""
+        if cell_name not in self.cells.index:
+            return None
+        return self.cells.loc[cell_name].to_dict()
+
+@METRICS.timed('schedule')
+def schedule_plant(prp_table, catalog, now=None, hours_per_day=CELL_HOURS_PER_DAY, max_days=MAX_DAYS_TO_ANALYZE):
+    """Simula la cola de cada celda contra su rate por hora sobre el horizonte de análisis.
+    
+    Cada faltante diario de una parte es un trabajo; cada celda los produce uno tras otro por
+    fecha de faltante (y mayor faltante primero), empezando ahora. Todo el cálculo es vectorizado:
+    una suma acumulada por celda sobre los trabajos de toda la planta."""
+    now = pd.Timestamp(CLOCK.now()) if now is None else now
+    
+    # Cada parte se produce en una sola celda (la primera en la que aparece)
+    part_numbers = [p for p in catalog.family_part_numbers() if p in prp_table.row_index]
+    cell_codes = {cell_name: i for i, cell_name in enumerate(catalog.cells)}
+    part_cells = np.fromiter((cell_codes[catalog.production_cell(p)] for p in part_numbers),
+                             dtype=np.intp, count=len(part_numbers))
+    rates = np.fromiter((catalog.rate_per_hour(p) for p in part_numbers), dtype=float, count=len(part_numbers))
+    container_sizes = np.fromiter((catalog.container_size(p) for p in part_numbers),
+                                  dtype=float, count=len(part_numbers))
+    rows = np.fromiter((prp_table.row_index[p] for p in part_numbers), dtype=np.intp, count=len(part_numbers))
+    
+    # Trabajos: cada día con faltante de cada parte
+    shortage = compute_shortage_matrix(prp_table, rows, max_days)
+    part_idx, day_idx = np.nonzero(shortage)
+    pieces = shortage[part_idx, day_idx].astype(float)
+    job_cells = part_cells[part_idx]
+    job_rates = rates[part_idx]
+    
+    # Orden de producción por celda: fecha de faltante y luego mayor faltante;
+    # las partes sin rate no se pueden programar y quedan al final
+    has_rate = job_rates > 0
+    order = np.lexsort((-pieces, day_idx, ~has_rate, job_cells))
+    part_idx, day_idx, pieces = part_idx[order], day_idx[order], pieces[order]
+    job_cells, job_rates, has_rate = job_cells[order], job_rates[order], has_rate[order]
+    
+    # Horas de producción y suma acumulada reiniciada en cada celda
+    # (los trabajos están agrupados por celda: se resta lo acumulado por las celdas anteriores)
+    n_cells = len(catalog.cells)
+    hours = np.where(has_rate, pieces / np.where(has_rate, job_rates, 1), 0.0)
+    hours_required = np.bincount(job_cells, weights=hours, minlength=n_cells)
+    cell_offsets = np.cumsum(hours_required) - hours_required
+    finish_hours = np.cumsum(hours) - cell_offsets[job_cells]
+    start_hours = finish_hours - hours
+    
+    # Horas productivas → tiempo de reloj (la celda trabaja hours_per_day de cada 24 horas)
+    wall_clock = 24.0 / hours_per_day
+    hour_ns = 3600 * 10**9
+    not_scheduled = np.iinfo(np.int64).min  # NaT
+    start = np.where(has_rate, now.value + (start_hours * wall_clock * hour_ns).astype(np.int64), not_scheduled)
+    finish = np.where(has_rate, now.value + (finish_hours * wall_clock * hour_ns).astype(np.int64), not_scheduled)
+    dates = prp_table.dates[:max_days].to_numpy().astype('datetime64[ns]').astype(np.int64)
+    due = dates[day_idx] + int(SCHEDULE_DUE_HOUR * hour_ns)
+    is_late = has_rate & (finish > due)
+    late_hours = np.where(is_late, (finish - due) / hour_ns, 0.0)
+    
+    cell_names = np.array(catalog.cells, dtype=object)
+    part_array = np.array(part_numbers, dtype=object)
+    jobs = pd.DataFrame({
+        'cell_name': cell_names[job_cells],
+        'part_number': part_array[part_idx],
+        'shortage_date': pd.DatetimeIndex(dates[day_idx].astype('datetime64[ns]')),
+        'pieces': pieces.astype(np.int64),
+        'containers': np.where(container_sizes[part_idx] > 0,
+                               np.ceil(pieces / np.maximum(container_sizes[part_idx], 1)), 0).astype(np.int64),
+        'hours': np.where(has_rate, hours, np.nan),
+        'start': pd.DatetimeIndex(start.astype('datetime64[ns]')),
+        'finish': pd.DatetimeIndex(finish.astype('datetime64[ns]')),
+        'due': pd.DatetimeIndex(due.astype('datetime64[ns]')),
+        'is_late': is_late,
+        'late_hours': late_hours,
+        'has_rate': has_rate
+    })
+    
+    # Resumen por celda: carga contra las horas disponibles desde ahora (no antes de la primera fecha
+    # del PRP) hasta la hora de entrega del último día del horizonte
+    horizon_days = min(max_days, len(prp_table.dates))
+    hours_available = 0.0
+    if horizon_days:
+        horizon_start = max(now.value, int(dates[0]))
+        horizon_end = int(dates[horizon_days - 1]) + int(SCHEDULE_DUE_HOUR * hour_ns)
+        hours_available = max(0.0, (horizon_end - horizon_start) / hour_ns / wall_clock)
+    late_pairs = np.unique(np.stack([job_cells[is_late], part_idx[is_late]]), axis=1)
+    max_late_hours = np.zeros(n_cells)
+    np.maximum.at(max_late_hours, job_cells, late_hours)
+    cells = pd.DataFrame({
+        'jobs': np.bincount(job_cells, minlength=n_cells),
+        'hours_required': hours_required,
+        'hours_available': hours_available,
+        'utilization': hours_required / hours_available if hours_available else np.zeros(n_cells),
+        'late_jobs': np.bincount(job_cells, weights=is_late, minlength=n_cells).astype(np.int64),
+        'late_parts': np.bincount(late_pairs[0], minlength=n_cells),
+        'max_late_hours': max_late_hours,
+        'jobs_without_rate': np.bincount(job_cells, weights=~has_rate, minlength=n_cells).astype(np.int64)
+    }, index=pd.Index(catalog.cells, name='cell_name'))
+    
+    return PlantSchedule(jobs=jobs, cells=cells, computed_at=now)
+
+@dataclass(frozen=True)
+class WhatIfResult:
+    """Distribución del faltante por parte y por celda sobre los escenarios simulados"""
+    parts: pd.DataFrame       # Índice part_number: probabilidad de faltante y percentiles del faltante total
+    cells: pd.DataFrame       # Índice cell_name: lo mismo sumando las partes de cada celda
+    scenarios: int
+    computed_at: pd.Timestamp
+
+def _simulate_deficits(demand, inventory, past_due, rng, scenarios, demand_factor, demand_cv,
+                       delay_days, delay_probability):
+    """Faltante total de cada escenario y parte (escenarios × partes) para un bloque de partes.
+    
+    Solo los días con demanda mueven el inventario y pueden tener faltante, así que la simulación
+    trabaja sobre esas entradas (escenarios × días con demanda) con una suma acumulada por parte."""
+    deficits = np.zeros((scenarios, demand.shape[0]))
+    entry_parts, entry_days = np.nonzero(demand)
+    if entry_parts.size == 0:
+        return deficits
+    
+    # Demanda de cada escenario: ajuste fijo y ruido lognormal con media 1
+    values = demand[entry_parts, entry_days] * demand_factor
+    if demand_cv > 0:
+        sigma = math.sqrt(math.log1p(demand_cv ** 2))
+        noise = rng.standard_normal((scenarios, values.size), dtype=np.float32)
+        noise *= sigma
+        noise -= sigma ** 2 / 2
+        values = np.rint(values * np.exp(noise, out=noise))
+    else:
+        values = np.broadcast_to(np.rint(values), (scenarios, values.size))
+    
+    # Suma acumulada reiniciada en cada parte (las entradas vienen agrupadas por parte)
+    part_starts = np.flatnonzero(np.r_[True, entry_parts[1:] != entry_parts[:-1]])
+    part_counts = np.diff(np.r_[part_starts, entry_parts.size])
+    cumulative = np.cumsum(values, axis=1)
+    cumulative -= np.repeat(cumulative[:, part_starts] - values[:, part_starts], part_counts, axis=1)
+    
+    # Misma simulación de inventario que compute_shortage_matrix, con una dimensión de escenarios
+    running_inventory = (inventory - past_due)[entry_parts] - cumulative
+    if delay_days > 0 and delay_probability > 0:
+        # Si el embarque de FG se retrasa, el inventario no está disponible en los primeros días
+        is_delayed = rng.random((scenarios, demand.shape[0])) < delay_probability
+        is_missing = is_delayed[:, entry_parts] & (entry_days < delay_days)
+        running_inventory -= np.where(is_missing, inventory[entry_parts], 0)
+    
+    is_shortage = (values > 0) & (running_inventory < 0)
+    shortage = np.where(is_shortage, np.minimum(values, -running_inventory), 0)
+    deficits[:, entry_parts[part_starts]] = np.add.reduceat(shortage, part_starts, axis=1)
+    return deficits
+
+@METRICS.timed('what_if')
+def simulate_what_if(prp_table, catalog, part_numbers=None, scenarios=WHAT_IF_SCENARIOS, demand_change=0.0,
+                     demand_cv=WHAT_IF_DEMAND_CV, inventory_change=0.0, delay_days=0, delay_probability=0.0,
+                     seed=None, max_days=MAX_DAYS_TO_ANALYZE):
+    """Simulación Monte Carlo del faltante ante cambios de demanda e inventario.
+    
+    demand_change e inventory_change son cambios relativos (0.15 = +15%); delay_probability es la
+    probabilidad de que el inventario FG de una parte llegue delay_days días tarde. Todos los
+    escenarios de un bloque de partes se calculan en un solo arreglo escenarios × partes × días."""
+    if part_numbers is None:
+        part_numbers = catalog.family_part_numbers()
+    # Solo las partes que tienen Customer Releases en el PRP, sin repetir
+    part_numbers = [p for p in dict.fromkeys(part_numbers) if p in prp_table.row_index]
+    rows = np.fromiter((prp_table.row_index[p] for p in part_numbers), dtype=np.intp, count=len(part_numbers))
+    n_days = min(max_days, prp_table.demand.shape[1])
+    
+    # Celdas de cada parte (una parte en varias familias de la misma celda cuenta una vez)
+    cell_codes = {cell_name: i for i, cell_name in enumerate(catalog.cells)}
+    entry_parts = []
+    entry_cells = []
+    for i, part_number in enumerate(part_numbers):
+        for cell_code in dict.fromkeys(cell_codes[cell] for cell, _ in catalog.cells_for_part(part_number)):
+            entry_parts.append(i)
+            entry_cells.append(cell_code)
+    entry_parts = np.asarray(entry_parts, dtype=np.intp)
+    entry_cells = np.asarray(entry_cells, dtype=np.intp)
+    
+    # Bloques de partes para que escenarios × partes × días quepa en memoria
+    rng = np.random.default_rng(seed)
+    chunk_parts = max(1, WHAT_IF_CHUNK_SIZE // max(1, scenarios * n_days))
+    deficits = np.zeros((scenarios, len(part_numbers)))
+    for start in range(0, len(part_numbers), chunk_parts):
+        chunk_rows = rows[start:start + chunk_parts]
+        deficits[:, start:start + chunk_parts] = _simulate_deficits(
+            prp_table.demand[chunk_rows, :n_days].astype(float),
+            np.rint(prp_table.inv_fg[chunk_rows] * (1 + inventory_change)),
+            prp_table.past_due[chunk_rows].astype(float),
+            rng, scenarios, 1 + demand_change, demand_cv, delay_days, delay_probability
+        )
+    
+    # Totales por celda y escenario: suma de las partes de la celda
+    # (entradas ordenadas por celda y sumadas por tramos)
+    n_cells = len(catalog.cells)
+    cell_deficits = np.zeros((n_cells, scenarios))
+    cell_parts_short = np.zeros((n_cells, scenarios))
+    if entry_parts.size:
+        order = np.argsort(entry_cells, kind='stable')
+        sorted_cells = entry_cells[order]
+        cell_starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+        entry_deficits = deficits.T[entry_parts[order]]
+        cell_deficits[sorted_cells[cell_starts]] = np.add.reduceat(entry_deficits, cell_starts, axis=0)
+        cell_parts_short[sorted_cells[cell_starts]] = np.add.reduceat(entry_deficits > 0, cell_starts, axis=0)
+    
+    # Faltante del plan actual (sin cambios) para comparar
+    baseline = compute_shortage_matrix(prp_table, rows, max_days).sum(axis=1)
+    cell_baseline = np.bincount(entry_cells, weights=baseline[entry_parts], minlength=n_cells)
+    
+    def summarize(values, axis):
+        # Percentiles sobre la dimensión de escenarios
+        summary = {
+            'shortage_probability': (values > 0).mean(axis=axis) if scenarios else np.nan,
+            'mean_deficit': values.mean(axis=axis) if scenarios else np.nan
+        }
+        for q in WHAT_IF_PERCENTILES:
+            summary[f'deficit_p{q}'] = np.percentile(values, q, axis=axis) if scenarios else np.nan
+        return summary
+    
+    parts = pd.DataFrame({
+        'cell_name': [catalog.production_cell(p) for p in part_numbers],
+        'baseline_deficit': baseline.astype(np.int64),
+        **summarize(deficits, 0)
+    }, index=pd.Index(part_numbers, name='part_number'))
+    cells = pd.DataFrame({
+        'parts': np.bincount(entry_cells, minlength=n_cells),
+        'baseline_deficit': cell_baseline.astype(np.int64),
+        'expected_parts_short': cell_parts_short.mean(axis=1) if scenarios else np.nan,
+        **summarize(cell_deficits, 1)
+    }, index=pd.Index(catalog.cells, name='cell_name'))
+    
+    return WhatIfResult(parts=parts, cells=cells, scenarios=scenarios, computed_at=pd.Timestamp(CLOCK.now()))
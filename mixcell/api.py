@@ -0,0 +1,192 @@
+"""API HTTP ligera que sirve la secuencia de producción en JSON para pantallas e integraciones (MES, andon)"""
+import gzip
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from mixcell.clock import CLOCK
+from mixcell.metrics import METRICS
+
+# Indicadores Kanban que se exponen tal cual en la respuesta
+SEQUENCE_FLAGS = [
+    'is_pull_ahead',
+    'is_sequence_locked',
+    'is_today_critical',
+    'is_grouped',
+    'is_same_day_group'
+]
+
+def serialize_sequence(snapshot, cell_name, family, sequence):
+    """Convierte la secuencia (lista de dicts del análisis) a un documento JSON serializable"""
+    catalog = snapshot.catalog
+    updated_at = snapshot.prp_table.updated_at
+
+    parts = []
+    for i, part in enumerate(sequence):
+        parts.append({
+            'priority': i + 1,
+            'part_number': part['part_number'],
+            'description': catalog.description(part['part_number']),
+            'containers': int(part['containers']),
+            'deficit': int(part['deficit']),
+            'first_shortage_date': part['first_shortage_date'].strftime('%Y-%m-%d'),
+            'flags': {flag: bool(part.get(flag, False)) for flag in SEQUENCE_FLAGS}
+        })
+
+    return {
+        'cell': cell_name,
+        'family': family,
+        'prp_updated_at': updated_at.isoformat() if updated_at is not None else None,
+        'prp_hash': snapshot.prp_table.content_hash,
+        'sequence': parts
+    }
+
+class SequenceAPI:
+    """Respuestas JSON precalculadas por snapshot y versión del lock: cada consulta repetida es una
+    búsqueda en diccionario"""
+
+    def __init__(self, get_snapshot, get_sequence, get_lock_version=None):
+        self._get_snapshot = get_snapshot          # () → snapshot activo o None
+        self._get_sequence = get_sequence          # (snapshot, celda, familia) → secuencia con lock
+        self._get_lock_version = get_lock_version  # (celda, familia) → versión del lock del día (o None)
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._responses = {}                       # clave → (versión, (etag, body, body_gzip))
+
+    def _encode(self, document, version=None):
+        body = json.dumps(document, ensure_ascii=False).encode('utf-8')
+        # La versión del lock entra en el ETag: si alguien rompe o reescribe el lock cambia aunque
+        # el cuerpo fuera igual
+        etag = '"%s"' % hashlib.sha1(repr(version).encode('utf-8') + body).hexdigest()
+        return etag, body, gzip.compress(body, compresslevel=6)
+
+    def _cached(self, key, build, version=None):
+        """Respuesta codificada del snapshot activo; build(snapshot) solo se llama una vez por snapshot
+        y por valor de version() (p. ej. la versión del lock de la celda)"""
+        snapshot = self._get_snapshot()
+        if snapshot is None:
+            return None
+
+        with self._lock:
+            # Nuevo snapshot: las respuestas anteriores ya no son válidas
+            if snapshot is not self._snapshot:
+                self._snapshot = snapshot
+                self._responses = {}
+
+            current = version() if version is not None else None
+            cached = self._responses.get(key)
+            if cached is None or cached[0] != current:
+                document = build(snapshot)
+                # Se guarda con la versión leída antes de build: si build escribió el lock (primera
+                # consulta del día) la siguiente consulta ve otra versión y se reconstruye con el lock guardado
+                cached = (current, self._encode(document, current) if document is not None else None)
+                self._responses[key] = cached
+            return cached[1]
+
+    def get_cells(self):
+        """Lista de combinaciones celda/familia disponibles"""
+        return self._cached('cells', lambda snapshot: {
+            'cells': [{'cell': cell, 'family': family} for cell, family in snapshot.catalog.cell_families()]
+        })
+
+    def get_sequence(self, cell_name, family):
+        """Respuesta codificada de una celda/familia, o None si no existe"""
+        def build(snapshot):
+            if (cell_name, family) not in snapshot.sequences:
+                return None
+            sequence = self._get_sequence(snapshot, cell_name, family)
+            document = serialize_sequence(snapshot, cell_name, family, sequence)
+            document['generated_at'] = CLOCK.now().isoformat(timespec='seconds')
+            return document
+
+        version = None
+        if self._get_lock_version is not None:
+            version = lambda: self._get_lock_version(cell_name, family)
+        return self._cached(('sequence', cell_name, family), build, version)
+
+class SequenceRequestHandler(BaseHTTPRequestHandler):
+    """Atiende /api/sequence?cell=...&family=..., /api/cells (ETag/304 y gzip) y /metrics (Prometheus)"""
+    protocol_version = "HTTP/1.1"
+    api = None
+
+    def log_message(self, format, *args):
+        pass  # Cientos de consultas por segundo: sin log por petición
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+
+        if url.path == '/api/sequence':
+            cell_name = params.get('cell', [None])[0]
+            family = params.get('family', [None])[0]
+            if not cell_name or not family:
+                self._send_error(400, "Se requieren los parámetros 'cell' y 'family'")
+                return
+            response = self.api.get_sequence(cell_name, family)
+            if response is None:
+                self._send_error(404, f"No existe la celda '{cell_name}' con familia '{family}' o no hay datos")
+                return
+        elif url.path == '/metrics':
+            self._send_text(METRICS.render_prometheus())
+            return
+        elif url.path == '/api/cells':
+            response = self.api.get_cells()
+            if response is None:
+                self._send_error(503, "Datos no disponibles todavía")
+                return
+        else:
+            self._send_error(404, "Ruta no encontrada")
+            return
+
+        self._send_json(*response)
+
+    def _send_json(self, etag, body, body_gzip):
+        if self.headers.get('If-None-Match') == etag:
+            METRICS.increment('api_responses_total', status=304)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+        payload = body_gzip if use_gzip else body
+        METRICS.increment('api_responses_total', status=200)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_text(self, text):
+        body = text.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        METRICS.increment('api_responses_total', status=status)
+        body = json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_sequence_api(api, host, port):
+    """Arranca el servidor HTTP en un hilo de fondo y lo retorna"""
+    handler = type('BoundSequenceRequestHandler', (SequenceRequestHandler,), {'api': api})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="sequence-api", daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,179 @@
+"""Cálculo por lotes de las secuencias de todas las celdas, sin navegador (cron, ETL).
+
+Uso (desde la raíz del repositorio):
+    python -m mixcell --output secuencias.csv
+    python -m mixcell --prp export.csv --parts data/parts_data.csv --output secuencias.parquet --workers 4
+    python -m mixcell --output secuencias.json --analysis-output faltantes.csv --lock-db data/sequence_locks.sqlite
+
+Usa el mismo análisis y ranking que las pantallas (compute_all_sequences), así que los números coinciden."""
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+from config import *
+from mixcell.analysis import PartCatalog, compute_all_sequences, ingest_prp, read_prp_csv
+from mixcell.api import SEQUENCE_FLAGS, serialize_sequence
+from mixcell.clock import CLOCK
+from mixcell.fetch import compute_file_hash
+from mixcell.locks import SequenceLockStore
+from mixcell.metrics import METRICS
+from mixcell.snapshot import DataSnapshot, get_locked_sequence
+from mixcell.storage import load_parts_df
+
+OUTPUT_FORMATS = ['csv', 'json', 'parquet']
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m mixcell',
+        description='Calcula faltantes y secuencias de todas las celdas/familias y las guarda en CSV, JSON o Parquet'
+    )
+    parser.add_argument('--prp', default=PRP_FILE_PATH, help=f'Archivo PRP (default: {PRP_FILE_PATH})')
+    parser.add_argument('--parts', default=PARTS_FILE_PATH, help=f'Catálogo de partes (default: {PARTS_FILE_PATH})')
+    parser.add_argument('--output', required=True, help="Archivo de salida de las secuencias ('-' = salida estándar)")
+    parser.add_argument('--analysis-output', help='Archivo de salida con todos los faltantes por parte')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS,
+                        help='Formato de salida (default: según la extensión del archivo, CSV si no se reconoce)')
+    parser.add_argument('--workers', type=int,
+                        help='Procesos para el cálculo (default: SEQUENCE_WORKERS si el PRP es grande)')
+    parser.add_argument('--cell', help='Solo esta celda')
+    parser.add_argument('--family', help='Solo esta familia')
+    parser.add_argument('--lock-db', help='Aplica el lock diario de secuencia de las pantallas (archivo SQLite)')
+    parser.add_argument('--metrics', help='Guarda los tiempos por etapa en formato Prometheus')
+    parser.add_argument('--quiet', action='store_true', help='No muestra el resumen de tiempos')
+    return parser
+
+def detect_format(path, output_format=None):
+    """Formato explícito o según la extensión del archivo"""
+    if output_format:
+        return output_format
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    return extension if extension in OUTPUT_FORMATS else 'csv'
+
+def load_batch_snapshot(prp_path, parts_path, cell_name=None, family=None, workers=None):
+    """Snapshot a partir de archivos dados (sin descarga), opcionalmente de una celda/familia.
+
+    El catálogo se carga igual que en las pantallas (load_parts_df: vacíos como '' y todo como texto)."""
+    with METRICS.timed('cli_load_parts'):
+        catalog = PartCatalog(load_parts_df(parts_path))
+    cell_families = [
+        key for key in catalog.cell_families()
+        if (cell_name is None or key[0] == cell_name) and (family is None or key[1] == family)
+    ]
+    if not cell_families:
+        raise ValueError("No hay celdas/familias que coincidan con el filtro")
+    with METRICS.timed('cli_load_prp'):
+        prp_df, rows_read = read_prp_csv(prp_path, catalog.family_part_numbers())
+        prp_table = ingest_prp(prp_df, content_hash=compute_file_hash(prp_path))
+    METRICS.set_gauge('prp_csv_rows', rows_read)
+    METRICS.set_gauge('prp_rows', len(prp_table.part_numbers))
+
+    sequences = compute_all_sequences(prp_table, catalog, cell_families=cell_families, workers=workers)
+    return DataSnapshot(
+        catalog=catalog,
+        parts_version=None,
+        prp_table=prp_table,
+        sequences=sequences,
+        sequences_date=CLOCK.today(),
+        built_at=CLOCK.now()
+    )
+
+def sequence_rows(snapshot, sequences):
+    """Una fila por parte de cada secuencia (para CSV y Parquet)"""
+    rows = []
+    for (cell_name, family), sequence in sequences.items():
+        document = serialize_sequence(snapshot, cell_name, family, sequence)
+        for part in document['sequence']:
+            flags = part.pop('flags')
+            rows.append({'cell_name': cell_name, 'family': family, **part, **flags,
+                         'prp_updated_at': document['prp_updated_at']})
+    columns = ['cell_name', 'family', 'priority', 'part_number', 'description', 'containers', 'deficit',
+               'first_shortage_date'] + SEQUENCE_FLAGS + ['prp_updated_at']
+    return pd.DataFrame(rows, columns=columns)
+
+def analysis_rows(snapshot):
+    """Una fila por parte con faltante de cada celda/familia (el análisis completo detrás de la secuencia)"""
+    rows = []
+    for (cell_name, family), results in snapshot.sequences.items():
+        for part in results['analysis']:
+            rows.append({
+                'cell_name': cell_name,
+                'family': family,
+                'part_number': part['part_number'],
+                'inv_fg': part['inv_fg'],
+                'past_due': part['past_due'],
+                'first_shortage_date': part['first_shortage_date'].strftime('%Y-%m-%d'),
+                'deficit': part['deficit'],
+                'days_until_shortage': part['days_until_shortage']
+            })
+    columns = ['cell_name', 'family', 'part_number', 'inv_fg', 'past_due', 'first_shortage_date', 'deficit',
+               'days_until_shortage']
+    return pd.DataFrame(rows, columns=columns)
+
+def write_table(table, path, output_format, document=None):
+    """Escribe una tabla en el formato pedido; en JSON usa document si se da"""
+    if output_format == 'json':
+        text = json.dumps(document if document is not None else table.to_dict('records'), ensure_ascii=False, indent=2)
+        if path == '-':
+            sys.stdout.write(text + "\n")
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+    elif output_format == 'parquet':
+        # Requiere pyarrow (se instala con Streamlit)
+        table.to_parquet(sys.stdout.buffer if path == '-' else path, index=False)
+    else:
+        table.to_csv(sys.stdout if path == '-' else path, index=False)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    started = time.perf_counter()
+
+    try:
+        snapshot = load_batch_snapshot(args.prp, args.parts, cell_name=args.cell, family=args.family,
+                                       workers=args.workers)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    # Secuencia como en pantalla: con el lock del día si se pidió
+    with METRICS.timed('cli_rank'):
+        if args.lock_db:
+            lock_store = SequenceLockStore(args.lock_db)
+            sequences = {key: get_locked_sequence(snapshot, lock_store, *key) for key in snapshot.sequences}
+        else:
+            sequences = {key: results['sequence'] for key, results in snapshot.sequences.items()}
+
+    try:
+        with METRICS.timed('cli_write'):
+            output_format = detect_format(args.output, args.format)
+            updated_at = snapshot.prp_table.updated_at
+            write_table(sequence_rows(snapshot, sequences), args.output, output_format, document={
+                'generated_at': CLOCK.now().isoformat(timespec='seconds'),
+                'prp_updated_at': updated_at.isoformat() if updated_at is not None else None,
+                'prp_hash': snapshot.prp_table.content_hash,
+                'sequences': [serialize_sequence(snapshot, cell_name, family, sequence)
+                              for (cell_name, family), sequence in sequences.items()]
+            })
+            if args.analysis_output:
+                write_table(analysis_rows(snapshot), args.analysis_output,
+                            detect_format(args.analysis_output, args.format))
+    except (OSError, ImportError) as e:
+        print(f"Error al escribir la salida: {e}", file=sys.stderr)
+        return 1
+
+    total = time.perf_counter() - started
+    if args.metrics:
+        METRICS.observe('cli_total', total)
+        METRICS.write_prometheus(args.metrics)
+    if not args.quiet:
+        timings = METRICS.timings()
+        stages = ['cli_load_parts', 'cli_load_prp', 'compute_sequences', 'cli_rank', 'cli_write']
+        summary = "  ".join(f"{stage.replace('cli_', '')}={timings[stage]['last']:.2f}s"
+                            for stage in stages if stage in timings)
+        print(f"{len(sequences)} celdas/familias, {len(snapshot.prp_table.part_numbers):,} partes del PRP  "
+              f"{summary}  total={total:.2f}s", file=sys.stderr)
+    return 0
@@ -0,0 +1,51 @@
+"""Hora actual del análisis, el lock de secuencia y el contador de actualización.
+
+Por defecto es la hora del sistema; el replay (y las pruebas) la reemplazan para repetir un día
+completo de forma determinista."""
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+class Clock:
+    """Reloj del proceso con una fuente de hora reemplazable"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._source = None   # Función sin argumentos que retorna la hora simulada; None = hora del sistema
+
+    def now(self):
+        source = self._source
+        return source() if source is not None else datetime.now()
+
+    def today(self):
+        return self.now().date()
+
+    def time(self):
+        """Hora actual como timestamp (segundos), igual que time.time()"""
+        return self.now().timestamp()
+
+    @contextmanager
+    def use(self, source):
+        """Usa source() como hora actual dentro del bloque (afecta a todo el proceso)"""
+        with self._lock:
+            previous = self._source
+            self._source = source
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._source = previous
+
+class ManualClock:
+    """Fuente de hora que solo avanza cuando se le indica (para el replay)"""
+
+    def __init__(self, now):
+        self.current = now
+
+    def __call__(self):
+        return self.current
+
+    def set(self, now):
+        self.current = now
+
+CLOCK = Clock()
@@ -0,0 +1,302 @@
+"""Descarga condicional del PRP desde Google Drive y versión de los archivos locales.
+
+requests y gdown se importan solo al descargar: el servidor, la CLI y los procesos de cálculo
+arrancan sin cargarlos."""
+import hashlib
+import io
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from config import *
+from mixcell.clock import CLOCK
+from mixcell.metrics import METRICS
+
+# Resultados posibles de una descarga condicional
+DOWNLOAD_UPDATED = "updated"      # Contenido nuevo, archivo reemplazado
+DOWNLOAD_UNCHANGED = "unchanged"  # Mismo contenido, archivo local intacto
+DOWNLOAD_FAILED = "failed"        # Error de red o de Google Drive
+
+class DownloadDeadlineExceeded(TimeoutError):
+    """La descarga (con sus reintentos) pasó de su tiempo máximo total"""
+
+def check_deadline(deadline):
+    """Lanza DownloadDeadlineExceeded si ya pasó deadline (time.monotonic(); None = sin límite)"""
+    if deadline is not None and time.monotonic() > deadline:
+        raise DownloadDeadlineExceeded("La descarga excedió su tiempo máximo")
+
+def remaining_timeout(timeout, deadline):
+    """Timeout de lectura recortado al tiempo que le queda a la descarga"""
+    if deadline is None:
+        return timeout
+    return max(0.001, min(timeout, deadline - time.monotonic()))
+
+def get_meta_path(file_path):
+    """Ruta del archivo de metadatos de descarga (ETag, Last-Modified, hash)"""
+    return f"{file_path}.meta.json"
+
+def read_download_meta(file_path):
+    """Lee los metadatos de la última descarga de un archivo"""
+    try:
+        with open(get_meta_path(file_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_download_meta(file_path, meta):
+    """Guarda los metadatos de descarga de forma atómica"""
+    meta_path = get_meta_path(file_path)
+    tmp_path = f"{meta_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+def get_last_check_time(file_path):
+    """Momento de la última verificación contra Google Drive (aunque el contenido no haya cambiado)"""
+    checked_at = read_download_meta(file_path).get('checked_at')
+    if checked_at:
+        return datetime.fromtimestamp(checked_at)
+    return datetime.fromtimestamp(os.path.getmtime(file_path))
+
+def fetch_if_changed(url, output_path, timeout=DOWNLOAD_TIMEOUT, deadline=None):
+    """Descarga url a un archivo temporal y reemplaza output_path atómicamente solo si el contenido cambió.
+    
+    Pasado deadline (time.monotonic()) lanza DownloadDeadlineExceeded sin tocar output_path."""
+    meta = read_download_meta(output_path) if os.path.exists(output_path) else {}
+    
+    import requests
+    
+    headers = get_conditional_headers(meta)
+    
+    # Archivo temporal en la misma carpeta para que el reemplazo sea atómico
+    output_dir = os.path.dirname(output_path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix='.download-', suffix='.tmp')
+    os.close(fd)
+    try:
+        with requests.get(url, headers=headers, stream=True, timeout=remaining_timeout(timeout, deadline)) as response:
+            if response.status_code == 304:
+                meta['checked_at'] = CLOCK.time()
+                write_download_meta(output_path, meta)
+                return DOWNLOAD_UNCHANGED
+            response.raise_for_status()
+            
+            if response.headers.get('Content-Type', '').startswith('text/html'):
+                # Google Drive pide confirmación para archivos grandes: gdown sabe resolverla
+                import gdown
+                gdown.download(url, tmp_path, quiet=True)
+                content_hash = compute_file_hash(tmp_path)
+                METRICS.increment('download_bytes_total', os.path.getsize(tmp_path))
+            else:
+                digest = hashlib.sha256()
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        check_deadline(deadline)
+                        f.write(chunk)
+                        digest.update(chunk)
+                        METRICS.increment('download_bytes_total', len(chunk))
+                content_hash = digest.hexdigest()
+            
+            new_meta = get_response_meta(response, content_hash)
+        
+        # gdown no tiene límite de tiempo: una fuente que ya se dio por fallida no reemplaza su copia local
+        check_deadline(deadline)
+        return replace_if_changed(tmp_path, output_path, meta, new_meta)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def get_conditional_headers(meta):
+    """Petición condicional cuando el servidor nos dio ETag/Last-Modified"""
+    headers = {}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+    return headers
+
+def get_response_meta(response, content_hash):
+    """Metadatos de descarga de una respuesta completa"""
+    return {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'sha256': content_hash,
+        'checked_at': CLOCK.time()
+    }
+
+def replace_if_changed(tmp_path, output_path, meta, new_meta):
+    """Reemplaza output_path con la descarga en tmp_path solo si el contenido cambió"""
+    # Comparar contra el contenido actual antes de tocar el archivo
+    current_hash = meta.get('sha256')
+    if current_hash is None and os.path.exists(output_path):
+        current_hash = compute_file_hash(output_path)
+    
+    if current_hash == new_meta['sha256']:
+        write_download_meta(output_path, new_meta)
+        return DOWNLOAD_UNCHANGED
+    
+    # Reemplazo atómico: otras sesiones nunca ven el archivo faltante o a medias
+    os.replace(tmp_path, output_path)
+    write_download_meta(output_path, new_meta)
+    return DOWNLOAD_UPDATED
+
+class DownloadStream(io.RawIOBase):
+    """Flujo de solo lectura con los bytes de una descarga en curso.
+    
+    El hilo de descarga entrega bloques con feed() y el lector (el parser) los consume con read();
+    la cola es acotada, así que la red nunca se adelanta más de max_chunks bloques al parser."""
+    
+    def __init__(self, max_chunks=DOWNLOAD_STREAM_CHUNKS):
+        super().__init__()
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._pending = memoryview(b"")
+        self._finished = False
+        self._abandoned = threading.Event()
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        while not self._pending:
+            if self._finished:
+                return 0
+            item = self._queue.get()
+            if item is None or isinstance(item, BaseException):
+                self._finished = True
+                if item is not None:
+                    raise item
+                return 0
+            self._pending = memoryview(item)
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+    
+    def feed(self, item):
+        """Entrega un bloque, None (fin) o la excepción de la descarga; False si ya nadie lee"""
+        while not self._abandoned.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def close(self):
+        # El lector terminó (o falló): la descarga sigue solo hacia el archivo
+        self._abandoned.set()
+        super().close()
+
+def _write_download(response, tmp_path, stream, outcome, deadline=None):
+    """Hilo de descarga: escribe la copia local, calcula el hash y alimenta el flujo del parser"""
+    digest = hashlib.sha256()
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                # Una fuente lenta que sigue mandando datos no puede pasar de su tiempo máximo
+                check_deadline(deadline)
+                f.write(chunk)
+                digest.update(chunk)
+                METRICS.increment('download_bytes_total', len(chunk))
+                stream.feed(chunk)
+        # Bytes recibidos por la red (menos que los escritos si el servidor comprimió)
+        METRICS.increment('download_wire_bytes_total', response.raw.tell())
+        outcome['sha256'] = digest.hexdigest()
+        stream.feed(None)
+    except Exception as e:
+        outcome['error'] = e
+        stream.feed(e)
+
+def _stream_download_once(requests, url, output_path, consume, timeout, deadline=None):
+    meta = read_download_meta(output_path) if os.path.exists(output_path) else {}
+    headers = get_conditional_headers(meta)
+    headers['Accept-Encoding'] = 'gzip'  # requests descomprime al leer
+    
+    timeouts = (remaining_timeout(DOWNLOAD_CONNECT_TIMEOUT, deadline), remaining_timeout(timeout, deadline))
+    with requests.get(url, headers=headers, stream=True, timeout=timeouts) as response:
+        if response.status_code == 304:
+            meta['checked_at'] = CLOCK.time()
+            write_download_meta(output_path, meta)
+            return DOWNLOAD_UNCHANGED, None, meta.get('sha256')
+        response.raise_for_status()
+        
+        if response.headers.get('Content-Type', '').startswith('text/html'):
+            # Google Drive pide confirmación para archivos grandes: descarga completa con gdown, sin streaming
+            response.close()
+            return fetch_if_changed(url, output_path, timeout, deadline), None, None
+        
+        output_dir = os.path.dirname(output_path) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix='.download-', suffix='.tmp')
+        os.close(fd)
+        try:
+            stream = DownloadStream()
+            outcome = {}
+            writer = threading.Thread(target=_write_download, args=(response, tmp_path, stream, outcome, deadline),
+                                      name="prp-download", daemon=True)
+            writer.start()
+            value = None
+            parse_error = None
+            try:
+                value = consume(stream)
+            except Exception as e:
+                parse_error = e
+            finally:
+                stream.close()
+            writer.join()
+            
+            # Un error de red manda sobre el del parser (que solo vio el flujo cortado)
+            if 'error' in outcome:
+                raise outcome['error']
+            if parse_error is not None:
+                raise parse_error
+            
+            # Pasado el tiempo máximo no se reemplaza la copia local (la fuente se da por fallida)
+            check_deadline(deadline)
+            new_meta = get_response_meta(response, outcome['sha256'])
+            return replace_if_changed(tmp_path, output_path, meta, new_meta), value, outcome['sha256']
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+def stream_download(url, output_path, consume, timeout=DOWNLOAD_TIMEOUT, retries=DOWNLOAD_RETRIES,
+                    deadline=None):
+    """Descarga url entregando los bytes a consume(flujo) mientras llegan, y guarda la copia local.
+    
+    consume (p. ej. el parser del PRP) corre en el hilo que llama mientras un hilo de fondo lee la red,
+    calcula el hash y escribe la copia, que reemplaza output_path solo si el contenido cambió.
+    Los errores de red y las respuestas 5xx se reintentan hasta retries veces con espera creciente.
+    deadline (time.monotonic()) limita la descarga completa con sus reintentos: al pasarlo se lanza
+    DownloadDeadlineExceeded y la copia local queda intacta.
+    Retorna (resultado, valor de consume o None si no se llamó, hash del contenido)."""
+    import requests
+    
+    for attempt in range(retries + 1):
+        check_deadline(deadline)
+        try:
+            return _stream_download_once(requests, url, output_path, consume, timeout, deadline)
+        except requests.RequestException as e:
+            check_deadline(deadline)
+            status = e.response.status_code if e.response is not None else None
+            if attempt == retries or (status is not None and status < 500):
+                raise
+            METRICS.increment('download_retries_total')
+            backoff = DOWNLOAD_RETRY_BACKOFF * 2 ** attempt
+            if deadline is not None:
+                backoff = min(backoff, max(0.0, deadline - time.monotonic()))
+            time.sleep(backoff)
+
+def compute_file_hash(file_path, chunk_size=1024 * 1024):
+    """Calcula el hash SHA-256 del contenido de un archivo"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get_file_version(file_path):
+    """Identifica la versión de un archivo por su fecha de modificación y tamaño"""
+    stat = os.stat(file_path)
+    return (stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,345 @@
+"""Historial de versiones del PRP en SQLite: filas deduplicadas por contenido y consultas por rango de tiempo"""
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from config import *
+from mixcell.analysis import PRPTable, compute_row_hashes, compute_shortage_matrix
+from mixcell.clock import CLOCK
+from mixcell.metrics import METRICS
+
+# Máximo de partes por consulta IN (límite de variables de SQLite)
+_QUERY_BATCH = 500
+
+# Formato de las tablas (PRAGMA user_version); un historial de otro formato se reinicia
+_SCHEMA_VERSION = 2
+
+def _day_numbers(dates):
+    """Día absoluto de cada fecha (días desde 1970), sin depender de la unidad del DatetimeIndex"""
+    return dates.to_numpy().astype('datetime64[D]').astype(np.int32)
+
+def compute_history_row_hashes(prp_table, max_days=MAX_DAYS_TO_ANALYZE):
+    """Hash por fila independiente de la ventana: inventario, past due y la demanda de cada fecha.
+
+    Los días sin demanda no cuentan, así que una parte que no cambió conserva su hash cuando
+    el export recorre sus columnas de fecha de un día al siguiente."""
+    dates = prp_table.dates[:max_days]
+    date_hashes = pd.util.hash_array(_day_numbers(dates).astype(np.int64))
+    demand_hashes = np.zeros(len(prp_table.part_numbers), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for j in range(len(dates)):
+            column = np.asarray(prp_table.demand[:, j], dtype=np.int64)
+            pair_hashes = pd.util.hash_array(pd.util.hash_array(column) * np.uint64(1000003) ^ date_hashes[j])
+            # Suma (módulo 2**64) sobre los días con demanda: no depende de la posición de la columna
+            demand_hashes += np.where(column != 0, pair_hashes, np.uint64(0))
+        row_hashes = pd.util.hash_array(np.asarray(prp_table.inv_fg))
+        for column in (np.asarray(prp_table.past_due), demand_hashes):
+            row_hashes = row_hashes * np.uint64(1000003) ^ pd.util.hash_array(column)
+    return row_hashes
+
+class PRPHistoryStore:
+    """Cada versión descargada del PRP, indexada por Fecha De Actualizacion.
+
+    Las filas se guardan una sola vez por contenido (inventario, past due y demanda por fecha, sin
+    depender de la ventana de fechas de la versión) y cada versión solo registra las partes que
+    cambiaron contra la anterior; el estado de una parte en una versión es su último cambio
+    anterior o igual. Cada fila guarda además su faltante total y
+    fecha de primer faltante, así que las trayectorias no necesitan volver a simular."""
+
+    def __init__(self, db_path=HISTORY_DB_PATH, retention_days=HISTORY_RETENTION_DAYS):
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self._local = threading.local()
+        self._record_lock = threading.Lock()
+        self._state = None         # (version_id, {parte: row_hash}) de la última versión guardada
+        self._purged_day = None
+        connection = self._connection()
+        if connection.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+            # Las filas de otro formato no se pueden reconstruir con este: el historial empieza de nuevo
+            connection.executescript("""
+                DROP TABLE IF EXISTS prp_changes;
+                DROP TABLE IF EXISTS prp_rows;
+                DROP TABLE IF EXISTS prp_versions;
+            """)
+            connection.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS prp_versions (
+                version_id INTEGER PRIMARY KEY,
+                content_hash TEXT NOT NULL UNIQUE,
+                updated_at TEXT NOT NULL,
+                recorded_at REAL NOT NULL,
+                dates TEXT NOT NULL,
+                parts INTEGER NOT NULL,
+                changed_parts INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS prp_versions_updated_at ON prp_versions (updated_at);
+            CREATE TABLE IF NOT EXISTS prp_rows (
+                row_hash INTEGER PRIMARY KEY,
+                inv_fg INTEGER NOT NULL,
+                past_due INTEGER NOT NULL,
+                demand_days BLOB NOT NULL,
+                demand BLOB NOT NULL,
+                deficit INTEGER NOT NULL,
+                first_shortage_date TEXT
+            );
+            CREATE TABLE IF NOT EXISTS prp_changes (
+                part_number TEXT NOT NULL,
+                version_id INTEGER NOT NULL,
+                row_hash INTEGER,
+                PRIMARY KEY (part_number, version_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS prp_changes_version ON prp_changes (version_id);
+        """)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # Autocommit: las escrituras de varias sentencias usan BEGIN/COMMIT explícitos
+            connection = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _latest_state(self, connection):
+        """Versión más reciente y el row_hash vigente de cada parte en ella"""
+        latest = connection.execute("SELECT MAX(version_id) FROM prp_versions").fetchone()[0]
+        if self._state is not None and self._state[0] == latest:
+            return self._state
+        state = {}
+        if latest is not None:
+            # SQLite toma row_hash de la fila con el MAX(version_id) de cada parte
+            state = {
+                part_number: row_hash for part_number, _, row_hash in connection.execute(
+                    "SELECT part_number, MAX(version_id), row_hash FROM prp_changes GROUP BY part_number"
+                ) if row_hash is not None
+            }
+        return latest, state
+
+    def record(self, prp_table, max_days=MAX_DAYS_TO_ANALYZE):
+        """Guarda una versión del PRP (si no estaba guardada) y retorna su version_id"""
+        connection = self._connection()
+        with self._record_lock:
+            existing = connection.execute(
+                "SELECT version_id FROM prp_versions WHERE content_hash = ?", (prp_table.content_hash,)
+            ).fetchone()
+            if existing is not None:
+                return existing[0]
+
+            latest, state = self._latest_state(connection)
+            part_numbers = prp_table.part_numbers.tolist()
+            # Los hashes son uint64: SQLite guarda enteros con signo
+            row_hashes = compute_history_row_hashes(prp_table, max_days).view(np.int64).tolist()
+            changed = [i for i, (p, h) in enumerate(zip(part_numbers, row_hashes)) if state.get(p) != h]
+            removed = set(state) - set(part_numbers)
+
+            # Faltante y primer faltante solo de las filas que cambiaron
+            dates = prp_table.dates[:max_days]
+            rows = np.asarray(changed, dtype=np.intp)
+            shortage = compute_shortage_matrix(prp_table, rows, max_days)
+            deficits = shortage.sum(axis=1).tolist()
+            has_shortage = shortage.any(axis=1)
+            first_days = np.argmax(shortage > 0, axis=1) if shortage.size else np.zeros(len(rows), dtype=np.intp)
+            demand = np.asarray(prp_table.demand[rows, :max_days], dtype=np.int32)
+            # Demanda de cada fila solo en los días con demanda, con el día absoluto (días desde 1970)
+            days = _day_numbers(dates)
+            nonzero = demand != 0
+            date_strings = [d.strftime('%Y-%m-%d') for d in dates]
+
+            updated_at = prp_table.updated_at if prp_table.updated_at is not None else pd.Timestamp(CLOCK.now())
+            new_state = dict(state)
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = connection.execute(
+                    "INSERT INTO prp_versions (content_hash, updated_at, recorded_at, dates, parts, changed_parts) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (prp_table.content_hash, updated_at.isoformat(), CLOCK.now().timestamp(),
+                     json.dumps(date_strings), len(part_numbers), len(changed) + len(removed))
+                )
+                version_id = cursor.lastrowid
+                connection.executemany(
+                    "INSERT OR IGNORE INTO prp_rows VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    ((row_hashes[i], int(prp_table.inv_fg[i]), int(prp_table.past_due[i]),
+                      days[nonzero[k]].tobytes(), demand[k][nonzero[k]].tobytes(),
+                      deficits[k], date_strings[first_days[k]] if has_shortage[k] else None)
+                     for k, i in enumerate(changed))
+                )
+                connection.executemany(
+                    "INSERT INTO prp_changes VALUES (?, ?, ?)",
+                    [(part_numbers[i], version_id, row_hashes[i]) for i in changed] +
+                    [(part_number, version_id, None) for part_number in removed]
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+            for i in changed:
+                new_state[part_numbers[i]] = row_hashes[i]
+            for part_number in removed:
+                del new_state[part_number]
+            self._state = (version_id, new_state)
+            METRICS.increment('history_rows_total', len(changed), result='changed')
+            METRICS.increment('history_rows_total', len(part_numbers) - len(changed), result='unchanged')
+
+        if CLOCK.today() != self._purged_day:
+            self.purge()
+        return version_id
+
+    def versions(self, start=None, end=None):
+        """Versiones guardadas entre start y end (Fecha De Actualizacion), de la más antigua a la más nueva"""
+        query = "SELECT version_id, updated_at, content_hash, parts, changed_parts FROM prp_versions"
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("updated_at >= ?")
+            params.append(pd.Timestamp(start).isoformat())
+        if end is not None:
+            conditions.append("updated_at <= ?")
+            params.append(pd.Timestamp(end).isoformat())
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        versions = pd.read_sql_query(query + " ORDER BY updated_at, version_id", self._connection(), params=params)
+        versions['updated_at'] = pd.to_datetime(versions['updated_at'])
+        return versions
+
+    def parts_history(self, part_numbers, start=None, end=None):
+        """Estado de cada parte en cada versión del rango: una fila por versión y parte presente en el PRP"""
+        columns = ['version_id', 'updated_at', 'part_number', 'inv_fg', 'past_due', 'deficit', 'first_shortage_date']
+        versions = self.versions(start, end)
+        part_numbers = list(dict.fromkeys(part_numbers))
+        if versions.empty or not part_numbers:
+            return pd.DataFrame(columns=columns)
+        first, last = int(versions['version_id'].min()), int(versions['version_id'].max())
+
+        # Cambios dentro del rango más el último cambio anterior de cada parte (su estado al inicio)
+        connection = self._connection()
+        changes = []
+        for start_index in range(0, len(part_numbers), _QUERY_BATCH):
+            batch = part_numbers[start_index:start_index + _QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            changes.extend(connection.execute(
+                f"SELECT part_number, version_id, row_hash FROM prp_changes "
+                f"WHERE part_number IN ({placeholders}) AND version_id BETWEEN ? AND ?",
+                batch + [first, last]
+            ).fetchall())
+            changes.extend(connection.execute(
+                f"SELECT part_number, MAX(version_id), row_hash FROM prp_changes "
+                f"WHERE part_number IN ({placeholders}) AND version_id < ? GROUP BY part_number",
+                batch + [first]
+            ).fetchall())
+        if not changes:
+            return pd.DataFrame(columns=columns)
+        part_column, version_column, hash_column = zip(*changes)
+        changes = pd.DataFrame({
+            'part_number': part_column,
+            'version_id': version_column,
+            # Int64 con nulos desde el inicio: pasar por float64 perdería precisión en los hashes
+            'row_hash': pd.array(hash_column, dtype='Int64')
+        })
+
+        # Estado vigente en cada versión: el último cambio anterior o igual de cada parte
+        grid = versions[['version_id', 'updated_at']].merge(pd.DataFrame({'part_number': part_numbers}), how='cross')
+        history = pd.merge_asof(
+            grid.sort_values('version_id'), changes.sort_values('version_id'),
+            on='version_id', by='part_number', direction='backward'
+        ).dropna(subset=['row_hash'])
+        if history.empty:
+            return pd.DataFrame(columns=columns)
+
+        row_hashes = history['row_hash'].astype(np.int64).unique().tolist()
+        rows = []
+        for start_index in range(0, len(row_hashes), _QUERY_BATCH):
+            batch = row_hashes[start_index:start_index + _QUERY_BATCH]
+            rows.extend(connection.execute(
+                f"SELECT row_hash, inv_fg, past_due, deficit, first_shortage_date FROM prp_rows "
+                f"WHERE row_hash IN ({','.join('?' * len(batch))})", batch
+            ).fetchall())
+        rows = pd.DataFrame(rows, columns=['row_hash', 'inv_fg', 'past_due', 'deficit', 'first_shortage_date'])
+        history = history.astype({'row_hash': np.int64}).merge(rows, on='row_hash')
+        history['first_shortage_date'] = pd.to_datetime(history['first_shortage_date'])
+        return history.sort_values(['updated_at', 'version_id', 'part_number'])[columns].reset_index(drop=True)
+
+    def part_trajectory(self, part_number, days=14, now=None):
+        """Inventario y faltante de una parte en cada versión de los últimos days días"""
+        now = pd.Timestamp(CLOCK.now()) if now is None else pd.Timestamp(now)
+        return self.parts_history([part_number], start=now - pd.Timedelta(days=days), end=now)
+
+    def load_table(self, version_id):
+        """Reconstruye la PRPTable de una versión guardada (None si no existe)"""
+        connection = self._connection()
+        version = connection.execute(
+            "SELECT content_hash, updated_at, dates FROM prp_versions WHERE version_id = ?", (version_id,)
+        ).fetchone()
+        if version is None:
+            return None
+        content_hash, updated_at, dates = version
+        dates = pd.DatetimeIndex(pd.to_datetime(json.loads(dates)))
+
+        state = connection.execute(
+            "SELECT c.part_number, MAX(c.version_id), r.inv_fg, r.past_due, r.demand_days, r.demand "
+            "FROM prp_changes c LEFT JOIN prp_rows r ON r.row_hash = c.row_hash "
+            "WHERE c.version_id <= ? GROUP BY c.part_number ORDER BY c.part_number",
+            (version_id,)
+        ).fetchall()
+        state = [row for row in state if row[5] is not None]
+
+        part_numbers = np.array([row[0] for row in state], dtype=object)
+        inv_fg = np.array([row[2] for row in state], dtype=np.int32)
+        past_due = np.array([row[3] for row in state], dtype=np.int32)
+        # Cada fila guarda su demanda por día absoluto: se ubica en las columnas de fecha de esta versión
+        columns = {day: j for j, day in enumerate(_day_numbers(dates).tolist())}
+        demand = np.zeros((len(state), len(dates)), dtype=np.int32)
+        for i, row in enumerate(state):
+            row_days = np.frombuffer(row[4], dtype=np.int32).tolist()
+            demand[i, [columns[day] for day in row_days]] = np.frombuffer(row[5], dtype=np.int32)
+        return PRPTable(
+            part_numbers=part_numbers,
+            row_index={part_number: i for i, part_number in enumerate(part_numbers.tolist())},
+            inv_fg=inv_fg,
+            past_due=past_due,
+            dates=dates,
+            demand=demand,
+            updated_at=pd.Timestamp(updated_at),
+            content_hash=content_hash,
+            row_hashes=compute_row_hashes(inv_fg, past_due, dates, demand)
+        )
+
+    def purge(self):
+        """Elimina las versiones fuera de la ventana de retención sin perder el estado de las que quedan"""
+        today = CLOCK.today()
+        cutoff = (datetime.combine(today, datetime.min.time()) - timedelta(days=self.retention_days)).isoformat()
+        connection = self._connection()
+        with self._record_lock:
+            oldest = connection.execute(
+                "SELECT MIN(version_id) FROM prp_versions WHERE updated_at >= ?", (cutoff,)
+            ).fetchone()[0]
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                if oldest is None:
+                    # Ninguna versión dentro de la ventana: se conserva solo la más reciente
+                    oldest = connection.execute("SELECT MAX(version_id) FROM prp_versions").fetchone()[0]
+                if oldest is not None:
+                    # La versión más antigua que queda recibe el estado completo de todas sus partes
+                    connection.execute(
+                        "INSERT OR IGNORE INTO prp_changes "
+                        "SELECT part_number, ?, row_hash FROM ("
+                        "  SELECT part_number, MAX(version_id), row_hash FROM prp_changes "
+                        "  WHERE version_id < ? GROUP BY part_number"
+                        ") WHERE row_hash IS NOT NULL",
+                        (oldest, oldest)
+                    )
+                    connection.execute("DELETE FROM prp_changes WHERE version_id < ?", (oldest,))
+                    connection.execute("DELETE FROM prp_versions WHERE version_id < ?", (oldest,))
+                    connection.execute(
+                        "DELETE FROM prp_rows WHERE row_hash NOT IN "
+                        "(SELECT row_hash FROM prp_changes WHERE row_hash IS NOT NULL)"
+                    )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        self._purged_day = today
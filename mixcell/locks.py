@@ -0,0 +1,229 @@
+"""Lock diario de la secuencia Kanban compartido por todas las pantallas (SQLite en modo WAL)"""
+import json
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+from config import *
+from mixcell.clock import CLOCK
+from mixcell.metrics import METRICS
+from mixcell.analysis import get_top_3_critical_parts
+
+class SequenceLockStore:
+    """Secuencia guardada por (celda, familia, día) con lectura por llave y compare-and-set atómico.
+
+    Sobrevive recargas del navegador y reinicios del servidor; cada hilo usa su propia conexión."""
+
+    def __init__(self, db_path=LOCK_DB_PATH, retention_days=LOCK_RETENTION_DAYS):
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self._local = threading.local()
+        self._purged_day = None
+        self._connection().execute("""
+            CREATE TABLE IF NOT EXISTS sequence_locks (
+                cell_name TEXT NOT NULL,
+                family TEXT NOT NULL,
+                day TEXT NOT NULL,
+                sequence TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (cell_name, family, day)
+            ) WITHOUT ROWID
+        """)
+        self.purge()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # Autocommit: cada sentencia es atómica por sí misma
+            connection = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, cell_name, family, day):
+        """Secuencia guardada y su versión (None, 0 si no hay lock para ese día)"""
+        row = self._connection().execute(
+            "SELECT sequence, version FROM sequence_locks WHERE cell_name = ? AND family = ? AND day = ?",
+            (cell_name, family, day.isoformat())
+        ).fetchone()
+        if row is None:
+            return None, 0
+        stored_sequence = json.loads(row[0])
+        for stored_part in stored_sequence:
+            stored_part['kanban_group_date'] = date.fromisoformat(stored_part['kanban_group_date'])
+        return stored_sequence, row[1]
+
+    def version(self, cell_name, family, day):
+        """Versión del lock de ese día sin leer la secuencia: (día, versión, hora de la última escritura).
+        
+        Cambia cada vez que alguien escribe o rompe el lock; sirve para invalidar respuestas en cache."""
+        row = self._connection().execute(
+            "SELECT version, updated_at FROM sequence_locks WHERE cell_name = ? AND family = ? AND day = ?",
+            (cell_name, family, day.isoformat())
+        ).fetchone()
+        return (day.isoformat(),) + (tuple(row) if row is not None else (0, None))
+
+    def compare_and_set(self, cell_name, family, day, stored_sequence, expected_version):
+        """Guarda la secuencia solo si nadie la cambió desde que se leyó expected_version"""
+        payload = json.dumps([
+            {**stored_part, 'kanban_group_date': stored_part['kanban_group_date'].isoformat()}
+            for stored_part in stored_sequence
+        ])
+        connection = self._connection()
+        if expected_version == 0:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO sequence_locks VALUES (?, ?, ?, ?, 1, ?)",
+                (cell_name, family, day.isoformat(), payload, CLOCK.now().timestamp())
+            )
+        else:
+            cursor = connection.execute(
+                "UPDATE sequence_locks SET sequence = ?, version = version + 1, updated_at = ? "
+                "WHERE cell_name = ? AND family = ? AND day = ? AND version = ?",
+                (payload, CLOCK.now().timestamp(), cell_name, family, day.isoformat(), expected_version)
+            )
+
+        if day != self._purged_day:
+            self.purge()
+        return cursor.rowcount == 1
+
+    def purge(self):
+        """Elimina los locks fuera de la ventana de retención"""
+        today = CLOCK.today()
+        cutoff = today - timedelta(days=self.retention_days)
+        self._connection().execute("DELETE FROM sequence_locks WHERE day < ?", (cutoff.isoformat(),))
+        self._purged_day = today
+
+def detect_same_day_session(current_parts):
+    """Detecta si hay múltiples partes del mismo día en la lista actual"""
+    if not current_parts:
+        return False
+
+    today = CLOCK.today()
+
+    # Contar cuántas partes críticas son para HOY
+    same_day_count = 0
+    for part in current_parts:
+        if part['first_shortage_date'].date() == today:
+            same_day_count += 1
+
+    # Si hay 2 o más partes para hoy = sesión activa
+    return same_day_count >= 2
+
+def build_stored_sequence(sequence):
+    """Identificadores esenciales de la secuencia del día para guardar en el lock"""
+    today = CLOCK.today()
+
+    stored_sequence = []
+    for i, part in enumerate(sequence):
+        stored_sequence.append({
+            'part_number': part['part_number'],
+            'original_priority': i + 1,
+            'kanban_group_date': part.get('kanban_group_date', today)
+        })
+    return stored_sequence
+
+def apply_stored_sequence(stored_sequence, current_sequence):
+    """Aplica la secuencia guardada a los datos actuales"""
+    result = []
+
+    # Crear un diccionario de partes actuales para búsqueda rápida
+    current_parts_dict = {part['part_number']: part for part in current_sequence}
+
+    # Aplicar el orden guardado
+    for stored_part in stored_sequence:
+        part_number = stored_part['part_number']
+
+        # Si la parte aún existe en datos actuales
+        if part_number in current_parts_dict:
+            # Tomar datos actuales pero mantener prioridad original
+            current_part = current_parts_dict[part_number].copy()
+            current_part['locked_priority'] = stored_part['original_priority']
+            current_part['is_sequence_locked'] = True
+            result.append(current_part)
+
+    return result[:3]  # Limitar a TOP 3
+
+def detect_pull_ahead(current_sequence, stored_sequence):
+    """Detecta si hay un pull ahead que requiere romper el lock de secuencia"""
+    if not stored_sequence or not current_sequence:
+        return False
+
+    # Obtener la fecha más temprana de la secuencia guardada
+    stored_earliest_date = None
+    for stored_part in stored_sequence:
+        # La fecha se guarda como kanban_group_date
+        stored_date = stored_part.get('kanban_group_date')
+        if stored_date and (stored_earliest_date is None or stored_date < stored_earliest_date):
+            stored_earliest_date = stored_date
+
+    # Obtener la fecha más temprana de la secuencia actual
+    current_earliest_date = None
+    for current_part in current_sequence:
+        current_date = current_part['first_shortage_date'].date()
+        if current_earliest_date is None or current_date < current_earliest_date:
+            current_earliest_date = current_date
+
+    # Si la fecha más temprana actual es anterior a la guardada = PULL AHEAD
+    if (stored_earliest_date and current_earliest_date and
+        current_earliest_date < stored_earliest_date):
+        return True
+
+    return False
+
+def evaluate_sequence_lock(current_sequence, stored_sequence):
+    """Secuencia a mostrar y la que se debe guardar (None si el lock guardado sigue vigente)"""
+    # PASO 2: Verificar si hay sesión del mismo día activa
+    if detect_same_day_session(current_sequence) and stored_sequence:
+
+        # PASO 4: DETECTAR PULL AHEAD antes de aplicar lock
+        if detect_pull_ahead(current_sequence, stored_sequence):
+            # PULL AHEAD DETECTADO - Romper lock y crear nueva secuencia
+            # Marcar las partes nuevas como pull ahead para mostrar al operador
+            for part in current_sequence:
+                if part['first_shortage_date'].date() < CLOCK.today():
+                    part['is_pull_ahead'] = True
+            return current_sequence, build_stored_sequence(current_sequence)
+
+        # PASO 5: No hay pull ahead - Aplicar secuencia guardada a datos actuales
+        locked_sequence = apply_stored_sequence(stored_sequence, current_sequence)
+        if locked_sequence:
+            return locked_sequence, None
+
+    # PASO 6: Primera vez del día o no hay sesión activa
+    # Guardar nueva secuencia (solo si cambió respecto a la guardada)
+    new_stored_sequence = build_stored_sequence(current_sequence)
+    if new_stored_sequence == stored_sequence:
+        return current_sequence, None
+    return current_sequence, new_stored_sequence
+
+@METRICS.timed('rank_with_lock')
+def get_top_3_critical_parts_with_lock(prp_analysis, catalog, lock_store, cell_name, family,
+                                       current_sequence=None):
+    """Versión mejorada que respeta la secuencia diaria para evitar cambios innecesarios,
+    pero detecta pull ahead para casos urgentes"""
+    if len(prp_analysis) == 0:
+        return []
+
+    # PASO 1: Calcular secuencia actual normal (o usar la precalculada compartida)
+    if current_sequence is None:
+        current_sequence = get_top_3_critical_parts(prp_analysis, catalog)
+
+    # PASO 3: Una sola lectura por llave del lock de hoy; si otra pantalla lo cambió
+    # entre la lectura y la escritura, se vuelve a evaluar con el lock nuevo
+    today = CLOCK.today()
+    for _ in range(LOCK_CAS_RETRIES):
+        stored_sequence, version = lock_store.get(cell_name, family, today)
+        # Copiar para no modificar los resultados compartidos entre sesiones
+        sequence, new_stored_sequence = evaluate_sequence_lock(
+            [part.copy() for part in current_sequence], stored_sequence
+        )
+        if new_stored_sequence is None:
+            METRICS.increment('sequence_lock_total', result='read')
+            return sequence
+        if lock_store.compare_and_set(cell_name, family, today, new_stored_sequence, version):
+            METRICS.increment('sequence_lock_total', result='written')
+            return sequence
+        METRICS.increment('sequence_lock_total', result='conflict')
+    return sequence
@@ -0,0 +1,107 @@
+"""Métricas ligeras por etapa (duración, bytes, filas, hits de cache) con exportación en formato Prometheus"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+METRIC_PREFIX = "mix_production"
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(label_key):
+    if not label_key:
+        return ""
+    escaped = [
+        '%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in label_key
+    ]
+    return "{" + ",".join(escaped) + "}"
+
+class MetricsRegistry:
+    """Registro de métricas del proceso, seguro entre hilos (sesiones, programador y API)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timings = {}    # etapa → {'count', 'sum', 'last', 'max'}
+        self._counters = {}   # (nombre, etiquetas) → valor acumulado
+        self._gauges = {}     # (nombre, etiquetas) → último valor
+
+    @contextmanager
+    def timed(self, stage):
+        """Mide la duración de un bloque y la registra en la etapa indicada"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            timing = self._timings.get(stage)
+            if timing is None:
+                timing = self._timings[stage] = {'count': 0, 'sum': 0.0, 'last': 0.0, 'max': 0.0}
+            timing['count'] += 1
+            timing['sum'] += seconds
+            timing['last'] = seconds
+            timing['max'] = max(timing['max'], seconds)
+
+    def increment(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def timings(self):
+        """Copia de las duraciones por etapa para mostrarlas en pantalla"""
+        with self._lock:
+            return {stage: dict(timing) for stage, timing in self._timings.items()}
+
+    def values(self):
+        """Copia de contadores y gauges como {nombre{etiquetas}: valor}"""
+        with self._lock:
+            items = list(self._counters.items()) + list(self._gauges.items())
+        return {f"{name}{_format_labels(labels)}": value for (name, labels), value in items}
+
+    def render_prometheus(self):
+        """Texto en formato de exposición de Prometheus"""
+        with self._lock:
+            timings = {stage: dict(timing) for stage, timing in self._timings.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+
+        lines = []
+        if timings:
+            base = f"{METRIC_PREFIX}_stage_duration_seconds"
+            lines.append(f"# HELP {base} Duración de cada etapa del pipeline")
+            lines.append(f"# TYPE {base} summary")
+            for stage, timing in sorted(timings.items()):
+                labels = _format_labels((('stage', stage),))
+                lines.append(f"{base}_count{labels} {timing['count']}")
+                lines.append(f"{base}_sum{labels} {timing['sum']:.6f}")
+            for suffix in ['last', 'max']:
+                lines.append(f"# TYPE {base}_{suffix} gauge")
+                for stage, timing in sorted(timings.items()):
+                    labels = _format_labels((('stage', stage),))
+                    lines.append(f"{base}_{suffix}{labels} {timing[suffix]:.6f}")
+
+        for metrics, metric_type in [(counters, 'counter'), (gauges, 'gauge')]:
+            for name in sorted({name for name, _ in metrics}):
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+                for (metric_name, labels), value in sorted(metrics.items()):
+                    if metric_name == name:
+                        lines.append(f"{METRIC_PREFIX}_{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, file_path):
+        """Escribe las métricas a un archivo (para el textfile collector de node_exporter)"""
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, file_path)
+
+# Registro único del proceso
+METRICS = MetricsRegistry()
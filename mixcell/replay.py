@@ -0,0 +1,176 @@
+"""Replay determinista de una serie de versiones del PRP por el pipeline completo de las pantallas.
+
+Cada versión pasa por el snapshot (análisis, ranking y programa) y por el lock de secuencia de cada
+celda/familia con la hora simulada de esa versión, así que un día completo se repite igual cada vez.
+Por paso se mide la latencia, cuánto cambia la secuencia en piso (churn), los hits del lock y los
+pull ahead, para comparar cambios a la lógica del lock sin servidor ni pantallas."""
+import time
+from dataclasses import dataclass
+from itertools import zip_longest
+
+import numpy as np
+import pandas as pd
+
+from config import *
+from mixcell.analysis import PRPTable, compute_row_hashes
+from mixcell.clock import CLOCK, ManualClock
+from mixcell.locks import SequenceLockStore
+from mixcell.snapshot import derive_snapshot, get_locked_sequence
+
+def scheduled_times(day):
+    """Horarios de actualización :05 y :35 de un día (48 versiones)"""
+    start = pd.Timestamp(day).normalize()
+    return [start + pd.Timedelta(hours=hour, minutes=minute) for hour in range(24) for minute in (5, 35)]
+
+class RecordingLockStore(SequenceLockStore):
+    """Lock store que anota qué celdas/familias escribieron su lock (nueva secuencia del día)"""
+
+    def __init__(self, db_path=":memory:", retention_days=LOCK_RETENTION_DAYS):
+        super().__init__(db_path, retention_days)
+        self.written = set()
+
+    def compare_and_set(self, cell_name, family, day, stored_sequence, expected_version):
+        written = super().compare_and_set(cell_name, family, day, stored_sequence, expected_version)
+        if written:
+            self.written.add((cell_name, family))
+        return written
+
+@dataclass(frozen=True)
+class ReplayResult:
+    """Resultado del replay de una serie de versiones del PRP"""
+    steps: pd.DataFrame   # Una fila por versión: hora, latencias, partes cambiadas, churn, locks y pull ahead
+    cells: pd.DataFrame   # Una fila por versión y celda/familia: secuencia mostrada e indicadores
+
+    def summary(self):
+        """Totales del replay: latencia por paso y tasas de churn, hits del lock y pull ahead"""
+        steps = self.steps
+        cell_steps = len(self.cells)
+        return {
+            'steps': len(steps),
+            'cell_families': self.cells[['cell_name', 'family']].drop_duplicates().shape[0],
+            'total_seconds': float(steps['seconds'].sum()),
+            'step_p50_seconds': float(steps['seconds'].quantile(0.5)) if len(steps) else 0.0,
+            'step_p95_seconds': float(steps['seconds'].quantile(0.95)) if len(steps) else 0.0,
+            'step_max_seconds': float(steps['seconds'].max()) if len(steps) else 0.0,
+            'sequence_changes': int(steps['sequence_changes'].sum()),
+            'churn_rate': float(self.cells['changed'].sum() / cell_steps) if cell_steps else 0.0,
+            'lock_hits': int(steps['lock_hits'].sum()),
+            'lock_hit_rate': float(self.cells['locked'].sum() / cell_steps) if cell_steps else 0.0,
+            'lock_writes': int(steps['lock_writes'].sum()),
+            'pull_aheads': int(steps['pull_aheads'].sum())
+        }
+
+def replay(prp_tables, catalog, times=None, lock_store=None):
+    """Pasa cada versión del PRP por el snapshot y el lock con la hora simulada de times.
+
+    times: hora de cada versión (default: Fecha De Actualizacion de cada una). lock_store arranca
+    vacío en memoria si no se da; se crea con la hora simulada para que su limpieza use ese día."""
+    prp_tables = list(prp_tables)
+    if times is None:
+        times = [prp_table.updated_at for prp_table in prp_tables]
+    times = [pd.Timestamp(now).to_pydatetime() for now in times]
+    if len(times) != len(prp_tables):
+        raise ValueError("Se necesita una hora por cada versión del PRP")
+
+    step_rows = []
+    cell_rows = []
+    if not prp_tables:
+        return ReplayResult(steps=pd.DataFrame(step_rows), cells=pd.DataFrame(cell_rows))
+
+    clock = ManualClock(times[0])
+    with CLOCK.use(clock):
+        if lock_store is None:
+            lock_store = RecordingLockStore()
+        snapshot = None
+        displayed = {}
+        for step, (now, prp_table) in enumerate(zip(times, prp_tables)):
+            clock.set(now)
+            written = getattr(lock_store, 'written', None)
+            if written is not None:
+                written.clear()
+
+            started = time.perf_counter()
+            # Un solo proceso: la hora simulada no llega a los procesos del pool
+            snapshot = derive_snapshot(catalog, None, prp_table, snapshot, workers=1)
+            built = time.perf_counter()
+            sequences = {key: get_locked_sequence(snapshot, lock_store, *key) for key in snapshot.sequences}
+            finished = time.perf_counter()
+
+            totals = {'sequence_changes': 0, 'positions_changed': 0, 'lock_hits': 0, 'lock_writes': 0,
+                      'pull_aheads': 0}
+            for key, sequence in sequences.items():
+                parts = tuple(part['part_number'] for part in sequence)
+                previous_parts = displayed.get(key)
+                changed = previous_parts is not None and parts != previous_parts
+                # Posiciones de la secuencia que muestran otra parte que en el paso anterior
+                positions = sum(a != b for a, b in zip_longest(parts, previous_parts)) if changed else 0
+                locked = any(part.get('is_sequence_locked', False) for part in sequence)
+                pull_ahead = any(part.get('is_pull_ahead', False) for part in sequence)
+                lock_written = written is not None and key in written
+                displayed[key] = parts
+
+                totals['sequence_changes'] += changed
+                totals['positions_changed'] += positions
+                totals['lock_hits'] += locked
+                totals['lock_writes'] += lock_written
+                totals['pull_aheads'] += pull_ahead
+                cell_rows.append({
+                    'step': step, 'time': now, 'cell_name': key[0], 'family': key[1],
+                    'sequence': "|".join(parts), 'changed': changed, 'positions_changed': positions,
+                    'locked': locked, 'pull_ahead': pull_ahead, 'lock_written': lock_written
+                })
+
+            prp_diff = snapshot.prp_diff
+            step_rows.append({
+                'step': step,
+                'time': now,
+                'prp_hash': prp_table.content_hash,
+                'changed_parts': len(prp_diff.parts) if prp_diff is not None else len(prp_table.part_numbers),
+                'build_seconds': built - started,
+                'lock_seconds': finished - built,
+                'seconds': finished - started,
+                **totals
+            })
+
+    return ReplayResult(steps=pd.DataFrame(step_rows), cells=pd.DataFrame(cell_rows))
+
+def perturb_prp(prp_table, rng, change_fraction, now, content_hash):
+    """Siguiente versión sintética del PRP: producción terminada y releases nuevos o adelantados.
+
+    Una fracción de las partes sube su inventario FG y otra recibe demanda nueva en los próximos
+    días (también en días ya vencidos, lo que provoca pull ahead)."""
+    n_parts, n_days = prp_table.demand.shape
+    n_changes = min(n_parts, max(1, int(n_parts * change_fraction)))
+    inv_fg = prp_table.inv_fg.copy()
+    demand = prp_table.demand.copy()
+
+    produced = rng.choice(n_parts, n_changes, replace=False)
+    inv_fg[produced] += rng.integers(10, 500, n_changes).astype(inv_fg.dtype)
+
+    today = int(prp_table.dates.searchsorted(pd.Timestamp(now).normalize()))
+    released = rng.choice(n_parts, n_changes, replace=False)
+    days = np.clip(today + rng.integers(-1, 7, n_changes), 0, n_days - 1)
+    demand[released, days] += rng.integers(10, 500, n_changes).astype(demand.dtype)
+
+    return PRPTable(
+        part_numbers=prp_table.part_numbers,
+        row_index=prp_table.row_index,
+        inv_fg=inv_fg,
+        past_due=prp_table.past_due,
+        dates=prp_table.dates,
+        demand=demand,
+        updated_at=pd.Timestamp(now),
+        content_hash=content_hash,
+        row_hashes=compute_row_hashes(inv_fg, prp_table.past_due, prp_table.dates, demand)
+    )
+
+def synthetic_day(prp_table, day, change_fraction=0.01, seed=0):
+    """Un día de versiones sintéticas (una por horario :05/:35) a partir de un PRP inicial"""
+    rng = np.random.default_rng(seed)
+    times = scheduled_times(day)
+    tables = []
+    current = prp_table
+    for step, now in enumerate(times):
+        current = perturb_prp(current, rng, change_fraction, now, f"replay-{seed}-{step}")
+        tables.append(current)
+    return tables, times
@@ -0,0 +1,372 @@
+"""Snapshot de datos listo para mostrar y el hilo que lo mantiene al día según el horario :05/:35"""
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from config import *
+from mixcell.analysis import (
+    PartCatalog, PlantSchedule, PRPTable, compute_all_sequences, compute_shortage_matrix, part_filter_key,
+    schedule_plant
+)
+from mixcell.fetch import DOWNLOAD_FAILED, get_file_version, get_last_check_time
+from mixcell.clock import CLOCK
+from mixcell.history import PRPHistoryStore
+from mixcell.locks import get_top_3_critical_parts_with_lock
+from mixcell.metrics import METRICS
+from mixcell.sources import (
+    SourcedPRP, combine_fetch_results, fetch_prp_sources, get_prp_sources, load_source_tables,
+    merge_sources
+)
+from mixcell.storage import load_parts_df
+
+
+def get_next_update_time():
+    """Calcula cuándo será la próxima actualización programada"""
+    now = CLOCK.now()
+    current_minute = now.minute
+    
+    if current_minute < 5:
+        # Próxima actualización a los :05 de esta hora
+        next_update = now.replace(minute=5, second=0, microsecond=0)
+    elif current_minute < 35:
+        # Próxima actualización a los :35 de esta hora
+        next_update = now.replace(minute=35, second=0, microsecond=0)
+    else:
+        # Próxima actualización a los :05 de la siguiente hora
+        if now.hour == 23:
+            next_update = now.replace(hour=0, minute=5, second=0, microsecond=0) + pd.Timedelta(days=1)
+        else:
+            next_update = now.replace(hour=now.hour+1, minute=5, second=0, microsecond=0)
+    
+    total_seconds = (next_update - now).total_seconds()
+    minutes_until = int(total_seconds / 60)
+    seconds_until = int(total_seconds % 60)
+    
+    return next_update, minutes_until, seconds_until, total_seconds
+
+
+def get_last_scheduled_time(now=None):
+    """Último horario programado de actualización (minuto :05 o :35) anterior a now"""
+    now = now or CLOCK.now()
+    if now.minute >= 35:
+        return now.replace(minute=35, second=0, microsecond=0)
+    if now.minute >= 5:
+        return now.replace(minute=5, second=0, microsecond=0)
+    # Antes del minuto :05 la última actualización fue a los :35 de la hora anterior
+    return (now - pd.Timedelta(hours=1)).replace(minute=35, second=0, microsecond=0)
+
+def check_file_age(file_path, now=None):
+    """Verifica si un archivo necesita actualizarse basado en horarios específicos (minuto 5 y 35 de cada hora)"""
+    if not os.path.exists(file_path):
+        return True  # Archivo no existe, necesita descarga
+    
+    # Necesita actualización si no se ha verificado desde el último horario programado
+    return get_last_check_time(file_path) < get_last_scheduled_time(now)
+
+
+@dataclass(frozen=True)
+class PRPDiff:
+    """Partes agregadas, eliminadas y modificadas entre dos versiones del PRP"""
+    added: list
+    removed: list
+    changed: list
+    
+    @property
+    def parts(self):
+        return self.added + self.removed + self.changed
+
+def diff_prp_tables(old_table, new_table):
+    """Compara dos versiones del PRP usando los hashes por fila"""
+    old_hashes = pd.Series(old_table.row_hashes, index=pd.Index(old_table.part_numbers, dtype=object))
+    new_hashes = pd.Series(new_table.row_hashes, index=pd.Index(new_table.part_numbers, dtype=object))
+    
+    common = new_hashes.index.intersection(old_hashes.index)
+    is_changed = new_hashes.loc[common].to_numpy() != old_hashes.loc[common].to_numpy()
+    
+    return PRPDiff(
+        added=new_hashes.index.difference(old_hashes.index).tolist(),
+        removed=old_hashes.index.difference(new_hashes.index).tolist(),
+        changed=common[is_changed].tolist()
+    )
+
+def compute_part_deficits(prp_table, part_numbers):
+    """Faltante total dentro de la ventana de análisis para cada parte indicada"""
+    found_parts = [p for p in part_numbers if p in prp_table.row_index]
+    if not found_parts:
+        return {}
+    rows = np.fromiter((prp_table.row_index[p] for p in found_parts), dtype=np.intp, count=len(found_parts))
+    totals = compute_shortage_matrix(prp_table, rows).sum(axis=1)
+    return dict(zip(found_parts, totals.tolist()))
+
+def build_change_log(old_table, new_table, prp_diff, catalog):
+    """Bitácora de cambios de faltante por parte entre dos versiones del PRP"""
+    # Solo interesan las partes que pertenecen a alguna celda
+    parts = [p for p in prp_diff.parts if p in catalog]
+    old_deficits = compute_part_deficits(old_table, parts)
+    new_deficits = compute_part_deficits(new_table, parts)
+    
+    change_log = []
+    for part_number in parts:
+        old_deficit = old_deficits.get(part_number)
+        new_deficit = new_deficits.get(part_number)
+        if old_deficit == new_deficit:
+            continue  # Cambió la fila pero no el faltante
+        
+        if old_deficit is None:
+            message = f"Parte {part_number}: nueva en el PRP con faltante de {new_deficit:,}"
+        elif new_deficit is None:
+            message = f"Parte {part_number}: ya no aparece en el PRP (faltante anterior {old_deficit:,})"
+        else:
+            message = f"Parte {part_number}: faltante pasó de {old_deficit:,} a {new_deficit:,}"
+        
+        change_log.append({
+            'part_number': part_number,
+            'old_deficit': old_deficit,
+            'new_deficit': new_deficit,
+            'cells': catalog.cells_for_part(part_number),
+            'message': message
+        })
+    
+    # Los cambios más grandes primero
+    change_log.sort(key=lambda entry: -abs((entry['new_deficit'] or 0) - (entry['old_deficit'] or 0)))
+    return change_log
+
+@dataclass(frozen=True)
+class DataSnapshot:
+    """Conjunto de datos listo para mostrar: catálogo, PRP normalizado y secuencias precalculadas"""
+    catalog: PartCatalog
+    parts_version: tuple      # Versión de parts_data.csv usada para el catálogo
+    prp_table: PRPTable
+    sequences: dict           # (celda, familia) → {'analysis': [...], 'sequence': [...]}
+    sequences_date: object    # Día para el que se calcularon las secuencias
+    built_at: datetime
+    prp_diff: PRPDiff = None  # Diferencias contra la versión anterior del PRP
+    change_log: tuple = ()    # Cambios de faltante por parte contra la versión anterior
+    schedule: PlantSchedule = None  # Programa de capacidad finita de todas las celdas
+    sources: SourcedPRP = None      # PRP de cada fuente y la fuente de cada parte
+
+@METRICS.timed('build_snapshot')
+def build_snapshot(previous=None, downloaded=None, sources=None):
+    """Carga y precalcula un nuevo conjunto de datos reutilizando lo que no cambió.
+    
+    Combina el PRP de todas las fuentes (default: PRP_SOURCES). downloaded es (filtro de partes,
+    fuente → PRPTable) parseadas durante la descarga; se usan en lugar de leer los archivos si se
+    filtraron con las partes del catálogo actual."""
+    sources = get_prp_sources() if sources is None else sources
+    parts_version = get_file_version(PARTS_FILE_PATH)
+    if previous is not None and previous.parts_version == parts_version:
+        catalog = previous.catalog
+    else:
+        catalog = PartCatalog(load_parts_df(PARTS_FILE_PATH))
+    
+    # El PRP se carga filtrado a las partes del catálogo: si cambia el catálogo se vuelve a leer
+    part_numbers = catalog.family_part_numbers()
+    if downloaded is not None and downloaded[0] != part_filter_key(part_numbers):
+        downloaded = None
+    same_catalog = previous is not None and previous.catalog is catalog
+    previous_tables = previous.sources.tables if same_catalog and previous.sources is not None else None
+    tables = load_source_tables(sources, part_numbers, downloaded[1] if downloaded is not None else None,
+                                previous_tables)
+    if not tables:
+        raise FileNotFoundError(f"{MESSAGES['file_not_found']}{', '.join(source.path for source in sources)}")
+    
+    # Mismo contenido en todas las fuentes: se conserva la tabla anterior (y sus secuencias)
+    prp_sources = merge_sources(tables)
+    if (same_catalog and previous.sources is not None and
+            previous.prp_table.content_hash == prp_sources.table.content_hash):
+        prp_sources = previous.sources
+    return derive_snapshot(catalog, parts_version, prp_sources.table, previous, prp_sources=prp_sources)
+
+def derive_snapshot(catalog, parts_version, prp_table, previous=None, workers=None, prp_sources=None):
+    """Secuencias, cambios y programa de un PRP ya cargado, reutilizando lo que no cambió del snapshot anterior"""
+    today = CLOCK.today()
+    
+    # Mismo PRP, mismo catálogo y mismo día: las secuencias siguen siendo válidas
+    if (previous is not None and previous.catalog is catalog and
+            previous.prp_table is prp_table and previous.sequences_date == today):
+        METRICS.increment('cache_requests_total', cache='snapshot', result='hit')
+        return previous
+    METRICS.increment('cache_requests_total', cache='snapshot', result='miss')
+    
+    # Mismo catálogo y mismo día: recalcular solo las celdas/familias con partes que cambiaron
+    prp_diff = None
+    change_log = ()
+    if (previous is not None and previous.catalog is catalog and
+            previous.sequences_date == today):
+        prp_diff = diff_prp_tables(previous.prp_table, prp_table)
+        affected = {key for part in prp_diff.parts for key in catalog.cells_for_part(part)}
+        sequences = dict(previous.sequences)
+        sequences.update(compute_all_sequences(prp_table, catalog, cell_families=affected, workers=workers))
+        METRICS.set_gauge('recomputed_cell_families', len(affected))
+        change_log = tuple(build_change_log(previous.prp_table, prp_table, prp_diff, catalog))
+    else:
+        sequences = compute_all_sequences(prp_table, catalog, workers=workers)
+        METRICS.set_gauge('recomputed_cell_families', len(sequences))
+    
+    return DataSnapshot(
+        catalog=catalog,
+        parts_version=parts_version,
+        prp_table=prp_table,
+        sequences=sequences,
+        sequences_date=today,
+        built_at=CLOCK.now(),
+        prp_diff=prp_diff,
+        change_log=change_log,
+        # El programa depende de la cola completa de cada celda: siempre se recalcula (vectorizado)
+        schedule=schedule_plant(prp_table, catalog),
+        sources=prp_sources
+    )
+
+class PRPRefresher:
+    """Hilo único por proceso que descarga, procesa y precalcula el PRP según el horario :05/:35.
+    
+    Las páginas solo leen el snapshot activo; el nuevo se construye aparte (doble buffer)
+    y se intercambia de forma atómica cuando está listo."""
+    
+    def __init__(self):
+        self._snapshot = None                 # Buffer activo que leen las páginas
+        self._build_lock = threading.Lock()   # Un solo build a la vez
+        self._wakeup = threading.Event()
+        self._condition = threading.Condition()
+        self._requested = 0                   # Solicitudes manuales de descarga
+        self._completed = 0                   # Última solicitud atendida
+        self.sources = get_prp_sources()      # Fuentes del PRP (PRP_SOURCES)
+        self.last_result = None
+        self.source_results = {}              # Fuente → resultado de su última descarga
+        self.last_error = None
+        self.history = None                   # Historial de versiones del PRP (HISTORY_DB_PATH)
+        if HISTORY_DB_PATH:
+            os.makedirs(os.path.dirname(HISTORY_DB_PATH) or '.', exist_ok=True)
+            self.history = PRPHistoryStore(HISTORY_DB_PATH, HISTORY_RETENTION_DAYS)
+        self._thread = threading.Thread(target=self._run, name="prp-refresher", daemon=True)
+    
+    def start(self):
+        self._thread.start()
+    
+    def get_snapshot(self, timeout=DOWNLOAD_TIMEOUT):
+        """Snapshot activo; en arranque en frío se construye desde el archivo local.
+        
+        Si el archivo local no se puede cargar retorna None y el error queda en last_error."""
+        if self._snapshot is None:
+            if any(os.path.exists(source.path) for source in self.sources):
+                try:
+                    self._rebuild()
+                    self.last_error = None
+                except Exception as e:
+                    self.last_error = str(e)
+                    METRICS.increment('refresh_errors_total')
+            else:
+                # Sin archivo local no queda más que esperar la primera descarga
+                self.refresh_now(timeout=timeout)
+        return self._snapshot
+    
+    def refresh_now(self, timeout=None):
+        """Solicita una descarga inmediata y espera (máximo timeout) a que termine"""
+        with self._condition:
+            self._requested += 1
+            request_id = self._requested
+        self._wakeup.set()
+        with self._condition:
+            return self._condition.wait_for(lambda: self._completed >= request_id, timeout)
+    
+    def _run(self):
+        # Se descarga si hay solicitudes sin atender o si el archivo local no está al día
+        while True:
+            # Limpiar antes de leer las solicitudes: una que llegue después vuelve a despertar el hilo
+            self._wakeup.clear()
+            with self._condition:
+                request_id = self._requested
+                requested = request_id > self._completed
+            stale = any(check_file_age(source.path) for source in self.sources)
+            self._refresh(download=requested or stale)
+            with self._condition:
+                self._completed = request_id
+                self._condition.notify_all()
+            
+            # Dormir hasta el siguiente horario :05/:35 o medianoche (cambia la prioridad del día)
+            now = CLOCK.now()
+            next_update = get_next_update_time()[0]
+            midnight = datetime.combine(now.date(), datetime.min.time()) + pd.Timedelta(days=1)
+            wait_seconds = (min(next_update, midnight) - now).total_seconds() + 1
+            self._wakeup.wait(timeout=max(wait_seconds, 1))
+    
+    def _refresh(self, download):
+        try:
+            downloaded = self._download() if download else None
+            self._rebuild(downloaded)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            METRICS.increment('refresh_errors_total')
+        self._export_metrics()
+    
+    def _export_metrics(self):
+        """Deja las métricas en un archivo para el textfile collector de Prometheus"""
+        if not METRICS_FILE_PATH:
+            return
+        try:
+            METRICS.write_prometheus(METRICS_FILE_PATH)
+        except OSError:
+            pass  # Las métricas nunca deben detener la actualización
+    
+    def _download(self):
+        """Descarga todas las fuentes en paralelo parseándolas mientras llegan.
+        
+        Retorna (filtro de partes, fuente → PRPTable) de las fuentes con contenido nuevo, o None"""
+        try:
+            # Se filtra con el catálogo vigente; si cambia antes del build, se leen los archivos guardados
+            if self._snapshot is not None:
+                catalog = self._snapshot.catalog
+            else:
+                catalog = PartCatalog(load_parts_df(PARTS_FILE_PATH))
+            part_numbers = catalog.family_part_numbers()
+        except Exception:
+            self.last_result = DOWNLOAD_FAILED
+            if not any(os.path.exists(source.path) for source in self.sources):
+                raise
+            return None
+        
+        fetches = fetch_prp_sources(self.sources, part_numbers)
+        self.source_results = {name: fetch.result for name, fetch in fetches.items()}
+        self.last_result = combine_fetch_results(fetches)
+        # Sin red se sigue trabajando con las copias locales; sin ninguna no hay con qué trabajar
+        if not any(os.path.exists(source.path) for source in self.sources):
+            errors = [fetch.error for fetch in fetches.values() if fetch.error is not None]
+            if errors:
+                raise errors[0]
+        
+        tables = {name: fetch.table for name, fetch in fetches.items() if fetch.table is not None}
+        return (part_filter_key(part_numbers), tables) if tables else None
+    
+    def _rebuild(self, downloaded=None):
+        with self._build_lock:
+            # Construir el buffer nuevo sin tocar el activo y luego intercambiarlos
+            previous = self._snapshot
+            new_snapshot = build_snapshot(previous=previous, downloaded=downloaded)
+            self._snapshot = new_snapshot
+        if previous is None or new_snapshot.prp_table is not previous.prp_table:
+            self._record_history(new_snapshot.prp_table)
+    
+    def _record_history(self, prp_table):
+        """Guarda la versión nueva del PRP en el historial (un error aquí no detiene la actualización)"""
+        if self.history is None:
+            return
+        try:
+            with METRICS.timed('record_history'):
+                self.history.record(prp_table)
+        except (sqlite3.Error, OSError):
+            METRICS.increment('history_errors_total')
+
+def get_locked_sequence(snapshot, lock_store, cell_name, family):
+    """Secuencia con lock de una celda/familia a partir de los resultados precalculados"""
+    cell_results = snapshot.sequences.get((cell_name, family), {'analysis': [], 'sequence': []})
+    return get_top_3_critical_parts_with_lock(
+        cell_results['analysis'], snapshot.catalog, lock_store, cell_name, family,
+        current_sequence=cell_results['sequence']
+    )
+
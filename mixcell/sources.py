@@ -0,0 +1,157 @@
+"""Varias exportaciones del PRP (por planta o cliente) descargadas en paralelo y combinadas en un solo PRP.
+
+Cada fuente se descarga en su propio hilo con su propio timeout y tiempo máximo total, y se parsea
+mientras llega; si una falla o se pasa de su tiempo, las demás siguen y esa fuente se toma de su
+última copia local."""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from types import MappingProxyType
+
+import numpy as np
+
+from config import *
+from mixcell.analysis import PRPTable, merge_prp_tables
+from mixcell.fetch import (
+    DOWNLOAD_FAILED, DOWNLOAD_UNCHANGED, DOWNLOAD_UPDATED, DownloadDeadlineExceeded, compute_file_hash
+)
+from mixcell.metrics import METRICS
+from mixcell.storage import download_prp_table, load_prp_table
+
+SOURCE_NO_ID = "no_id"  # Fuente sin ID de Google Drive configurado
+
+@dataclass(frozen=True)
+class PRPSource:
+    """Una exportación del PRP y su copia local"""
+    name: str
+    url: str        # URL de descarga (None si falta configurar el ID)
+    path: str       # Copia local del CSV
+    timeout: float  # Segundos máximos sin recibir datos
+    deadline: float = DOWNLOAD_DEADLINE  # Segundos máximos de toda la descarga (con reintentos)
+
+@dataclass(frozen=True)
+class SourceFetch:
+    """Resultado de la descarga de una fuente"""
+    result: str                # DOWNLOAD_UPDATED, DOWNLOAD_UNCHANGED, DOWNLOAD_FAILED o SOURCE_NO_ID
+    table: PRPTable = None     # PRP parseado durante la descarga (None si no hubo contenido nuevo)
+    error: Exception = None    # Error de la descarga fallida
+
+@dataclass(frozen=True)
+class SourcedPRP:
+    """PRP combinado de todas las fuentes e indexado por fuente"""
+    table: PRPTable            # Todas las fuentes en una sola tabla (la que usa el análisis)
+    tables: MappingProxyType   # Fuente → PRPTable de esa fuente
+    part_sources: np.ndarray   # Fuente de la que se tomó cada fila de table
+
+    def source_of(self, part_number):
+        """Fuente de la que se tomó una parte (None si no está en el PRP)"""
+        row = self.table.row_index.get(part_number)
+        return None if row is None else self.part_sources[row]
+
+    def part_numbers(self, source):
+        """Partes que se tomaron de una fuente"""
+        return self.table.part_numbers[self.part_sources == source]
+
+def get_prp_sources(sources=None):
+    """Fuentes configuradas en PRP_SOURCES, en orden de prioridad"""
+    sources = PRP_SOURCES if sources is None else sources
+    result = []
+    for name, spec in sources.items():
+        url = spec.get('url')
+        file_id = spec.get('file_id')
+        if url is None and file_id and file_id != "TU_ID_DEL_ARCHIVO_AQUI":
+            url = GOOGLE_DRIVE_DOWNLOAD_URL.format(file_id=file_id)
+        result.append(PRPSource(
+            name=name,
+            url=url,
+            path=spec.get('path') or os.path.join(DATA_FOLDER, f"prp_{name}.csv"),
+            timeout=spec.get('timeout', DOWNLOAD_TIMEOUT),
+            deadline=spec.get('deadline', DOWNLOAD_DEADLINE)
+        ))
+    return result
+
+def fetch_source(source, part_numbers=None, deadline=None):
+    """Descarga una fuente parseándola mientras llega; un error queda en el resultado sin lanzarse.
+
+    deadline (time.monotonic()) es el límite de toda la descarga (default: ahora + source.deadline)."""
+    if source.url is None:
+        return SourceFetch(SOURCE_NO_ID)
+    if deadline is None:
+        deadline = time.monotonic() + source.deadline
+    try:
+        os.makedirs(os.path.dirname(source.path) or '.', exist_ok=True)
+        result, table = download_prp_table(source.url, source.path, part_numbers, timeout=source.timeout,
+                                           deadline=deadline)
+        return SourceFetch(result, table)
+    except Exception as e:
+        return SourceFetch(DOWNLOAD_FAILED, error=e)
+
+@METRICS.timed('fetch_sources')
+def fetch_prp_sources(sources, part_numbers=None, workers=PRP_FETCH_WORKERS):
+    """Descarga todas las fuentes a la vez (máximo workers simultáneas); retorna fuente → SourceFetch.
+
+    El tiempo total es el de la fuente más lenta y no la suma de todas, y ninguna espera pasa del
+    deadline de su fuente: una fuente que falla o se pasa de su tiempo queda como DOWNLOAD_FAILED
+    (se usa su copia local) sin detener a las demás."""
+    started = time.monotonic()
+    if len(sources) <= 1 or workers <= 1:
+        fetches = {
+            source.name: fetch_source(source, part_numbers, started + source.deadline) for source in sources
+        }
+    else:
+        pool = ThreadPoolExecutor(max_workers=min(workers, len(sources)), thread_name_prefix="prp-source")
+        futures = [(source, pool.submit(fetch_source, source, part_numbers, started + source.deadline))
+                   for source in sources]
+        fetches = {}
+        for source, future in futures:
+            try:
+                remaining = max(0.0, started + source.deadline - time.monotonic())
+                fetches[source.name] = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                # El hilo sigue hasta su siguiente revisión del deadline y termina sin tocar la copia local
+                fetches[source.name] = SourceFetch(DOWNLOAD_FAILED, error=DownloadDeadlineExceeded(
+                    f"La fuente {source.name} excedió su tiempo máximo de {source.deadline:g}s"
+                ))
+        pool.shutdown(wait=False)
+    for name, fetch in fetches.items():
+        METRICS.increment('source_downloads_total', source=name, result=fetch.result)
+    return fetches
+
+def combine_fetch_results(fetches):
+    """Resultado global de una descarga: falló si falló alguna fuente, actualizado si alguna cambió"""
+    results = [fetch.result for fetch in fetches.values() if fetch.result != SOURCE_NO_ID]
+    if not results:
+        return SOURCE_NO_ID
+    if DOWNLOAD_FAILED in results:
+        return DOWNLOAD_FAILED
+    if DOWNLOAD_UPDATED in results:
+        return DOWNLOAD_UPDATED
+    return DOWNLOAD_UNCHANGED
+
+def load_source_tables(sources, part_numbers=None, downloaded=None, previous=None):
+    """PRPTable de cada fuente con copia local, en orden de prioridad.
+
+    downloaded: fuente → PRPTable parseada durante la descarga (mismo filtro de partes).
+    previous: fuente → PRPTable ya cargada con el mismo filtro; se reutiliza si el archivo no cambió.
+    Las fuentes sin descarga ni archivo local se omiten."""
+    downloaded = downloaded or {}
+    previous = previous or {}
+    tables = {}
+    for source in sources:
+        table = downloaded.get(source.name)
+        if table is None:
+            if not os.path.exists(source.path):
+                continue
+            content_hash = compute_file_hash(source.path)
+            table = previous.get(source.name)
+            if table is None or table.content_hash != content_hash:
+                table = load_prp_table(source.path, content_hash, part_numbers)
+        tables[source.name] = table
+    return tables
+
+def merge_sources(tables):
+    """Combina las tablas de cada fuente en un SourcedPRP"""
+    table, part_sources = merge_prp_tables(tables)
+    part_sources.flags.writeable = False
+    return SourcedPRP(table=table, tables=MappingProxyType(dict(tables)), part_sources=part_sources)
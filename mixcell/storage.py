@@ -0,0 +1,173 @@
+"""Cache binario columnar (sidecar .npy mapeado en memoria) del PRP y de parts_data.csv"""
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from config import *
+from mixcell.analysis import PRPTable, compute_row_hashes, ingest_prp, part_filter_key, read_prp_csv
+from mixcell.fetch import DOWNLOAD_FAILED, DOWNLOAD_UPDATED, compute_file_hash, stream_download
+from mixcell.metrics import METRICS
+
+def get_sidecar_folder(file_path):
+    """Carpeta del cache binario columnar de un CSV (una por archivo de origen).
+    
+    Se identifica por la ruta absoluta: dos fuentes con el mismo nombre de archivo en carpetas
+    distintas nunca comparten sidecar."""
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    path_hash = hashlib.sha256(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(BINARY_CACHE_FOLDER, f"{name}-{path_hash}")
+
+def write_sidecar(folder, arrays, stamp):
+    """Guarda columnas como archivos .npy y al final el sello de versión que las valida"""
+    os.makedirs(folder, exist_ok=True)
+    stamp_path = os.path.join(folder, 'stamp.json')
+    # Invalidar primero: si el proceso se interrumpe no queda un sidecar a medias marcado como válido
+    try:
+        os.remove(stamp_path)
+    except FileNotFoundError:
+        pass
+    
+    # Temporales con nombre único: dos escrituras simultáneas nunca comparten archivo a medias
+    for name, array in arrays.items():
+        fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=f".{name}-", suffix='.npy.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, array, allow_pickle=False)
+            os.replace(tmp_path, os.path.join(folder, f"{name}.npy"))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    
+    stamp = dict(stamp, format_version=SIDECAR_FORMAT_VERSION, columns=list(arrays))
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.stamp-', suffix='.json.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(stamp, f)
+        os.replace(tmp_path, stamp_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def read_sidecar(folder, content_hash):
+    """Mapea en memoria las columnas del sidecar si su sello coincide con el archivo de origen"""
+    try:
+        with open(os.path.join(folder, 'stamp.json'), 'r', encoding='utf-8') as f:
+            stamp = json.load(f)
+        if (stamp.get('format_version') != SIDECAR_FORMAT_VERSION or
+                stamp.get('content_hash') != content_hash):
+            return None, None
+        arrays = {
+            name: np.load(os.path.join(folder, f"{name}.npy"), mmap_mode='r', allow_pickle=False)
+            for name in stamp['columns']
+        }
+        return stamp, arrays
+    except (OSError, ValueError, KeyError):
+        return None, None
+
+@METRICS.timed('load_prp')
+def load_prp_table(file_path, content_hash, part_numbers=None):
+    """Carga el PRP desde su sidecar binario; si no está vigente parsea el CSV y crea el sidecar.
+    
+    Si se dan part_numbers, solo se cargan esas partes (el sidecar recuerda con qué filtro se creó)"""
+    folder = get_sidecar_folder(file_path)
+    filter_key = part_filter_key(part_numbers)
+    stamp, arrays = read_sidecar(folder, content_hash)
+    if stamp is not None and (stamp.get('part_filter') != filter_key or
+                              stamp.get('max_days') != MAX_DAYS_TO_ANALYZE):
+        arrays = None
+    
+    if arrays is not None:
+        METRICS.increment('cache_requests_total', cache='prp_sidecar', result='hit')
+        METRICS.set_gauge('prp_rows', len(arrays['part_numbers']))
+        updated_at = pd.Timestamp(stamp['updated_at']) if stamp.get('updated_at') else None
+        dates = pd.DatetimeIndex(arrays['dates'])
+        return PRPTable(
+            part_numbers=arrays['part_numbers'],
+            row_index={part_number: i for i, part_number in enumerate(arrays['part_numbers'].tolist())},
+            inv_fg=arrays['inv_fg'],
+            past_due=arrays['past_due'],
+            dates=dates,
+            demand=arrays['demand'],
+            updated_at=updated_at,
+            content_hash=content_hash,
+            row_hashes=compute_row_hashes(arrays['inv_fg'], arrays['past_due'], dates, arrays['demand'])
+        )
+    
+    METRICS.increment('cache_requests_total', cache='prp_sidecar', result='miss')
+    with METRICS.timed('parse_prp_csv'):
+        prp_df, rows_read = read_prp_csv(file_path, part_numbers)
+    METRICS.set_gauge('prp_csv_rows', rows_read)
+    prp_table = ingest_prp(prp_df, content_hash=content_hash)
+    METRICS.set_gauge('prp_rows', len(prp_table.part_numbers))
+    write_prp_sidecar(file_path, prp_table, filter_key)
+    return prp_table
+
+def write_prp_sidecar(file_path, prp_table, filter_key):
+    """Guarda el sidecar de una PRPTable ya procesada (sin sidecar se sigue trabajando; el CSV es el respaldo)"""
+    try:
+        write_sidecar(get_sidecar_folder(file_path), {
+            'part_numbers': prp_table.part_numbers.astype(str),
+            'inv_fg': prp_table.inv_fg,
+            'past_due': prp_table.past_due,
+            'dates': prp_table.dates.to_numpy(),
+            'demand': prp_table.demand
+        }, {
+            'content_hash': prp_table.content_hash,
+            'part_filter': filter_key,
+            'max_days': MAX_DAYS_TO_ANALYZE,
+            'updated_at': prp_table.updated_at.isoformat() if prp_table.updated_at is not None else None
+        })
+    except OSError:
+        pass
+
+def download_prp_table(url, output_path, part_numbers=None, timeout=DOWNLOAD_TIMEOUT, deadline=None):
+    """Descarga el PRP y lo parsea mientras llega, sin leerlo de nuevo del disco.
+    
+    La copia local (output_path) y su sidecar se siguen guardando como respaldo. Retorna el
+    resultado de la descarga y la PRPTable, o None si no hubo contenido que parsear (304 o
+    descarga con gdown): en ese caso el archivo local es la fuente."""
+    def parse(stream):
+        with METRICS.timed('parse_prp_csv'):
+            return read_prp_csv(stream, part_numbers)
+    
+    result = DOWNLOAD_FAILED
+    try:
+        with METRICS.timed('download'):
+            result, parsed, content_hash = stream_download(url, output_path, parse, timeout=timeout, deadline=deadline)
+    finally:
+        METRICS.increment('downloads_total', result=result)
+    if parsed is None:
+        return result, None
+    
+    prp_df, rows_read = parsed
+    METRICS.set_gauge('prp_csv_rows', rows_read)
+    prp_table = ingest_prp(prp_df, content_hash=content_hash)
+    METRICS.set_gauge('prp_rows', len(prp_table.part_numbers))
+    if result == DOWNLOAD_UPDATED:
+        write_prp_sidecar(output_path, prp_table, part_filter_key(part_numbers))
+    return result, prp_table
+
+@METRICS.timed('load_parts')
+def load_parts_df(file_path):
+    """Carga parts_data.csv desde su sidecar binario o desde el CSV"""
+    content_hash = compute_file_hash(file_path)
+    folder = get_sidecar_folder(file_path)
+    stamp, arrays = read_sidecar(folder, content_hash)
+    if arrays is not None:
+        METRICS.increment('cache_requests_total', cache='parts_sidecar', result='hit')
+        return pd.DataFrame({column: np.asarray(arrays[column]) for column in stamp['columns']})
+    
+    METRICS.increment('cache_requests_total', cache='parts_sidecar', result='miss')
+    # Columnas como texto de ancho fijo (sin pickle); los vacíos quedan como ''
+    parts_df = pd.read_csv(file_path).fillna('').astype(str)
+    try:
+        columns = {column: parts_df[column].to_numpy(dtype=str) for column in parts_df.columns}
+        write_sidecar(folder, columns, {'content_hash': content_hash})
+    except OSError:
+        pass
+    return parts_df
+
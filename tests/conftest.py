@@ -0,0 +1,163 @@
+"""Servidor HTTP local que hace de Google Drive para probar la descarga del PRP"""
+import gzip
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def make_prp_df(n_parts=2000, n_days=10, seed=0, start_date="2025-01-06", prefix="FGTEST"):
+    """PRP con el formato del export (dos tipos de demanda por parte)"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start_date, periods=n_days)
+    rows = []
+    for i in range(n_parts):
+        for demand_type in ("Customer Releases", "Forecast"):
+            row = {
+                'Part No': f"{prefix}{i:05d}-SL",
+                'Demand Type': demand_type,
+                'Inv FG': int(rng.integers(0, 5000)),
+                'Past Due': int(rng.integers(0, 300)),
+                'Fecha De Actualizacion': "01/06/2025 10:05:00"
+            }
+            row.update({date.strftime('%m/%d/%Y'): int(rng.integers(0, 1500)) for date in dates})
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+def make_prp_csv(n_parts=2000, n_days=10, seed=0, **kwargs):
+    """prp.csv chico con el formato del export"""
+    return make_prp_df(n_parts, n_days, seed, **kwargs).to_csv(index=False).encode('utf-8')
+
+def make_parts_df(n_parts=40, parts_per_cell=4, prefix="FGTEST"):
+    """parts_data.csv con las mismas partes de make_prp_df, parts_per_cell partes por celda"""
+    import pandas as pd
+
+    return pd.DataFrame({
+        'cell_name': [f"Celda {i // parts_per_cell:02d}" for i in range(n_parts)],
+        'part_numbers': [f"{prefix}{i:05d}-SL" for i in range(n_parts)],
+        'description': [f"PARTE DE PRUEBA {i}" for i in range(n_parts)],
+        'rate_per_hour': 60,
+        'pieces_per_container': 50,
+        'family': 'Produccion Regular',
+        'visual_id': 'Azul'
+    })
+
+class DriveStandIn:
+    """Estado del servidor: qué contenido sirve y cómo se comporta en la siguiente petición"""
+
+    def __init__(self):
+        self.body = b""
+        self.etag = None         # Si se da, responde 304 a If-None-Match con el mismo valor
+        self.gzip = False        # Comprime si el cliente lo acepta
+        self.failures = 0        # Respuestas 503 antes de servir el contenido
+        self.cut_after = None    # Bytes que se envían antes de cortar la conexión
+        self.delay = 0           # Segundos de espera antes de responder
+        self.content_type = 'text/csv'  # 'text/html' hace de la página de confirmación de Google Drive
+        self.requests = []       # Encabezados de cada petición recibida
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        state = self.state
+        state.requests.append(dict(self.headers))
+        if state.delay:
+            time.sleep(state.delay)
+        if state.failures > 0:
+            state.failures -= 1
+            self._send(503, b"")
+            return
+        if state.etag is not None and self.headers.get('If-None-Match') == state.etag:
+            self._send(304, b"")
+            return
+
+        body = state.body
+        headers = {'Content-Type': state.content_type}
+        if state.gzip and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+        if state.etag is not None:
+            headers['ETag'] = state.etag
+        if state.cut_after is not None:
+            # Anuncia el cuerpo completo pero corta la conexión a la mitad
+            self._send(200, body[:state.cut_after], headers, content_length=len(body))
+            self.close_connection = True
+            return
+        self._send(200, body, headers)
+
+    def _send(self, status, body, headers=None, content_length=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body) if content_length is None else content_length))
+        self.end_headers()
+        self.wfile.write(body)
+        self.wfile.flush()
+
+@pytest.fixture
+def prp_csv():
+    """Generador de prp.csv de prueba: prp_csv(n_parts=..., n_days=..., seed=...)"""
+    return make_prp_csv
+
+@pytest.fixture
+def prp_df():
+    """Generador del PRP de prueba como DataFrame: prp_df(n_parts=..., n_days=..., seed=...)"""
+    return make_prp_df
+
+@pytest.fixture
+def parts_df():
+    """Generador de parts_data de prueba: parts_df(n_parts=..., parts_per_cell=...)"""
+    return make_parts_df
+
+@pytest.fixture
+def clock():
+    """Hora fija del proceso (CLOCK) a las 08:00 del primer día de make_prp_df; clock.set(...) la mueve"""
+    from datetime import datetime
+
+    from mixcell.clock import CLOCK, ManualClock
+
+    source = ManualClock(datetime(2025, 1, 6, 8, 0))
+    with CLOCK.use(source):
+        yield source
+
+@pytest.fixture
+def drives():
+    """Fábrica de servidores locales en puertos libres: drives() retorna (estado, url) de uno nuevo"""
+    servers = []
+
+    def start():
+        state = DriveStandIn()
+        handler = type('DriveHandler', (_Handler,), {'state': state})
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return state, f"http://127.0.0.1:{server.server_port}/uc?export=download&id=test"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def drive(drives):
+    """Servidor local en un puerto libre; retorna (estado, url)"""
+    return drives()
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Directorio de trabajo vacío con data/ (el cache binario se escribe relativo al directorio actual)"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data').mkdir()
+    return tmp_path
@@ -0,0 +1,59 @@
+"""Respuestas del API de secuencia contra el lock compartido que leen las pantallas"""
+import json
+
+import pytest
+
+from mixcell.analysis import PartCatalog, ingest_prp
+from mixcell.api import SequenceAPI
+from mixcell.clock import CLOCK
+from mixcell.locks import SequenceLockStore
+from mixcell.snapshot import derive_snapshot, get_locked_sequence
+
+@pytest.fixture
+def snapshot(clock, parts_df, prp_df):
+    catalog = PartCatalog(parts_df(n_parts=40))
+    prp = prp_df(n_parts=40)
+    # Sin inventario: todas las partes faltan hoy y cada celda tiene sesión del mismo día (lock activo)
+    prp['Inv FG'] = 0
+    return derive_snapshot(catalog, None, ingest_prp(prp, content_hash="api-test"))
+
+@pytest.fixture
+def lock_store(tmp_path):
+    return SequenceLockStore(str(tmp_path / 'locks.sqlite'))
+
+def make_api(snapshot, lock_store):
+    return SequenceAPI(
+        lambda: snapshot,
+        lambda snapshot, cell_name, family: get_locked_sequence(snapshot, lock_store, cell_name, family),
+        lambda cell_name, family: lock_store.version(cell_name, family, CLOCK.today())
+    )
+
+def response_sequence(response):
+    _, body, _ = response
+    return [(part['part_number'], part['flags']['is_sequence_locked']) for part in json.loads(body)['sequence']]
+
+def screen_sequence(snapshot, lock_store, cell_name, family):
+    return [(part['part_number'], bool(part.get('is_sequence_locked', False)))
+            for part in get_locked_sequence(snapshot, lock_store, cell_name, family)]
+
+def test_second_poll_serves_stored_lock(snapshot, lock_store):
+    api = make_api(snapshot, lock_store)
+
+    for cell_name, family in snapshot.catalog.cell_families():
+        # Primera consulta del día: escribe el lock y responde la secuencia recién calculada
+        first = api.get_sequence(cell_name, family)
+        assert [locked for _, locked in response_sequence(first)] == [False] * 3
+
+        # Segunda consulta: lo mismo que muestra la pantalla con el lock guardado
+        second = api.get_sequence(cell_name, family)
+        assert response_sequence(second) == screen_sequence(snapshot, lock_store, cell_name, family)
+        assert [locked for _, locked in response_sequence(second)] == [True] * 3
+        assert second[0] != first[0]
+
+def test_repeated_polls_are_cached(snapshot, lock_store):
+    api = make_api(snapshot, lock_store)
+    cell_name, family = snapshot.catalog.cell_families()[0]
+    api.get_sequence(cell_name, family)
+    second = api.get_sequence(cell_name, family)
+
+    assert api.get_sequence(cell_name, family) is second
@@ -0,0 +1,47 @@
+"""Cálculo por lotes: mismo catálogo y mismas secuencias que las pantallas"""
+import os
+
+import pandas as pd
+
+from mixcell import cli
+from mixcell.analysis import PartCatalog
+from mixcell.storage import load_parts_df
+
+PRP_PATH = os.path.join('data', 'prp.csv')
+PARTS_PATH = os.path.join('data', 'parts_data.csv')
+
+def write_files(prp_df, parts_df):
+    parts = parts_df(n_parts=8)
+    # Celdas con nombre numérico y celdas vacías, como quedan al exportar desde Excel
+    parts['cell_name'] = parts['cell_name'].str.replace("Celda ", "1")
+    parts.loc[3, 'part_numbers'] = None
+    parts.loc[1, ['description', 'visual_id']] = None
+    parts.to_csv(PARTS_PATH, index=False)
+
+    prp = prp_df(n_parts=8)
+    prp['Inv FG'] = 0
+    prp.to_csv(PRP_PATH, index=False)
+
+def test_catalog_matches_screens(workdir, clock, prp_df, parts_df):
+    write_files(prp_df, parts_df)
+
+    snapshot = cli.load_batch_snapshot(PRP_PATH, PARTS_PATH)
+    screens = PartCatalog(load_parts_df(PARTS_PATH))
+
+    assert snapshot.catalog.cell_families() == screens.cell_families() == [
+        ("100", "Produccion Regular"), ("101", "Produccion Regular")
+    ]
+    for key in screens.cell_families():
+        assert snapshot.catalog.part_numbers(*key) == screens.part_numbers(*key)
+    for part_number in screens.family_part_numbers():
+        assert snapshot.catalog.description(part_number) == screens.description(part_number)
+        assert snapshot.catalog.visual_color(part_number) == screens.visual_color(part_number)
+
+def test_writes_sequences_csv(workdir, clock, prp_df, parts_df):
+    write_files(prp_df, parts_df)
+
+    assert cli.main(['--prp', PRP_PATH, '--parts', PARTS_PATH, '--output', 'secuencias.csv', '--quiet']) == 0
+
+    output = pd.read_csv('secuencias.csv', dtype={'cell_name': str})
+    assert sorted(output['cell_name'].unique()) == ["100", "101"]
+    assert len(output) == 6
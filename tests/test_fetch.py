@@ -0,0 +1,133 @@
+"""Descarga condicional y atómica del PRP, y su parseo mientras llega, contra un servidor local
+que hace de Google Drive"""
+import os
+import shutil
+
+import numpy as np
+import pytest
+import requests
+
+from mixcell import fetch
+from mixcell.fetch import DOWNLOAD_UNCHANGED, DOWNLOAD_UPDATED
+from mixcell.storage import download_prp_table, get_sidecar_folder, load_prp_table
+
+PRP_PATH = os.path.join('data', 'prp.csv')
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(fetch, 'DOWNLOAD_RETRY_BACKOFF', 0)
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def temp_files():
+    return [name for name in os.listdir('data') if name.endswith('.tmp')]
+
+def assert_same_table(actual, expected):
+    assert actual.part_numbers.tolist() == expected.part_numbers.tolist()
+    assert actual.dates.equals(expected.dates)
+    assert np.array_equal(actual.inv_fg, expected.inv_fg)
+    assert np.array_equal(actual.past_due, expected.past_due)
+    assert np.array_equal(actual.demand, expected.demand)
+    assert actual.updated_at == expected.updated_at
+    assert actual.content_hash == expected.content_hash
+
+def load_from_csv(part_numbers=None):
+    """PRP leído del archivo guardado (sin sidecar), como en un arranque en frío"""
+    shutil.rmtree(get_sidecar_folder(PRP_PATH), ignore_errors=True)
+    return load_prp_table(PRP_PATH, fetch.compute_file_hash(PRP_PATH), part_numbers)
+
+def test_new_content_replaces_file(workdir, drive, prp_csv):
+    state, url = drive
+    state.body = prp_csv()
+
+    result, prp_table = download_prp_table(url, PRP_PATH)
+
+    assert result == DOWNLOAD_UPDATED
+    assert read_bytes(PRP_PATH) == state.body
+    assert prp_table.content_hash == fetch.compute_file_hash(PRP_PATH)
+    assert temp_files() == []
+
+def test_etag_match_is_unchanged(workdir, drive, prp_csv):
+    state, url = drive
+    state.body = prp_csv()
+    state.etag = '"v1"'
+    download_prp_table(url, PRP_PATH)
+    modified = os.path.getmtime(PRP_PATH)
+
+    result, prp_table = download_prp_table(url, PRP_PATH)
+
+    assert result == DOWNLOAD_UNCHANGED
+    assert prp_table is None  # 304: no hubo contenido que parsear
+    assert state.requests[-1].get('If-None-Match') == '"v1"'
+    assert os.path.getmtime(PRP_PATH) == modified
+
+def test_same_hash_is_unchanged(workdir, drive, prp_csv):
+    state, url = drive
+    state.body = prp_csv()
+    download_prp_table(url, PRP_PATH)
+    modified = os.path.getmtime(PRP_PATH)
+
+    result, _ = download_prp_table(url, PRP_PATH)
+
+    assert result == DOWNLOAD_UNCHANGED
+    assert os.path.getmtime(PRP_PATH) == modified
+    assert temp_files() == []
+
+def test_server_error_is_retried(workdir, drive, prp_csv):
+    state, url = drive
+    state.body = prp_csv()
+    state.failures = 1
+
+    result, _ = download_prp_table(url, PRP_PATH)
+
+    assert result == DOWNLOAD_UPDATED
+    assert len(state.requests) == 2
+    assert read_bytes(PRP_PATH) == state.body
+
+def test_connection_cut_keeps_previous_copy(workdir, drive, prp_csv, monkeypatch):
+    state, url = drive
+    state.body = prp_csv(seed=1)
+    download_prp_table(url, PRP_PATH)
+    previous = read_bytes(PRP_PATH)
+    stamp_path = os.path.join(get_sidecar_folder(PRP_PATH), 'stamp.json')
+    previous_stamp = read_bytes(stamp_path)
+
+    # Contenido nuevo que se corta a la mitad (en bloques chicos para que el parser ya haya empezado)
+    monkeypatch.setattr(fetch, 'DOWNLOAD_CHUNK_BYTES', 4096)
+    state.body = prp_csv(seed=2)
+    state.cut_after = len(state.body) // 2
+
+    with pytest.raises(requests.RequestException):
+        download_prp_table(url, PRP_PATH)
+
+    assert read_bytes(PRP_PATH) == previous
+    assert read_bytes(stamp_path) == previous_stamp
+    assert temp_files() == []
+
+def test_streamed_table_matches_file(workdir, drive, prp_csv, monkeypatch):
+    state, url = drive
+    state.body = prp_csv()
+    # Bloques chicos: el parser consume la descarga en muchos pedazos
+    monkeypatch.setattr(fetch, 'DOWNLOAD_CHUNK_BYTES', 4096)
+    part_numbers = [f"FGTEST{i:05d}-SL" for i in range(0, 2000, 3)]
+
+    result, prp_table = download_prp_table(url, PRP_PATH, part_numbers)
+
+    assert result == DOWNLOAD_UPDATED
+    assert len(prp_table.part_numbers) == len(part_numbers)
+    assert_same_table(prp_table, load_from_csv(part_numbers))
+
+def test_gzip_body_is_decoded(workdir, drive, prp_csv):
+    state, url = drive
+    state.body = prp_csv()
+    state.gzip = True
+
+    result, prp_table = download_prp_table(url, PRP_PATH)
+
+    assert result == DOWNLOAD_UPDATED
+    assert 'gzip' in state.requests[-1].get('Accept-Encoding', '')
+    # La copia local y el hash son del CSV sin comprimir
+    assert read_bytes(PRP_PATH) == state.body
+    assert_same_table(prp_table, load_from_csv())
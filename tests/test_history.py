@@ -0,0 +1,62 @@
+"""Historial de versiones del PRP: filas deduplicadas por contenido aunque cambie la ventana de fechas"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from mixcell.analysis import ingest_prp
+from mixcell.history import PRPHistoryStore
+
+@pytest.fixture
+def history(clock, tmp_path):
+    return PRPHistoryStore(str(tmp_path / 'history.sqlite'))
+
+@pytest.fixture
+def export(prp_df):
+    """PRP de 11 días sin demanda el primero ni el último: los exports de dos días seguidos
+    (columnas 1-10 y 2-11) tienen el mismo contenido por fecha"""
+    prp = prp_df(n_parts=50, n_days=11)
+    date_columns = list(prp.columns[5:])
+    prp[[date_columns[0], date_columns[-1]]] = 0
+
+    def day_export(day, updated_at):
+        columns = list(prp.columns[:5]) + date_columns[day:day + 10]
+        return prp[columns].assign(**{'Fecha De Actualizacion': updated_at})
+    return day_export
+
+def count_rows(history):
+    return history._connection().execute("SELECT COUNT(*) FROM prp_rows").fetchone()[0]
+
+def assert_same_table(actual, expected):
+    order = np.argsort(expected.part_numbers)
+    assert actual.part_numbers.tolist() == expected.part_numbers[order].tolist()
+    assert actual.dates.equals(expected.dates)
+    assert np.array_equal(actual.inv_fg, expected.inv_fg[order])
+    assert np.array_equal(actual.past_due, expected.past_due[order])
+    assert np.array_equal(actual.demand, expected.demand[order])
+
+def test_same_content_next_day_adds_no_rows(history, export):
+    first = ingest_prp(export(0, "01/06/2025 10:05:00"), content_hash="v1")
+    second = ingest_prp(export(1, "01/07/2025 10:05:00"), content_hash="v2")
+    history.record(first)
+    rows = count_rows(history)
+
+    version_id = history.record(second)
+
+    assert count_rows(history) == rows == 50
+    versions = history.versions()
+    assert versions['changed_parts'].tolist() == [50, 0]
+    assert_same_table(history.load_table(version_id), second)
+
+def test_changed_part_adds_one_row(history, export):
+    history.record(ingest_prp(export(0, "01/06/2025 10:05:00"), content_hash="v1"))
+    prp = export(1, "01/07/2025 10:05:00")
+    prp.loc[0, 'Inv FG'] += 10  # Customer Releases de la primera parte
+    changed = ingest_prp(prp, content_hash="v2")
+
+    version_id = history.record(changed)
+
+    assert count_rows(history) == 51
+    assert history.versions()['changed_parts'].tolist() == [50, 1]
+    assert_same_table(history.load_table(version_id), changed)
+    trajectory = history.parts_history([changed.part_numbers[0]])
+    assert trajectory['inv_fg'].diff().iloc[-1] == 10
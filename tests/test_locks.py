@@ -0,0 +1,119 @@
+"""Lock diario de la secuencia compartido en SQLite: primera escritura, relectura, pull ahead,
+compare-and-set entre pantallas y retención"""
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from config import LOCK_RETENTION_DAYS
+from mixcell.locks import SequenceLockStore, get_top_3_critical_parts_with_lock
+
+TODAY = date(2025, 1, 6)  # Día del fixture clock
+CELL = ("Celda 00", "Produccion Regular")
+
+def part(part_number, day=TODAY):
+    """Entrada de la secuencia calculada con su primer faltante en day"""
+    return {
+        'part_number': part_number,
+        'first_shortage_date': pd.Timestamp(day),
+        'kanban_group_date': day,
+        'deficit': 100,
+        'containers': 2
+    }
+
+def rank(lock_store, current_sequence):
+    # prp_analysis solo se usa para saber si hay partes; la secuencia ya viene calculada
+    return get_top_3_critical_parts_with_lock([None], None, lock_store, *CELL,
+                                              current_sequence=current_sequence)
+
+def stored_parts(lock_store, day=TODAY):
+    stored_sequence, version = lock_store.get(*CELL, day)
+    return [stored_part['part_number'] for stored_part in stored_sequence or []], version
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'locks.sqlite')
+
+@pytest.fixture
+def lock_store(clock, db_path):
+    return SequenceLockStore(db_path)
+
+def test_first_write_of_the_day(lock_store):
+    sequence = rank(lock_store, [part('A'), part('B'), part('C')])
+
+    assert [p['part_number'] for p in sequence] == ['A', 'B', 'C']
+    assert not any(p.get('is_sequence_locked') for p in sequence)
+    assert stored_parts(lock_store) == (['A', 'B', 'C'], 1)
+
+def test_locked_sequence_is_reread(lock_store):
+    rank(lock_store, [part('A'), part('B'), part('C')])
+
+    # Cambió el orden calculado pero sigue la sesión del día: se mantiene el orden guardado
+    sequence = rank(lock_store, [part('C'), part('A'), part('B')])
+
+    assert [p['part_number'] for p in sequence] == ['A', 'B', 'C']
+    assert all(p['is_sequence_locked'] for p in sequence)
+    assert [p['locked_priority'] for p in sequence] == [1, 2, 3]
+    assert stored_parts(lock_store) == (['A', 'B', 'C'], 1)
+
+def test_pull_ahead_breaks_the_lock(lock_store):
+    rank(lock_store, [part('A'), part('B'), part('C')])
+
+    # Una parte con faltante de ayer se adelanta a la secuencia guardada
+    yesterday = TODAY - timedelta(days=1)
+    sequence = rank(lock_store, [part('D', yesterday), part('A'), part('B')])
+
+    assert [p['part_number'] for p in sequence] == ['D', 'A', 'B']
+    assert [bool(p.get('is_pull_ahead')) for p in sequence] == [True, False, False]
+    assert not any(p.get('is_sequence_locked') for p in sequence)
+    assert stored_parts(lock_store) == (['D', 'A', 'B'], 2)
+
+def test_concurrent_write_is_retried(clock, db_path):
+    screen = SequenceLockStore(db_path)
+    other_screen = SequenceLockStore(db_path)
+
+    class RacingStore:
+        """Otra pantalla escribe su secuencia entre la primera lectura y la escritura de esta"""
+        reads = 0
+
+        def get(self, *args):
+            result = screen.get(*args)
+            self.reads += 1
+            if self.reads == 1:
+                rank(other_screen, [part('X'), part('Y'), part('Z')])
+            return result
+
+        def compare_and_set(self, *args):
+            return screen.compare_and_set(*args)
+
+    racing = RacingStore()
+    sequence = rank(racing, [part('Z'), part('X'), part('Y')])
+
+    # Perdió el compare-and-set y volvió a evaluar con el lock de la otra pantalla
+    assert racing.reads == 2
+    assert [p['part_number'] for p in sequence] == ['X', 'Y', 'Z']
+    assert all(p['is_sequence_locked'] for p in sequence)
+    assert stored_parts(screen) == (['X', 'Y', 'Z'], 1)
+
+def test_stale_version_is_rejected(clock, db_path):
+    screen = SequenceLockStore(db_path)
+    other_screen = SequenceLockStore(db_path)
+    rank(screen, [part('A'), part('B'), part('C')])
+    stored_sequence, version = other_screen.get(*CELL, TODAY)
+
+    assert screen.compare_and_set(*CELL, TODAY, stored_sequence[::-1], version)
+    assert not other_screen.compare_and_set(*CELL, TODAY, stored_sequence, version)
+    assert stored_parts(other_screen) == (['C', 'B', 'A'], 2)
+
+def test_purge_keeps_retention_window(clock, lock_store):
+    old_day = TODAY - timedelta(days=LOCK_RETENTION_DAYS + 1)
+    kept_day = TODAY - timedelta(days=LOCK_RETENTION_DAYS)
+    for day in (old_day, kept_day, TODAY):
+        clock.set(datetime.combine(day, datetime.min.time()) + timedelta(hours=8))
+        rank(lock_store, [part('A', day), part('B', day), part('C', day)])
+
+    lock_store.purge()
+
+    assert stored_parts(lock_store, old_day) == ([], 0)
+    assert stored_parts(lock_store, kept_day)[1] == 1
+    assert stored_parts(lock_store, TODAY)[1] == 1
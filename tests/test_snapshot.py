@@ -0,0 +1,54 @@
+"""Programador de actualizaciones del PRP: arranque en frío y solicitudes de descarga"""
+import os
+
+from mixcell.snapshot import PRPRefresher
+
+PRP_PATH = os.path.join('data', 'prp.csv')
+PARTS_PATH = os.path.join('data', 'parts_data.csv')
+
+def test_cold_start_with_bad_file_reports_error(workdir, clock, prp_csv, parts_df):
+    with open(PRP_PATH, 'wb') as f:
+        f.write(prp_csv(n_parts=40))
+    parts_df(n_parts=40).drop(columns=['pieces_per_container']).to_csv(PARTS_PATH, index=False)
+    refresher = PRPRefresher()
+
+    # La página muestra el error en lugar de caerse
+    assert refresher.get_snapshot() is None
+    assert 'pieces_per_container' in refresher.last_error
+
+    # Corregido el archivo, la siguiente consulta construye el snapshot
+    parts_df(n_parts=40).to_csv(PARTS_PATH, index=False)
+    snapshot = refresher.get_snapshot()
+    assert snapshot is not None
+    assert len(snapshot.sequences) == 10
+    assert refresher.last_error is None
+
+class StopRefresher(Exception):
+    pass
+
+def test_request_after_wait_timeout_downloads(workdir, monkeypatch):
+    monkeypatch.setattr('mixcell.snapshot.check_file_age', lambda path: False)
+    refresher = PRPRefresher()
+    downloads = []
+    monkeypatch.setattr(refresher, '_refresh', lambda download: downloads.append(download))
+
+    waits = []
+    def wait(timeout=None):
+        waits.append(timeout)
+        if len(waits) > 1:
+            raise StopRefresher()
+        # La espera se vence justo cuando llega una solicitud (refresh_now) y el evento queda activo
+        with refresher._condition:
+            refresher._requested += 1
+        refresher._wakeup.set()
+        return False
+    monkeypatch.setattr(refresher._wakeup, 'wait', wait)
+
+    try:
+        refresher._run()
+    except StopRefresher:
+        pass
+
+    # La solicitud se atiende con descarga y queda completada
+    assert downloads == [False, True]
+    assert refresher._completed == refresher._requested == 1
@@ -0,0 +1,114 @@
+"""Varias fuentes del PRP: reglas de combinación, tiempo máximo por fuente y copia local de respaldo"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mixcell import fetch
+from mixcell.analysis import ingest_prp, merge_prp_tables
+from mixcell.fetch import DOWNLOAD_FAILED, DOWNLOAD_UPDATED, DownloadDeadlineExceeded
+from mixcell.sources import PRPSource, fetch_prp_sources, load_source_tables, merge_sources
+from mixcell.storage import download_prp_table
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(fetch, 'DOWNLOAD_RETRY_BACKOFF', 0)
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def test_first_source_wins_and_dates_are_joined(prp_df):
+    first = ingest_prp(prp_df(n_parts=10, n_days=10), content_hash="a")
+    # Partes 5-14 con otras cantidades y fechas dos días después
+    second_df = prp_df(n_parts=15, n_days=10, seed=1, start_date="2025-01-08")
+    second_df = second_df[second_df['Part No'] >= "FGTEST00005-SL"]
+    second = ingest_prp(second_df, content_hash="b")
+
+    merged, part_sources = merge_prp_tables({'a': first, 'b': second})
+
+    assert merged.part_numbers.tolist() == first.part_numbers.tolist() + second.part_numbers[5:].tolist()
+    assert part_sources.tolist() == ['a'] * 10 + ['b'] * 5
+    assert merged.dates.equals(pd.date_range("2025-01-06", periods=12))
+    # Las partes repetidas toman inventario y demanda de la primera fuente
+    assert np.array_equal(merged.inv_fg[:10], first.inv_fg)
+    assert np.array_equal(merged.demand[:10, :10], first.demand)
+    assert not merged.demand[:10, 10:].any()
+    # Las de la segunda fuente quedan en sus fechas, sin demanda en las que no trae
+    assert np.array_equal(merged.inv_fg[10:], second.inv_fg[5:])
+    assert np.array_equal(merged.demand[10:, 2:], second.demand[5:])
+    assert not merged.demand[10:, :2].any()
+
+def test_single_source_is_returned_as_is(prp_df):
+    table = ingest_prp(prp_df(n_parts=5), content_hash="a")
+
+    merged, part_sources = merge_prp_tables({'a': table})
+
+    assert merged is table
+    assert part_sources.tolist() == ['a'] * 5
+
+def test_timed_out_source_uses_local_copy(workdir, drives, prp_csv):
+    (fast, fast_url), (slow, slow_url) = drives(), drives()
+    fast.body = prp_csv(n_parts=10)
+    slow.body = prp_csv(n_parts=20, seed=1)
+    sources = [
+        PRPSource('planta', fast_url, os.path.join('data', 'prp_planta.csv'), timeout=5, deadline=5),
+        PRPSource('cliente', slow_url, os.path.join('data', 'prp_cliente.csv'), timeout=5, deadline=0.5)
+    ]
+    fetches = fetch_prp_sources(sources)
+    assert {name: fetch.result for name, fetch in fetches.items()} == {
+        'planta': DOWNLOAD_UPDATED, 'cliente': DOWNLOAD_UPDATED
+    }
+    previous_copy = read_bytes(sources[1].path)
+
+    # Contenido nuevo en las dos; la segunda tarda más que su tiempo máximo
+    fast.body = prp_csv(n_parts=10, seed=2)
+    slow.body = prp_csv(n_parts=20, seed=3)
+    slow.delay = 2
+    started = time.monotonic()
+    fetches = fetch_prp_sources(sources)
+
+    assert time.monotonic() - started < 1.5
+    assert fetches['planta'].result == DOWNLOAD_UPDATED
+    assert fetches['cliente'].result == DOWNLOAD_FAILED
+    assert isinstance(fetches['cliente'].error, DownloadDeadlineExceeded)
+
+    tables = load_source_tables(sources, downloaded={'planta': fetches['planta'].table})
+    prp = merge_sources(tables)
+    assert prp.tables['cliente'].content_hash == fetch.compute_file_hash(sources[1].path)
+    # Las partes 0-9 vienen de la primera fuente y las 10-19 de la copia local de la segunda
+    assert prp.source_of("FGTEST00003-SL") == 'planta'
+    assert prp.source_of("FGTEST00015-SL") == 'cliente'
+
+    # El hilo de la fuente lenta termina después sin reemplazar la copia local
+    time.sleep(slow.delay + 0.5)
+    assert read_bytes(sources[1].path) == previous_copy
+
+def test_confirmation_page_download_respects_deadline(workdir, drive, prp_csv, monkeypatch):
+    state, url = drive
+    path = os.path.join('data', 'prp.csv')
+    state.body = prp_csv(n_parts=10)
+    download_prp_table(url, path)
+    previous_copy = read_bytes(path)
+
+    # Google Drive responde la página de confirmación y gdown tarda más que el tiempo máximo
+    import gdown
+    def slow_gdown(url, output, quiet=False):
+        time.sleep(0.5)
+        with open(output, 'wb') as f:
+            f.write(prp_csv(n_parts=10, seed=1))
+    monkeypatch.setattr(gdown, 'download', slow_gdown)
+    state.content_type = 'text/html'
+
+    with pytest.raises(DownloadDeadlineExceeded):
+        download_prp_table(url, path, deadline=time.monotonic() + 0.2)
+
+    assert read_bytes(path) == previous_copy
+    assert [name for name in os.listdir('data') if name.endswith('.tmp')] == []
+
+    # Con tiempo suficiente la misma descarga sí reemplaza la copia
+    result, _ = download_prp_table(url, path, deadline=time.monotonic() + 5)
+    assert result == DOWNLOAD_UPDATED
+    assert read_bytes(path) == prp_csv(n_parts=10, seed=1)